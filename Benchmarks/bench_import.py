@@ -0,0 +1,73 @@
+import os
+import subprocess
+import sys
+
+"""
+Import-time benchmark for the DoS package. Each measurement imports the
+DoSFuncs and DoSFuncsMulders modules in a fresh interpreter and reports the
+wall time relative to importing numpy alone. 
+
+The benchmark fails (nonzero exit status) if any of the heavy dependencies
+(EXOSIMS, sympy, ortools, matplotlib, scipy, astropy) are loaded at import 
+time or if the import overhead beyond numpy exceeds max_overhead seconds.
+
+Usage:
+    python bench_import.py [max_overhead]
+"""
+
+# modules which must only be loaded by the stages that need them
+heavy = ['EXOSIMS', 'sympy', 'ortools', 'matplotlib', 'scipy', 'astropy']
+# number of fresh interpreters for each measurement
+repeats = 5
+# allowed import time beyond numpy in seconds
+max_overhead = float(sys.argv[1]) if len(sys.argv) > 1 else 0.1
+
+pkgdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+pkg = os.path.basename(pkgdir)
+
+timer = """
+import sys, time
+t0 = time.time()
+%s
+t1 = time.time()
+print(repr(t1 - t0))
+print(' '.join(sorted(set(m.split('.')[0] for m in sys.modules))))
+"""
+
+
+def time_import(stmt):
+    """
+    Times an import statement in fresh interpreters
+
+    Args:
+        stmt (str): import statement to time
+
+    Returns:
+        t (float): minimum wall time over repeats in seconds
+        mods (set): top-level modules loaded by the statement
+    """
+    times = []
+    for i in range(repeats):
+        out = subprocess.check_output([sys.executable, '-c', timer % stmt],
+                                      cwd=os.path.dirname(pkgdir))
+        lines = out.decode().strip().split('\n')
+        times.append(float(lines[0]))
+        mods = set(lines[1].split())
+
+    return min(times), mods
+
+
+t_np, mods_np = time_import('import numpy')
+t_dos, mods_dos = time_import('import %s.DoSFuncs, %s.DoSFuncsMulders' % (pkg, pkg))
+loaded = sorted(set(heavy) & (mods_dos - mods_np))
+
+print('import numpy: {:.3f} s'.format(t_np))
+print('import DoSFuncs, DoSFuncsMulders: {:.3f} s'.format(t_dos))
+print('overhead beyond numpy: {:.3f} s (limit {:.3f} s)'.format(t_dos - t_np, max_overhead))
+if loaded:
+    print('FAILED: heavy modules loaded at import time: {}'.format(', '.join(loaded)))
+    sys.exit(1)
+if t_dos - t_np > max_overhead:
+    print('FAILED: import overhead above limit')
+    sys.exit(1)
+print('passed')
@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+import numpy as np
+
+"""
+Throughput benchmark of the depth of search kernel. For synthetic stars on
+grids of planetary radius by semi-major axis bins, the per-star loop over
+DoSFuncs.one_DoS_bins (the kernel used before DoS_block) is compared with
+DoSFuncs.DoS_block evaluated on blocks of stars within the default memory
+budget of DoS_chunks. The largest difference between the two is printed
+with the timings.
+
+Usage:
+    python bench_kernel.py [nStars]
+"""
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from DoSFuncs import DoSFuncs
+
+nStars = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+grids = [(30, 100), (100, 300), (300, 1000)]
+mem = 64.0
+
+# kernel methods do not need an EXOSIMS simulation
+obj = DoSFuncs.__new__(DoSFuncs)
+rng = np.random.RandomState(0)
+dist = rng.uniform(3.0, 30.0, nStars)
+WA = np.linspace(0.15, 0.45, 50)
+smin = WA[0]*dist
+smax = WA[-1]*dist
+C_inst = 1e-9*(1.0 + 3.0*(WA[None,:] - 0.3)**2*rng.uniform(1.0, 30.0, (nStars,1)))
+
+print('{:>10} {:>8} {:>12} {:>12} {:>8} {:>10}'.format(
+    'grid', 'nStars', 'loop (s)', 'block (s)', 'speedup', 'max diff'))
+for nR, na in grids:
+    a = np.logspace(np.log10(0.1), np.log10(30.0), na+1)
+    R = np.logspace(-5, -3, nR+1)
+    aa, RR = np.meshgrid(a, R)
+    Cmin = obj.find_Cmin(a, smin, smax, dist, C_inst, WA)
+    t0 = time.time()
+    loop = np.zeros((nR,na))
+    for i in range(nStars):
+        CC, RR = np.meshgrid(Cmin[i], R)
+        loop += obj.one_DoS_bins(aa, RR, 0.3, smin[i], smax[i], CC)
+    t1 = time.time()
+    block = np.zeros((nR,na))
+    chunk = max(int(mem*2**20/(32.0*aa.shape[0]*aa.shape[1])), 1)
+    for i in range(0, nStars, chunk):
+        block += obj.DoS_block(a, R, 0.3, smin[i:i+chunk], smax[i:i+chunk], Cmin[i:i+chunk]).sum(axis=0)
+    t2 = time.time()
+    print('{:>10} {:8d} {:12.3f} {:12.3f} {:8.1f} {:10.1e}'.format(
+        '%dx%d' % (nR, na), nStars, t1 - t0, t2 - t1, (t1 - t0)/(t2 - t1),
+        np.abs(block - loop).max()))
@@ -0,0 +1,58 @@
+import imp
+import os
+import sys
+import time
+import numpy as np
+
+"""
+Benchmark of the solvers for the selection of observed stars in
+DoSSelect (used by DoSFuncs.select_obs) on synthetic target lists.
+Integration times are log-uniform between 0.01 and 30 days and ck grows
+with integration time with random scatter, similar to filtered EXOCAT
+target lists. For each target list size and total observation time the
+solver time, objective, relative optimality gap reported by the solver, and
+objective relative to CBC are printed. CBC is skipped if ortools is not
+installed.
+
+Usage:
+    python bench_select_obs.py [nStars ...]
+"""
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import DoSSelect
+
+sizes = [int(n) for n in sys.argv[1:]] or [100, 300, 1000, 3000, 10000]
+maxTimes = [30.0, 365.0]
+# number of random target lists for each size
+repeats = 3
+
+names = ['cbc', 'bb', 'dp', 'greedy']
+try:
+    imp.find_module('ortools')
+except ImportError:
+    print('ortools not installed, skipping cbc')
+    names.remove('cbc')
+
+print('{:>6} {:>7} {:>7} {:>9} {:>9} {:>9} {:>10}'.format(
+    'nStars', 'maxTime', 'solver', 'time (s)', 'gap', 'optimal', 'obj/cbc-1'))
+rng = np.random.RandomState(0)
+for n in sizes:
+    for maxTime in maxTimes:
+        res = dict((name, []) for name in names)
+        for r in range(repeats):
+            t0 = np.exp(rng.uniform(np.log(0.01), np.log(30.0), n))
+            ck = 1e-2*rng.uniform(0.0, 1.0, n)*np.sqrt(t0)
+            for name in names:
+                t1 = time.time()
+                sInds, info = DoSSelect.solvers[name](t0, ck, maxTime)
+                dt = time.time() - t1
+                assert t0[sInds].sum() <= maxTime*(1.0 + 1e-12)
+                res[name].append((dt, info['objective'], info['gap'], info['optimal']))
+        for name in names:
+            dt, obj, gap, opt = [np.array(x) for x in zip(*res[name])]
+            if 'cbc' in res:
+                rel = '{:10.1e}'.format(np.mean(obj/np.array([x[1] for x in res['cbc']]) - 1.0))
+            else:
+                rel = '{:>10}'.format('-')
+            print('{:6d} {:7.0f} {:>7} {:9.4f} {:9.1e} {:9d} {}'.format(
+                n, maxTime, name, dt.mean(), gap.max(), int(opt.sum()), rel))
@@ -0,0 +1,306 @@
+import argparse
+import ast
+import imp
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import numpy as np
+
+"""
+Benchmark suite for the depth of search hot paths on synthetic inputs (see
+synthetic.py), needing no EXOSIMS simulation or catalog files. For each
+case, number of stars, and grid of planetary radius by semi-major axis
+bins, the case is run in a fresh interpreter and the wall time and peak
+memory (maximum resident set size above the size after the inputs are
+generated) are printed. In a second interpreter the case and its reference
+implementation are run on the first stars (up to the reference limit of the
+case), and the reference time and the largest difference relative to the
+largest reference value are printed.
+
+Cases and references:
+    find_ck           DoSFuncs.find_ck, reference.find_ck (per-star quad)
+    completeness      DoSFuncs.completeness on all stars at once,
+                      reference.one_DoS_grid for each star
+    DoS_sum           DoSFuncs.DoS_sum, reference.DoS_sum (per-star quad
+                      of Cmin, corner average of one_DoS_grid)
+    select_obs        DoSFuncs.select_obs with --solver, the exact 'bb'
+                      solver ('cbc' if ortools is installed), the relative
+                      objective shortfall is printed
+    find_occurrence   DoSFuncsMulders.find_occurrence on Mulders.occ,
+                      reference.find_occurrence (loops over bins)
+    F_v, F_v_MC       the scripts' batched DoS_batch with the CDF table
+                      completeness (DoSComps.py) and the sorted Monte Carlo
+                      completeness (DoSComps_MC.py), reference the corner
+                      average of F_v of the same script, both with Lambert
+                      phase photometry
+
+Cases whose estimated time exceeds --max-time are skipped.
+
+Usage:
+    python bench_suite.py [--cases find_ck,DoS_sum] [--stars 10,1000]
+        [--grids 30x100,300x1000] [--max-time 60] [--solver bb]
+"""
+
+bench = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(bench))
+sys.path.insert(0, bench)
+import synthetic
+
+STARS = [10, 100, 1000, 10000, 100000]
+GRIDS = [(30, 100), (100, 300), (300, 1000)]
+# stars and grids of each case (None if the case does not depend on
+# them), number of stars of the reference run, and estimated seconds per
+# star and grid point
+CASES = {
+    'find_ck': {'stars': STARS, 'grids': [None], 'ref': 20, 'cost': 1e-6},
+    'completeness': {'stars': STARS, 'grids': GRIDS, 'ref': 100, 'cost': 2e-8},
+    'DoS_sum': {'stars': STARS, 'grids': GRIDS, 'ref': 5, 'cost': 2e-9},
+    'select_obs': {'stars': STARS, 'grids': [None], 'ref': 10000, 'cost': 1e-4},
+    'find_occurrence': {'stars': [None], 'grids': GRIDS, 'ref': None, 'cost': 1e-6},
+    'F_v': {'stars': [1, 10, 100], 'grids': GRIDS, 'ref': 1, 'cost': 1e-5},
+    'F_v_MC': {'stars': [1, 10], 'grids': GRIDS, 'ref': 1, 'cost': 1e-2},
+}
+ORDER = ['find_ck', 'completeness', 'DoS_sum', 'select_obs', 'find_occurrence', 'F_v', 'F_v_MC']
+# Monte Carlo samples of the F_v_MC case, as in DoSComps_MC.py
+samps = int(2e5)
+REinAU = 4.26352e-5
+
+def script_functions(path, namespace):
+    """
+    Defines the functions of a script in namespace without running the
+    script, whose module level code needs catalog and photometry files
+
+    Args:
+        path (str):
+            path of the script
+        namespace (dict):
+            globals used by the functions
+    """
+
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    tree.body = [node for node in tree.body if isinstance(node, ast.FunctionDef)]
+    exec(compile(tree, path, 'exec'), namespace)
+    namespace['F_v'] = np.vectorize(namespace['F'])
+
+def script_namespace(name, s):
+    """
+    Builds the globals of a DoSComps script from synthetic inputs
+
+    Args:
+        name (str):
+            'F_v' for DoSComps.py or 'F_v_MC' for DoSComps_MC.py
+        s (dict):
+            synthetic target list
+
+    Returns:
+        namespace (dict):
+            globals with the script functions defined
+    """
+
+    import scipy.integrate as integrate
+    import scipy.interpolate as interpolate
+
+    namespace = {'np': np, 'integrate': integrate, 'interpolate': interpolate,
+                 'contrast': interpolate.InterpolatedUnivariateSpline(s['WA'], s['C_inst'][0]),
+                 'Cmin_abs': s['C_inst'][0].min(), 'samps': samps, 'WA': s['WA']}
+    namespace.update(synthetic.photometry())
+    script = 'DoSComps.py' if name == 'F_v' else 'DoSComps_MC.py'
+    script_functions(os.path.join(os.path.dirname(bench), 'Scripts', script), namespace)
+    if name == 'F_v':
+        # CDF tables as in the script
+        namespace['cdfs'] = dict((d, namespace['phase_cdf'](namespace['pphinv'][d]))
+                                 for d in namespace['pphinv'])
+    if name == 'F_v_MC':
+        # presampled orbits as in the script
+        rng = np.random.RandomState(0)
+        sig = 0.175/np.sqrt(np.pi/2.0)
+        b = np.arccos(1.0 - 2.0*rng.uniform(0.0, 1.0, samps))
+        e = sig*np.sqrt(-2.0*np.log(1.0 - rng.uniform(0.0, 1.0, samps)))
+        M = rng.uniform(0.0, 2.0*np.pi, samps)
+        E = namespace['eccanom'](M, e)
+        namespace.update({'b': b, 'sinb': np.sin(b), 'ecosE': 1.0 - e*np.cos(E)})
+
+    return namespace
+
+def setup(name, n, g, solver):
+    """
+    Generates the inputs of a case
+
+    Returns:
+        run (callable):
+            function of the number of stars evaluating the case
+        ref (callable):
+            function of the number of stars evaluating the reference, None if
+            the case has no reference
+    """
+
+    from DoSFuncs import DoSFuncs
+    obj = DoSFuncs.__new__(DoSFuncs)
+    s = synthetic.stars(n or 1)
+    if g is not None:
+        a, R = synthetic.grid(*g)
+        aa, RR = np.meshgrid(a, R)
+    if name == 'find_ck':
+        args = lambda m: (s['amin'], s['amax'], s['smin'][:m], s['smax'][:m], s['Cmin'], s['pexp'], s['Rexp'])
+        run = lambda m: obj.find_ck(*args(m))
+        ref = lambda m: reference().find_ck(*args(m))
+    elif name == 'completeness':
+        Cmin = obj.find_Cmin(a, s['smin'], s['smax'], s['dist'], s['C_inst'], s['WA'])
+        run = lambda m: obj.completeness(a[None,None,:], R[None,:,None], s['pexp'], s['smin'][:m,None,None],
+                                         s['smax'][:m,None,None], Cmin[:m,None,:])
+        ref = lambda m: np.array([reference().one_DoS_grid(aa, RR, s['pexp'], s['smin'][i], s['smax'][i],
+                                  np.meshgrid(Cmin[i], R)[0]) for i in range(m)])
+    elif name == 'DoS_sum':
+        args = lambda m: (a, aa, R, RR, s['pexp'], s['smin'][:m], s['smax'][:m], s['dist'][:m],
+                          s['C_inst'][:m], s['WA'])
+        run = lambda m: obj.DoS_sum(*args(m))
+        ref = lambda m: reference().DoS_sum(*args(m))
+    elif name == 'select_obs':
+        rng = np.random.RandomState(1)
+        ck = 1e-2*rng.uniform(0.0, 1.0, n)*np.sqrt(s['t_int'])
+        try:
+            imp.find_module('ortools')
+            best = 'cbc'
+        except ImportError:
+            best = 'bb'
+        objective = lambda sInds: np.array([ck[sInds].sum()])
+        run = lambda m: objective(obj.select_obs(s['t_int'], 365.0, ck, solver))
+        ref = lambda m: objective(obj.select_obs(s['t_int'], 365.0, ck, best))
+    elif name == 'find_occurrence':
+        from DoSFuncsMulders import DoSFuncsMulders
+        import astropy.units as u
+        import astropy.constants as const
+        import DoSOccurrence
+        obj = DoSFuncsMulders.__new__(DoSFuncsMulders)
+        # stand-in for the EXOSIMS planet population
+        class PlanetPopulation(object):
+            arange = [a[0], a[-1]]*u.AU
+        class Sim(object):
+            pass
+        obj.sim = Sim()
+        obj.sim.PlanetPopulation = PlanetPopulation()
+        rates, meta = DoSOccurrence.load('Mulders')
+        P = rates['PeriodEdges']*u.day
+        dP = np.log10(P[1:]/P[:-1]).decompose().value
+        dR = np.log10(rates['RpEdges'][1:]/rates['RpEdges'][:-1])
+        ddP, ddR = np.meshgrid(dP, dR)
+        fa = lambda x: np.where((x >= a[0]) & (x <= a[-1]), 1.0, 0.0)/(x*np.log(a[-1]/a[0]))
+        args = (meta['masses']['Gstars']*const.M_sun, ddP, ddR, rates['RpEdges'], P,
+                rates['GstarsMean'], a, R/REinAU, fa, a[0])
+        run = lambda m: obj.find_occurrence(*args)
+        ref = lambda m: reference().find_occurrence(*args)
+    else:
+        namespace = script_namespace(name, s)
+        run = lambda m: np.sum([f.sum(axis=0) for inds, f in namespace['DoS_batch'](
+            aa[0], RR[:,0], s['smin'][:m], s['smax'][:m], s['dist'][:m])], axis=0)
+        # corner average of the completeness of each grid point
+        bins = lambda f: 0.25*(f[:-1,:-1] + f[1:,:-1] + f[:-1,1:] + f[1:,1:])
+        ref = lambda m: np.sum([bins(namespace['F_v'](aa, RR, s['smin'][i], s['smax'][i], s['dist'][i]))
+                                for i in range(m)], axis=0)
+
+    return run, ref
+
+def reference():
+    """Imports the reference implementations"""
+
+    import reference
+
+    return reference
+
+def maxrss():
+    """Maximum resident set size of this process in MB"""
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return rss/2.0**20 if sys.platform == 'darwin' else rss/2.0**10
+
+def measure(name, n, g, mode, solver):
+    """
+    Runs a case in this interpreter
+
+    Returns:
+        res (dict):
+            time and peak memory, or reference stars, time, and relative
+            difference
+    """
+
+    run, ref = setup(name, n, g, solver)
+    if mode == 'time':
+        rss = maxrss()
+        t0 = time.time()
+        run(n)
+        return {'time': time.time() - t0, 'mem': maxrss() - rss}
+    m = n if CASES[name]['ref'] is None else min(n, CASES[name]['ref'])
+    x = np.asarray(run(m))
+    reference()
+    t0 = time.time()
+    y = np.asarray(ref(m))
+    dt = time.time() - t0
+    scale = np.abs(y).max()
+
+    return {'nref': m, 'tref': dt, 'err': float(np.abs(x - y).max()/scale) if scale > 0 else 0.0}
+
+def spawn(name, n, g, mode, solver):
+    """Runs a case in a fresh interpreter and returns its result"""
+
+    cmd = [sys.executable, os.path.abspath(__file__), '--run', name, str(n),
+           'none' if g is None else '%dx%d' % g, mode, solver]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = proc.communicate()
+    if proc.returncode != 0:
+        sys.stderr.write(err.decode('utf-8', 'replace'))
+        return None
+    lines = [line for line in out.decode('utf-8').splitlines() if line.startswith('RESULT ')]
+
+    return json.loads(lines[-1][len('RESULT '):])
+
+def main():
+    parser = argparse.ArgumentParser(description='Depth of search benchmark suite')
+    parser.add_argument('--cases', default=','.join(ORDER))
+    parser.add_argument('--stars', default=None, help='comma separated numbers of stars')
+    parser.add_argument('--grids', default=None, help='comma separated grids, e.g. 30x100')
+    parser.add_argument('--max-time', type=float, default=60.0, help='skip cases estimated to take longer (s)')
+    parser.add_argument('--solver', default='dp', help='solver of the select_obs case')
+    parser.add_argument('--run', nargs=5, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run is not None:
+        name, n, g, mode, solver = args.run
+        n = None if n == 'None' else int(n)
+        g = None if g == 'none' else tuple(int(x) for x in g.split('x'))
+        print('RESULT ' + json.dumps(measure(name, n, g, mode, solver)))
+        return
+
+    print('{:>16} {:>7} {:>9} {:>10} {:>9} {:>6} {:>10} {:>9}'.format(
+        'case', 'nStars', 'grid', 'time (s)', 'peak (MB)', 'nref', 'ref (s)', 'rel diff'))
+    for name in args.cases.split(','):
+        case = CASES[name]
+        stars = case['stars']
+        if args.stars is not None and stars != [None]:
+            stars = [int(x) for x in args.stars.split(',')]
+        grids = case['grids']
+        if args.grids is not None and grids != [None]:
+            grids = [tuple(int(x) for x in spec.split('x')) for spec in args.grids.split(',')]
+        for g in grids:
+            for n in stars:
+                points = 1 if g is None else (g[0] + 1)*(g[1] + 1)
+                if (n or 1)*points*case['cost'] > args.max_time:
+                    continue
+                res = spawn(name, n, g, 'time', args.solver)
+                if res is None:
+                    continue
+                acc = {'nref': '-', 'tref': '-', 'err': '-'}
+                if case['ref'] != 0:
+                    acc = spawn(name, n, g, 'accuracy', args.solver) or acc
+                print('{:>16} {:>7} {:>9} {:10.3f} {:9.1f} {:>6} {:>10} {:>9}'.format(
+                    name, '-' if n is None else n, '-' if g is None else '%dx%d' % g,
+                    res['time'], res['mem'], acc['nref'] if n is not None else '-',
+                    acc['tref'] if acc['tref'] == '-' else '%.3f' % acc['tref'],
+                    acc['err'] if acc['err'] == '-' else '%.1e' % acc['err']))
+                sys.stdout.flush()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,387 @@
+import numpy as np
+import sympy
+from sympy.solvers import solve
+import scipy.integrate as integrate
+import scipy.interpolate as interpolate
+import astropy.constants as const
+
+"""
+Reference implementations for the benchmarks, the versions of the hot
+paths in the first release of the package (per-star adaptive quadrature 
+with sympy roots for find_ck, per-star and per-semi-major axis quadrature
+of Cmin for DoS_sum, and loops over bins for find_occurrence) written as
+functions. They are kept unchanged as the accuracy baseline and are slow, 
+so the benchmarks evaluate them on a subset of stars.
+"""
+
+def find_ck(amin,amax,smin,smax,Cmin,pexp,Rexp):
+    '''Finds ck metric
+
+    Args:
+        amin (float):
+            minimum semi-major axis value in AU
+        amax (float):
+            maximum semi-major axis value in AU
+        smin (ndarray):
+            1D array of minimum separation values in AU
+        smax (ndarray):
+            1D array of maximum separation values in AU
+        Cmin (float):
+            minimum contrast value
+        pexp (float):
+            expected value of geometric albedo
+        Rexp (float):
+            expected value of planetary radius in AU
+
+    Returns:
+        ck (ndarray):
+            1D array of ck metric
+
+    '''
+
+    an = 1.0/np.log(amax/amin)
+    cg = an*(np.sqrt(1.0-(smax/amax)**2) - np.sqrt(1.0-(smin/amax)**2) + np.log(smax/(np.sqrt(1.0-(smax/amax)**2)+1.0))-np.log(smin/(np.sqrt(1.0-(smin/amax)**2)+1.0)))
+
+    # calculate ck
+    anp = an/cg 
+    # intermediate values
+    k1 = np.cos(0.5*(np.pi-np.arcsin(smin/amax)))**4/amax**2
+    k2 = np.cos(0.5*(np.pi-np.arcsin(smax/amax)))**4/amax**2
+    k3 = np.cos(0.5*np.arcsin(smax/amax))**4/amax**2
+    k4 = 27.0/64.0*smax**(-2)
+    k5 = np.cos(0.5*np.arcsin(smin/amax))**4/amax**2
+    k6 = 27.0/64.0*smin**(-2)
+
+    # set up
+    z = sympy.Symbol('z', positive=True)
+    k = sympy.Symbol('k', positive=True)
+    b = sympy.Symbol('b', positive=True)
+    # solve
+    sol = solve(z**4 - z**3/sympy.sqrt(k) + b**2/(4*k), z)
+    # third and fourth roots give valid roots
+    # lambdify these roots
+    sol3 = sympy.lambdify((k,b), sol[2], "numpy")
+    sol4 = sympy.lambdify((k,b), sol[3], "numpy")
+
+    # find ck   
+    ck = np.zeros(smin.shape)
+    kmin = Cmin/(pexp*Rexp**2)
+    for i in xrange(len(ck)):
+        if smin[i] == smax[i]:
+            ck[i] = 0.0
+        else:
+            # equations to integrate
+            al1 = lambda k: sol3(k,smin[i])
+            au1 = lambda k: sol4(k,smin[i])
+            au2 = lambda k: sol3(k,smax[i])
+            al2 = lambda k: sol4(k,smax[i])
+
+            f12 = lambda k: anp[i]/(2.0*np.sqrt(k))*(amax - al1(k))
+            f23 = lambda k: anp[i]/(2.0*np.sqrt(k))*(au2(k) - al1(k))
+            f34 = lambda k: anp[i]/(2.0*np.sqrt(k))*(amax - al2(k) + au2(k) - al1(k))
+            f45 = lambda k: anp[i]/(2.0*np.sqrt(k))*(amax - al1(k))
+            f56 = lambda k: anp[i]/(2.0*np.sqrt(k))*(au1(k) - al1(k))
+            f35 = lambda k: anp[i]/(2.0*np.sqrt(k))*(amax - al2(k) + au2(k) - al1(k))
+            f54 = lambda k: anp[i]/(2.0*np.sqrt(k))*(au1(k) - al2(k) + au2(k) - al1(k))
+            f46 = lambda k: anp[i]/(2.0*np.sqrt(k))*(au1(k) - al1(k))
+
+            if k4[i] < k5[i]:
+                if kmin < k1[i]:
+                    ck[i] = integrate.quad(f12,k1[i],k2[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    if k2[i] != k3[i]:
+                        ck[i] += integrate.quad(f23,k2[i],k3[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    ck[i] += integrate.quad(f34,k3[i],k4[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    ck[i] += integrate.quad(f45,k4[i],k5[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    ck[i] += integrate.quad(f56,k5[i],k6[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                elif (kmin > k1[i]) and (kmin < k2[i]):
+                    ck[i] = integrate.quad(f12,kmin,k2[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    if k2[i] != k3[i]:
+                        ck[i] += integrate.quad(f23,k2[i],k3[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    ck[i] += integrate.quad(f34,k3[i],k4[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    ck[i] += integrate.quad(f45,k4[i],k5[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    ck[i] += integrate.quad(f56,k5[i],k6[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                elif (kmin > k2[i]) and (kmin < k3[i]):
+                    ck[i] = integrate.quad(f23,kmin,k3[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    ck[i] += integrate.quad(f34,k3[i],k4[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    ck[i] += integrate.quad(f45,k4[i],k5[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    ck[i] += integrate.quad(f56,k5[i],k6[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                elif (kmin > k3[i]) and (kmin < k4[i]):
+                    ck[i] = integrate.quad(f34,kmin,k4[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    ck[i] += integrate.quad(f45,k4[i],k5[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    ck[i] += integrate.quad(f56,k5[i],k6[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                elif (kmin > k4[i]) and (kmin < k5[i]):
+                    ck[i] = integrate.quad(f45,kmin,k5[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    ck[i] += integrate.quad(f56,k5[i],k6[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                elif (kmin < k6[i]):
+                    ck[i] = integrate.quad(f56,kmin,k6[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                else:
+                    ck[i] = 0.0
+            else:
+                if kmin < k1[i]:
+                    ck[i] = integrate.quad(f12,k1[i],k2[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    if k2[i] != k3[i]:
+                        ck[i] += integrate.quad(f23,k2[i],k3[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    ck[i] += integrate.quad(f35,k3[i],k5[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    ck[i] += integrate.quad(f54,k5[i],k4[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    ck[i] += integrate.quad(f46,k4[i],k6[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                elif (kmin > k1[i]) and (kmin < k2[i]):
+                    ck[i] = integrate.quad(f12,kmin,k2[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    if k2[i] != k3[i]:
+                        ck[i] += integrate.quad(f23,k2[i],k3[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    ck[i] += integrate.quad(f35,k3[i],k5[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    ck[i] += integrate.quad(f54,k5[i],k4[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    ck[i] += integrate.quad(f46,k4[i],k6[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                elif (kmin > k2[i]) and (kmin < k3[i]):
+                    ck[i] = integrate.quad(f23,kmin,k3[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    ck[i] += integrate.quad(f35,k3[i],k5[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    ck[i] += integrate.quad(f54,k5[i],k4[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    ck[i] += integrate.quad(f46,k4[i],k6[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                elif (kmin > k3[i]) and (kmin < k5[i]):
+                    ck[i] = integrate.quad(f35,kmin,k5[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    ck[i] += integrate.quad(f54,k5[i],k4[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    ck[i] += integrate.quad(f46,k4[i],k6[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                elif (kmin > k5[i]) and (kmin < k4[i]):
+                    ck[i] = integrate.quad(f54,kmin,k4[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                    ck[i] += integrate.quad(f46,k4[i],k6[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                elif (kmin < k6[i]):
+                    ck[i] = integrate.quad(f46,kmin,k6[i],limit=50,epsabs=0,epsrel=1e-4)[0]
+                else:
+                    ck[i] = 0.0
+
+    return ck
+
+def one_DoS_grid(a,R,p,smin,smax,Cmin):
+    '''Calculates completeness for one star on constant semi-major axis--
+    planetary radius grid
+
+    Args:
+        a (ndarray):
+            2D array of semi-major axis values in AU
+        R (ndarray):
+            2D array of planetary radius values in AU
+        p (float):
+            average geometric albedo value
+        smin (float):
+            minimum separation in AU
+        smax (float):
+            maximum separation in AU
+        Cmin (ndarray):
+            2D array of minimum contrast
+
+    Returns:
+        f (ndarray):
+            2D array of depth of search values for one star on 2D grid
+
+    '''
+
+    a = np.array(a, ndmin=1, copy=False)
+    R = np.array(R, ndmin=1, copy=False)
+    Cmin = np.array(Cmin, ndmin=1, copy=False)
+
+    f = np.zeros(a.shape)
+    # work on smax < a first
+    fg = f[smax<a]
+    ag = a[smax<a]
+    Rg = R[smax<a]
+    Cgmin = Cmin[smax<a]
+
+    b1g = np.arcsin(smin/ag)
+    b2g = np.pi-np.arcsin(smin/ag)
+    b3g = np.arcsin(smax/ag)
+    b4g = np.pi-np.arcsin(smax/ag)
+
+    C1g = (p*(Rg/ag)**2*np.cos(b1g/2.0)**4)
+    C2g = (p*(Rg/ag)**2*np.cos(b2g/2.0)**4)
+    C3g = (p*(Rg/ag)**2*np.cos(b3g/2.0)**4)
+    C4g = (p*(Rg/ag)**2*np.cos(b4g/2.0)**4)
+
+    C2g[C2g<Cgmin] = Cgmin[C2g<Cgmin]
+    C3g[C3g<Cgmin] = Cgmin[C3g<Cgmin]
+
+    vals = C3g > C1g
+    C3g[vals] = 0.0
+    C1g[vals] = 0.0
+    vals = C2g > C4g
+    C2g[vals] = 0.0
+    C4g[vals] = 0.0
+
+    fg = (ag/np.sqrt(p*Rg**2)*(np.sqrt(C4g)-np.sqrt(C2g)+np.sqrt(C1g)-np.sqrt(C3g)))
+
+    fl = f[smax>=a]
+    al = a[smax>=a]
+    Rl = R[smax>=a]
+    Clmin = Cmin[smax>=a]
+
+    b1l = np.zeros(al.shape)
+    b1l[smin/al < 1.0] = np.arcsin(smin/al[smin/al < 1.0])
+    b2l = np.pi*np.ones(al.shape)
+    b2l[smin/al < 1.0] = np.pi-np.arcsin(smin/al[smin/al < 1.0])
+
+    C1l = np.ones(al.shape)
+    C1l[smin/al < 1.0] = p*(Rl[smin/al < 1.0]/al[smin/al < 1.0])**2*np.cos(b1l[smin/al < 1.0]/2.0)**4
+    C2l = np.ones(al.shape)
+    C2l[smin/al < 1.0] = p*(Rl[smin/al < 1.0]/al[smin/al < 1.0])**2*np.cos(b2l[smin/al < 1.0]/2.0)**4
+
+    C2l[C2l<Clmin] = Clmin[C2l<Clmin]
+    vals = C2l > C1l
+
+    C1l[vals] = 0.0
+    C2l[vals] = 0.0
+
+    fl = (al/np.sqrt(p*Rl**2)*(np.sqrt(C1l)-np.sqrt(C2l)))
+
+    f[smax<a] = fg
+    f[smax>=a] = fl
+    f[smin>a] = 0.0
+
+    return f
+
+def one_DoS_bins(a,R,p,smin,smax,Cmin):
+    '''Calculates depth of search for each bin by integrating the
+    completeness for given semi-major axis and planetary radius
+
+    Args:
+        a (ndarray):
+            2D grid of semi-major axis bin edges in AU
+        R (ndarray):
+            2D grid of planetary radius bin edges in R_Earth
+        p (float):
+            expected value of geometric albedo
+        smin (float):
+            minimum separation in AU
+        smax (float):
+            maximum separation in AU
+        Cmin (ndarray):
+            2D grid of minimum contrast
+
+    Returns:
+        f (ndarray):
+            2D array of depth of search values in each bin
+
+    '''
+
+    tmp = one_DoS_grid(a,R,p,smin,smax,Cmin)
+    f = 0.25*(tmp[:-1,:-1]+tmp[1:,:-1]+tmp[:-1,1:]+tmp[1:,1:])
+
+    return f
+
+def DoS_sum(a,aa,R,RR,pexp,smin,smax,dist,C_inst,WA):
+    '''Sums the depth of search
+
+    Args:
+        a (ndarray):
+            1D array of semi-major axis bin edge values in AU
+        aa (ndarray):
+            2D grid of semi-major axis bin edge values in AU
+        R (ndarray):
+            1D array of planetary radius bin edge values in AU
+        RR (ndarray):
+            2D grid of planetary radius bin edge values in AU
+        pexp (float):
+            expected value of geometric albedo
+        smin (ndarray):
+            1D array of minimum separation values in AU
+        smax (ndarray):
+            1D array of maximum separation values in AU
+        dist (ndarray):
+            1D array of stellar distance values in pc
+        C_inst (ndarray):
+            instrument contrast at working angle
+        WA (ndarray):
+            working angles in arcseconds
+
+    Returns:
+        DoS (ndarray):
+            2D array of depth of search values summed for input stellar list
+
+    '''
+
+    DoS = np.zeros((aa.shape[0]-1,aa.shape[1]-1))
+    for i in xrange(len(smin)):
+        Cs = interpolate.InterpolatedUnivariateSpline(WA, C_inst[i], k=1,ext=3)
+        Cmin = np.zeros(a.shape)
+        # expected value of Cmin calculations for each separation
+        for j in xrange(len(a)):
+            if a[j] < smin[i]:
+                Cmin[j] = 1.0
+            else:
+                if a[j] > smax[i]:
+                    su = smax[i]
+                else:
+                    su = a[j]
+                # find expected value of minimum contrast from contrast curve
+                tup = np.sqrt(1.0-(smin[i]/a[j])**2)
+                tlow = np.sqrt(1.0-(su/a[j])**2)
+                f = lambda t,a=a[j],d=dist[i]: Cs(a*np.sqrt(1.0-t**2)/d)
+                val = integrate.quad(f, tlow, tup, epsabs=0,epsrel=1e-3,limit=100)[0]
+                Cmin[j] = val/(tup - tlow)
+
+        CC,RR = np.meshgrid(Cmin,R)
+        tmp = one_DoS_bins(aa,RR,pexp,smin[i],smax[i],CC)
+        DoS += tmp
+
+    return DoS
+
+def find_occurrence(Mass,ddP,ddR,R,P,Matrix,aedges,Redges,fa,amin):
+    '''Extrapolates occurrence rates from Mulders 2015
+
+    Args:
+        Mass (Quantity):
+            Stellar type mass astropy Quantity in kg
+        ddP (ndarray):
+            2D array of log differences in period (days) from Mulders
+        ddR (ndarray):
+            2D array of log differences in planetary radius (R_earth) from Mulders
+        R (ndarray):
+            1D array of planetary radius values from Mulders
+        P (Quantity):
+            1D array of period values astropy Quantity in days from Mulders
+        Matrix (ndarray):
+            2D array of occurrence rates from Mulders
+        aedges (ndarray):
+            1D array of desired semi-major axis grid in AU
+        Redges (ndarray):
+            1D array of desired planetary radius grid in R_earth
+        fa (callable):
+            probability density function of semi-major axis
+        amin (float):
+            minimum semi-major axis in AU
+
+    Returns:
+        etas (ndarray):
+            2D array of extrapolated occurrence rates
+
+    '''
+
+    sma = ((const.G*Mass*P**2/(4.0*np.pi**2))**(1.0/3.0)).decompose().to('AU').value
+
+    occ = Matrix*ddP*ddR
+    occAll = np.sum(occ, axis=1)
+
+    etas = np.zeros((len(Redges)-1,len(aedges)-1))
+    fac1 = integrate.quad(fa, amin, sma[-1])[0]
+    # occurrence rate as function of R
+    Rvals = np.zeros((len(Redges)-1,))
+    for i in xrange(len(Redges)-1):
+        for j in xrange(len(R)):
+            if Redges[i] < R[j]:
+                break
+        for k in xrange(len(R)):
+            if Redges[i+1] < R[k]:
+                break
+        if k-j == 0:
+            Rvals[i] = (Redges[i+1]-Redges[i])/(R[j]-R[j-1])*occAll[j-1]
+        elif k-j == 1:
+            Rvals[i] = (R[j]-Redges[i])/(R[j]-R[j-1])*occAll[j-1]
+            Rvals[i] += (Redges[i+1]-R[j])/(R[j+1]-R[j])*occAll[j]
+        else:
+            Rvals[i] = (R[j]-Redges[i])/(R[j]-R[j-1])*occAll[j-1]
+            Rvals[i] += np.sum(occAll[j:k-1])
+            Rvals[i] += (Redges[i+1]-R[k-1])/(R[k]-R[k-1])*occAll[k-1]
+
+    # extrapolate to new grid
+    for i in xrange(len(aedges)-1):
+        fac2 = integrate.quad(fa, aedges[i], aedges[i+1])[0]
+        etas[:,i] = Rvals*fac2/fac1
+
+    return etas
@@ -0,0 +1,105 @@
+'''
+Synthetic inputs for the benchmarks, so that no EXOSIMS simulation, star
+catalog, or photometric data files are needed. Stars have log-uniform
+distances, contrast curves with random depth, and log-uniform integration
+times similar to filtered EXOCAT target lists. Grids of planetary radius
+by semi-major axis bins span the default EXOSIMS ranges.
+'''
+
+import numpy as np
+
+# working angles in arcsec and separation in AU of a star at 1 pc
+IWA = 0.15
+OWA = 0.45
+
+def stars(n, seed=0, nWA=50):
+    '''
+    Generates a synthetic target list
+
+    Args:
+        n (int):
+            number of stars
+        seed (int):
+            random seed (optional)
+        nWA (int):
+            number of working angles of the contrast curves (optional)
+
+    Returns:
+        s (dict):
+            dictionary of 1D arrays 'dist' (pc), 'smin' and 'smax' (AU),
+            't_int' (days), 'WA' (arcsec), 2D array 'C_inst' of the contrast
+            curve of each star, and the ck parameters 'amin', 'amax' (AU),
+            'Cmin', 'pexp', and 'Rexp' (AU)
+    '''
+
+    rng = np.random.RandomState(seed)
+    dist = np.exp(rng.uniform(np.log(3.0), np.log(30.0), n))
+    WA = np.linspace(IWA, OWA, nWA)
+    depth = rng.uniform(1.0, 30.0, (n, 1))
+    C_inst = 1e-9*(1.0 + 3.0*(WA[None,:] - 0.5*(IWA + OWA))**2*depth)
+    t_int = np.exp(rng.uniform(np.log(0.01), np.log(30.0), n))
+    s = {'dist': dist, 'smin': IWA*dist, 'smax': OWA*dist, 't_int': t_int, 'WA': WA,
+         'C_inst': C_inst, 'amin': 0.1, 'amax': 30.0, 'Cmin': 1e-9, 'pexp': 0.3,
+         'Rexp': 3.0*4.26352e-5}
+
+    return s
+
+def grid(nR, na, amin=0.1, amax=30.0, Rmin=0.5, Rmax=22.6):
+    '''
+    Generates logarithmically spaced bin edges
+
+    Args:
+        nR (int):
+            number of planetary radius bins
+        na (int):
+            number of semi-major axis bins
+        amin, amax (float):
+            semi-major axis range in AU (optional)
+        Rmin, Rmax (float):
+            planetary radius range in R_earth (optional)
+
+    Returns:
+        aedges (ndarray):
+            1D array of semi-major axis bin edges in AU
+        Redges (ndarray):
+            1D array of planetary radius bin edges in AU
+    '''
+
+    aedges = np.logspace(np.log10(amin), np.log10(amax), na+1)
+    Redges = np.logspace(np.log10(Rmin), np.log10(Rmax), nR+1)*4.26352e-5
+
+    return aedges, Redges
+
+def photometry(p=0.3, dists=(0.5, 1.0, 2.0, 5.0, 10.0)):
+    '''
+    Generates p*Phi(beta) interpolants with a Lambert phase function in
+    place of the STScI photometric grids used by the DoSComps scripts
+
+    Args:
+        p (float):
+            geometric albedo (optional)
+        dists (tuple):
+            semi-major axis values in AU of the interpolants (optional)
+
+    Returns:
+        phot (dict):
+            dictionary with 'pphi' and 'pphinv' (interpolants of p*Phi and
+            its inverse keyed by semi-major axis) and 'distinterp' (nearest
+            semi-major axis of the interpolants), as defined in the scripts
+    '''
+
+    import scipy.interpolate as interpolate
+
+    dists = np.array(dists)
+    distinterp = interpolate.interp1d(dists, dists, kind='nearest', bounds_error=False,
+                                      fill_value=(dists.min(), dists.max()))
+    beta = np.linspace(0.0, np.pi, 200)
+    pphi = {}
+    pphinv = {}
+    for d in dists:
+        tmpphi = p*(np.sin(beta) + (np.pi - beta)*np.cos(beta))/np.pi
+        pphi[d] = interpolate.InterpolatedUnivariateSpline(beta, tmpphi, k=1, ext=1)
+        inds = np.argsort(tmpphi)
+        pphinv[d] = interpolate.InterpolatedUnivariateSpline(tmpphi[inds], beta[inds], k=1, ext=1)
+
+    return {'pphi': pphi, 'pphinv': pphinv, 'distinterp': distinterp}
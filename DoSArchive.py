@@ -0,0 +1,426 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16, 2026
+"""
+
+import numpy as np
+import os
+import json
+import shutil
+
+MAGIC = 'DOSARC'
+VERSION = 1
+
+class DoSArchive(object):
+    '''Chunked columnar archive of depth of search results
+
+    An archive is a directory with an index file 'index.json' and one
+    subdirectory per array. Each array is stored in chunks of whole rows
+    (along its first axis) as raw little-endian files '<name>/<k>.bin', so
+    rows can be appended without rewriting earlier chunks, and reads
+    memory-map only the chunks which hold the rows asked for. Array names
+    may contain '/' to group arrays, e.g. 'DoS/Mstars'. Rows may be labeled,
+    e.g. with target names, and the labels are appended one JSON string per
+    line to '<name>/labels.json'. The index holds the dtype, shape, and
+    chunk size of each array, the byte length of the labels written, and
+    JSON serializable attributes. It is replaced atomically after the data
+    is written, so an interrupted append leaves the archive as it was
+    before.
+
+    Args:
+        path (str):
+            directory of the archive
+        mode (str):
+            'r' to read, 'a' to read and append (creating the archive if
+            needed), or 'w' to create a new archive, replacing an existing
+            archive (optional)
+        chunk_bytes (int):
+            target size in bytes of the chunks of new arrays (optional)
+
+    Attributes:
+        path (str):
+            directory of the archive
+        mode (str):
+            mode the archive was opened with
+        attrs (dict):
+            JSON serializable attributes of the archive, saved by update
+
+    '''
+
+    def __init__(self, path, mode='r', chunk_bytes=2**24):
+        if mode not in ('r', 'a', 'w'):
+            raise ValueError('mode must be one of \'r\', \'a\', or \'w\'')
+        self.path = path
+        self.mode = mode
+        self.chunk_bytes = int(chunk_bytes)
+        index = os.path.join(path, 'index.json')
+        if mode == 'w' and os.path.isdir(path):
+            if os.path.exists(index):
+                # only a directory holding a result archive is replaced
+                try:
+                    with open(index, 'r') as f:
+                        header = json.load(f)
+                except ValueError:
+                    header = None
+                if not isinstance(header, dict) or header.get('format') != MAGIC:
+                    raise ValueError('%r is not empty and is not a result archive' % (path))
+                shutil.rmtree(path)
+            elif os.listdir(path):
+                raise ValueError('%r is not empty and is not a result archive' % (path))
+        if mode == 'r' or os.path.exists(index):
+            with open(index, 'r') as f:
+                header = json.load(f)
+            if header.get('format') != MAGIC:
+                raise ValueError('%r is not a result archive' % (path))
+            if header['version'] != VERSION:
+                raise ValueError('%r has result archive format version %r, expected %r' \
+                                 % (path, header['version'], VERSION))
+            self._arrays = header['arrays']
+            self.attrs = header['attrs']
+        else:
+            if not os.path.isdir(path):
+                os.makedirs(path)
+            self._arrays = {}
+            self.attrs = {}
+            self._save_index()
+        # row labels of each array, read on first use
+        self._labels = {}
+
+    def keys(self, prefix=None):
+        '''Returns the names of the arrays in the archive
+
+        Args:
+            prefix (str):
+                only names starting with prefix+'/' are returned, with the
+                prefix removed (optional)
+
+        Returns:
+            keys (list):
+                sorted list of array names
+
+        '''
+
+        if prefix is None:
+            return sorted(self._arrays)
+        n = len(prefix) + 1
+
+        return sorted(key[n:] for key in self._arrays if key.startswith(prefix+'/'))
+
+    def __contains__(self, name):
+        return name in self._arrays
+
+    def __getitem__(self, name):
+        return self.read(name)
+
+    def shape(self, name):
+        '''Returns the shape of an array
+
+        Args:
+            name (str):
+                name of the array
+
+        Returns:
+            shape (tuple):
+                shape of the array, the first axis is the number of rows
+
+        '''
+
+        return tuple(self._entry(name)['shape'])
+
+    def labels(self, name):
+        '''Returns the row labels of an array
+
+        Args:
+            name (str):
+                name of the array
+
+        Returns:
+            labels (list):
+                list of the label of each row, None if the array has no labels
+
+        '''
+
+        entry = self._entry(name)
+        if entry['labels'] is None:
+            return None
+        if name not in self._labels:
+            with open(self._file(name, 'labels.json'), 'rb') as f:
+                lines = f.read(entry['labels']).decode('utf-8').splitlines()
+            self._labels[name] = [json.loads(line) for line in lines]
+
+        return self._labels[name]
+
+    def row(self, name, label):
+        '''Finds the index of a labeled row
+
+        Args:
+            name (str):
+                name of the array
+            label (str):
+                label of the row
+
+        Returns:
+            i (int):
+                index of the first row with the label
+
+        '''
+
+        labels = self.labels(name)
+        if labels is None or label not in labels:
+            raise KeyError('%r has no row labeled %r' % (name, label))
+
+        return labels.index(label)
+
+    def read(self, name, rows=None):
+        '''Reads rows of an array, only the chunks holding the rows are
+        memory-mapped
+
+        Args:
+            name (str):
+                name of the array
+            rows (int, str, or slice):
+                index, label, or slice of the rows, all rows if None
+                (optional)
+
+        Returns:
+            x (ndarray):
+                array of the rows, a read-only memory-mapped view if the rows
+                are in one chunk
+
+        '''
+
+        entry = self._entry(name)
+        shape = tuple(entry['shape'])
+        if isinstance(rows, basestring):
+            rows = self.row(name, rows)
+        if rows is None:
+            rows = slice(None)
+        if not isinstance(rows, slice):
+            i = int(rows)
+            if i < 0:
+                i += shape[0]
+            if i < 0 or i >= shape[0]:
+                raise IndexError('row %r out of range for %r with %r rows' % (rows, name, shape[0]))
+            return self._chunk(name, i//entry['chunk'])[i%entry['chunk']]
+        start, stop, step = rows.indices(shape[0])
+        if step != 1:
+            return self.read(name, slice(start, stop))[::step]
+        if stop <= start:
+            return np.zeros((0,) + shape[1:], dtype=entry['dtype'])
+        first, last = start//entry['chunk'], (stop - 1)//entry['chunk']
+        parts = []
+        for k in xrange(first, last + 1):
+            lo = max(start - k*entry['chunk'], 0)
+            hi = min(stop - k*entry['chunk'], entry['chunk'])
+            parts.append(self._chunk(name, k)[lo:hi])
+        if len(parts) == 1:
+            return parts[0]
+
+        return np.concatenate(parts)
+
+    def group(self, prefix):
+        '''Reads all arrays under a prefix, e.g. 'DoS'
+
+        Args:
+            prefix (str):
+                prefix of the array names
+
+        Returns:
+            arrays (dict):
+                dictionary of memory-mapped arrays keyed by name without the
+                prefix
+
+        '''
+
+        return dict((key, self.read(prefix+'/'+key)) for key in self.keys(prefix))
+
+    def results(self):
+        '''Reads an archive written by DoSFuncs.save_archive as a result
+        dictionary with memory-mapped arrays
+
+        Returns:
+            result (dict):
+                dictionary with the keys of DoSFuncs.result, and 'stars' with
+                the observed star table and 'outspec'
+
+        '''
+
+        result = {'aedges': self.read('aedges'), 'Redges': self.read('Redges'), \
+                  'NumObs': self.attrs['NumObs'], 'stars': self.group('stars'), \
+                  'outspec': self.attrs['outspec']}
+        for name in ['DoS', 'occ_rates', 'DoS_occ']:
+            result[name] = self.group(name)
+        if self.attrs.get('selection') is not None:
+            result['selection'] = self.attrs['selection']
+        if self.keys('DoS_stars'):
+            from DoSStars import DoSStars
+            result['DoS_stars'] = DoSStars(**self.group('DoS_stars'))
+
+        return result
+
+    def write(self, name, x, labels=None):
+        '''Writes an array, replacing any array of the same name
+
+        Args:
+            name (str):
+                name of the array
+            x (ndarray):
+                array with at least one dimension, rows along the first axis
+            labels (list):
+                list of string labels of the rows (optional)
+
+        '''
+
+        self._writable()
+        x = self._asarray(x)
+        if name in self._arrays:
+            del self._arrays[name]
+            self._labels.pop(name, None)
+            shutil.rmtree(self._file(name))
+        self.create(name, x.shape[1:], x.dtype, labels is not None)
+        self.append(name, x, labels)
+
+    def create(self, name, shape, dtype, labeled=False):
+        '''Creates an empty array to which rows are appended
+
+        Args:
+            name (str):
+                name of the array
+            shape (tuple):
+                shape of one row
+            dtype (dtype):
+                data type of the array
+            labeled (bool):
+                True if rows are appended with labels (optional)
+
+        '''
+
+        self._writable()
+        if name in self._arrays:
+            raise ValueError('%r already exists' % (name))
+        if '..' in name.split('/') or name.startswith('/'):
+            raise ValueError('%r is not a valid array name' % (name))
+        dtype = np.dtype(dtype).newbyteorder('<')
+        if dtype.hasobject:
+            raise ValueError('arrays of Python objects cannot be stored')
+        rowbytes = max(dtype.itemsize*int(np.prod(shape)), 1)
+        if os.path.isdir(self._file(name)):
+            # left by an interrupted write
+            shutil.rmtree(self._file(name))
+        os.makedirs(self._file(name))
+        self._arrays[name] = {'dtype': dtype.str, 'shape': [0] + [int(n) for n in shape], \
+                              'chunk': max(self.chunk_bytes//rowbytes, 1), \
+                              'labels': 0 if labeled else None}
+        if labeled:
+            open(self._file(name, 'labels.json'), 'wb').close()
+        self._save_index()
+
+    def append(self, name, x, labels=None):
+        '''Appends rows to an array, creating the array if needed
+
+        Args:
+            name (str):
+                name of the array
+            x (ndarray):
+                array of the rows, rows along the first axis
+            labels (list):
+                list of string labels of the rows, needed if the array is
+                labeled (optional)
+
+        '''
+
+        self._writable()
+        x = self._asarray(x)
+        if name not in self._arrays:
+            self.create(name, x.shape[1:], x.dtype, labels is not None)
+        entry = self._arrays[name]
+        if tuple(x.shape[1:]) != tuple(entry['shape'][1:]):
+            raise ValueError('rows of shape %r cannot be appended to %r with rows of shape %r' \
+                             % (x.shape[1:], name, tuple(entry['shape'][1:])))
+        if (labels is None) != (entry['labels'] is None) or \
+                (labels is not None and len(labels) != len(x)):
+            raise ValueError('labels must be given for each row of labeled arrays only')
+        x = np.ascontiguousarray(x, dtype=np.dtype(entry['dtype']))
+        rowbytes = x.itemsize*int(np.prod(x.shape[1:]))
+        n = entry['shape'][0]
+        i = 0
+        while i < len(x):
+            k, j = divmod(n + i, entry['chunk'])
+            m = min(entry['chunk'] - j, len(x) - i)
+            with open(self._file(name, '%d.bin' % (k)), 'ab') as f:
+                # drop bytes of an interrupted append
+                f.truncate(j*rowbytes)
+                f.write(x[i:i+m].tobytes())
+            i += m
+        if labels is not None:
+            text = u''.join(json.dumps(unicode(label)) + u'\n' for label in labels).encode('utf-8')
+            with open(self._file(name, 'labels.json'), 'ab') as f:
+                f.truncate(entry['labels'])
+                f.write(text)
+            entry['labels'] += len(text)
+            if name in self._labels:
+                self._labels[name].extend(unicode(label) for label in labels)
+        entry['shape'][0] = n + len(x)
+        self._save_index()
+
+    def update(self, **attrs):
+        '''Sets attributes of the archive and saves them
+
+        Args:
+            **attrs:
+                JSON serializable attributes
+
+        '''
+
+        self._writable()
+        self.attrs.update(attrs)
+        self._save_index()
+
+    def _entry(self, name):
+        '''Returns the index entry of an array'''
+
+        if name not in self._arrays:
+            raise KeyError('%r is not in the archive %r' % (name, self.path))
+
+        return self._arrays[name]
+
+    def _file(self, name, *parts):
+        '''Returns the path of the directory of an array or a file in it'''
+
+        return os.path.join(self.path, *(name.split('/') + list(parts)))
+
+    def _chunk(self, name, k):
+        '''Memory-maps the rows written to one chunk of an array'''
+
+        entry = self._arrays[name]
+        shape = tuple(entry['shape'])
+        n = min(shape[0] - k*entry['chunk'], entry['chunk'])
+        if n*int(np.prod(shape[1:])) == 0:
+            return np.zeros((n,) + shape[1:], dtype=entry['dtype'])
+
+        return np.memmap(self._file(name, '%d.bin' % (k)), dtype=entry['dtype'], mode='r', \
+                         shape=(n,) + shape[1:])
+
+    def _asarray(self, x):
+        '''Checks that an array has rows'''
+
+        x = np.asarray(x)
+        if x.ndim == 0:
+            raise ValueError('arrays must have at least one dimension, store scalars in attrs')
+
+        return x
+
+    def _writable(self):
+        '''Checks that the archive was opened for writing'''
+
+        if self.mode == 'r':
+            raise IOError('%r was opened read-only' % (self.path))
+
+    def _save_index(self):
+        '''Replaces the index file atomically'''
+
+        header = {'format': MAGIC, 'version': VERSION, 'arrays': self._arrays, 'attrs': self.attrs}
+        tmp = os.path.join(self.path, 'index.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(header, f, sort_keys=True)
+        os.rename(tmp, os.path.join(self.path, 'index.json'))
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16, 2026
+"""
+
+import numpy as np
+import os
+import json
+import hashlib
+from version import __version__
+
+class DoSCache(object):
+    '''Content-addressed on-disk cache of intermediate depth of search results
+    
+    Results for each stage of the calculations are stored as arrays in 
+    '<directory>/<key>/<stage>.npz' where key is a hash of the resolved 
+    EXOSIMS outspec, the class name, the constructor arguments, and the 
+    package version. The cache is disabled when directory is None: load 
+    always returns None and save does nothing.
+    
+    Args:
+        directory (str):
+            directory for cached results (optional)
+        outspec (dict):
+            EXOSIMS.MissionSim output specification
+        name (str):
+            name of the class producing the results
+        args (dict):
+            constructor arguments which determine the results
+    
+    Attributes:
+        path (str):
+            directory for the cached results of this key, None if disabled
+        key (str):
+            hash of the specification
+    
+    '''
+    
+    def __init__(self, directory=None, outspec=None, name=None, args=None):
+        if directory is None:
+            self.path = None
+            self.key = None
+            return
+        outspec = dict(outspec)
+        # the random seed does not change the depth of search results
+        outspec.pop('seed', None)
+        spec = {'outspec': outspec, 'name': name, 'args': args, 'version': __version__}
+        spec = json.dumps(spec, sort_keys=True, default=str)
+        self.key = hashlib.sha1(spec.encode('utf-8')).hexdigest()
+        self.path = os.path.join(directory, self.key)
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+            with open(os.path.join(self.path, 'spec.json'), 'w') as f:
+                f.write(spec)
+            print 'Created cache %r' % (self.path)
+        
+    def load(self, stage):
+        '''Loads arrays stored for a stage
+        
+        Args:
+            stage (str):
+                name of the stage
+        
+        Returns:
+            arrays (dict):
+                dictionary of arrays stored for the stage, None if the stage 
+                is not in the cache
+        
+        '''
+        
+        if self.path is None:
+            return None
+        path = os.path.join(self.path, stage+'.npz')
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as f:
+            arrays = dict((key, f[key]) for key in f.files)
+        
+        return arrays
+    
+    def save(self, stage, **arrays):
+        '''Stores arrays for a stage
+        
+        The file is written under a temporary name and renamed so that an 
+        interrupted run never leaves a partial stage in the cache.
+        
+        Args:
+            stage (str):
+                name of the stage
+            **arrays (ndarray):
+                arrays to store, keyed by name
+        
+        '''
+        
+        if self.path is None:
+            return
+        path = os.path.join(self.path, stage+'.npz')
+        tmp = os.path.join(self.path, stage+'.tmp.%d.npz' % os.getpid())
+        np.savez(tmp, **arrays)
+        os.rename(tmp, path)
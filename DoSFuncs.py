@@ -8,21 +8,13 @@ Updated Mon Oct 22, 2018
 
 import numpy as np
 import os
-import EXOSIMS.MissionSim as MissionSim
-import sympy
-from sympy.solvers import solve
-import scipy.integrate as integrate
-import scipy.interpolate as interpolate
-import scipy.optimize as optimize
-import astropy.constants as const
-import astropy.units as u
+import json
+from DoSMonitor import DoSMonitor
 try:
     import cPickle as pickle
 except:
     import pickle
-from ortools.linear_solver import pywraplp
-import matplotlib.pyplot as plt
-import matplotlib.ticker as ticker
+# EXOSIMS, scipy, astropy, ortools, and matplotlib are imported in methods
 
 class DoSFuncs(object):
     '''Calculates depth of search values for a given input EXOSIMS json script. 
@@ -32,7 +24,7 @@ class DoSFuncs(object):
     path to a fits file or a constant value, otherwise the default contrast 
     value from EXOSIMS will be used
     
-    path must be specified
+    path or sim must be specified, see from_arrays for inputs given as arrays
     
     Args:
         path (str):
@@ -49,40 +41,122 @@ class DoSFuncs(object):
             limiting dMag value for integration time calculation (optional)
         WA_targ (astropy Quantity):
             working angle for target astrophysical contrast (optional)
+        n_jobs (int):
+            number of processes for depth of search calculations, -1 uses 
+            all cores (optional)
+        cache_dir (str):
+            directory for cached intermediate results, results are reused
+            when the outspec and arguments are unchanged (optional)
+        store_stars (bool):
+            if True, the depth of search of each observed star is kept in
+            result['DoS_stars'] (optional)
+        solver (str):
+            solver for the selection of observed stars: 'cbc', 'bb', 'dp', or
+            'greedy', see select_obs (optional)
+        timeLimit (float):
+            maximum time in seconds for the selection solver (optional)
+        block_mem (float):
+            memory budget in MB for each block of stars in the depth of 
+            search calculations (optional)
+        refine_tol (float):
+            if given, depth of search bins whose corner completeness values
+            differ by more than refine_tol are refined, see DoS_refine 
+            (optional)
+        refine_depth (int):
+            maximum number of times a depth of search bin is split when 
+            refine_tol is given (optional)
+        group_by (tuple):
+            TargetList attribute name and bins grouping the stars in 
+            addition to star_groups, see attribute_groups, e.g. ('Spec', 2)
+            for spectral subclasses or ('dist', [0, 5, 10, 20]) for distance
+            shells in pc (optional)
+        sim (object):
+            object providing the parts of EXOSIMS.MissionSim used here, such
+            as DoSSim.ArraySim, used instead of path (optional)
+        monitor (DoSMonitor):
+            records time, memory, star counts, and evaluation counts of each
+            stage, True for a new DoSMonitor, disabled if None (optional)
             
     Attributes:
         result (dict):
             dictionary containing results of the depth of search calculations
             Keys include:
                 NumObs (dict):
-                    dictionary containing number of observations, key is: 'all' 
+                    dictionary containing number of observations, key is: 'all',
+                    and the keys of the group_by groups
                 aedges (ndarray):
                     1D array of semi-major axis bin edges in AU
                 Redges (ndarray):
                     1D array of planetary radius bin edges in R_earth
                 DoS (dict):
-                    dictionary containing 2D array of depth of search key is: 'all'
+                    dictionary containing 2D array of depth of search key is: 'all',
+                    and the keys of the group_by groups
                 occ_rates (dict):
                     dictionary containing 2D array of occurrence rates determined
                     from EXOSIMS PlanetPopulation, key is: 'all'
                 DoS_occ (dict):
                     dictionary containing 2D array of depth of search convolved
-                    with the extrapolated occurrence rates, keys is: 'all',
+                    with the extrapolated occurrence rates, key is: 'all', 
+                    and the keys of the group_by groups
+                DoS_stars (DoSStars):
+                    sparse store of depth of search for each observed star,
+                    only included if store_stars is True
+                selection (dict):
+                    solver, objective, bound, relative optimality gap, 
+                    optimal flag, and solver time of the selection of 
+                    observed stars
+                monitor (dict):
+                    summary of the stages from DoSMonitor.summary, only
+                    included if monitor is enabled
         sim (object):
-            EXOSIMS.MissionSim object used to generate target list and 
-            integration times
+            EXOSIMS.MissionSim object (or the sim given) used to generate 
+            target list and integration times
         outspec (dict):
             EXOSIMS.MissionSim output specification
+        candidates (dict):
+            separations, integration times, ck, instrument contrast, and 
+            groups of the stars considered for observation, and the indices 
+            of the selected stars, used by sweep and stream
+        star_columns (list):
+            TargetList attributes of the observed stars saved by save_archive
+        monitor (DoSMonitor):
+            instrumentation of the stages, disabled by default
     
     '''
     
-    def __init__(self, path=None, abins=100, Rbins=30, maxTime=365.0, intCutoff=30.0, dMag=None, WA_targ=None):
-        if path is None:
-            raise ValueError('path must be specified')
-        if path is not None:
-            # generate EXOSIMS.MissionSim object to calculate integration times
-            self.sim = MissionSim.MissionSim(scriptfile=path)
-            print 'Acquired EXOSIMS data from %r' % (path)
+    star_columns = ['Name', 'Spec', 'dist', 'Vmag', 'L', 'MsTrue']
+    monitor = DoSMonitor(enabled=False)
+    
+    def __init__(self, path=None, abins=100, Rbins=30, maxTime=365.0, intCutoff=30.0, dMag=None, WA_targ=None, n_jobs=1, cache_dir=None, store_stars=False, solver='cbc', timeLimit=None, block_mem=64.0, refine_tol=None, refine_depth=3, group_by=None, sim=None, monitor=None):
+        if path is None and sim is None:
+            raise ValueError('path or sim must be specified')
+        import scipy.integrate as integrate
+        import scipy.interpolate as interpolate
+        import scipy.optimize as optimize
+        import astropy.units as u
+        from DoSCache import DoSCache
+        from DoSStars import DoSStars
+        # constructor arguments which determine the cached results
+        args = {'abins': abins, 'Rbins': Rbins, 'maxTime': maxTime, \
+                'intCutoff': intCutoff, 'dMag': dMag, 'WA_targ': WA_targ, \
+                'solver': solver, 'timeLimit': timeLimit, \
+                'refine_tol': refine_tol, 'refine_depth': refine_depth, \
+                'group_by': group_by}
+        # instrumentation of the stages, see DoSMonitor
+        if monitor is True:
+            monitor = DoSMonitor()
+        elif monitor is None:
+            monitor = DoSMonitor(enabled=False)
+        self.monitor = monitor
+        monitor.start()
+        with monitor.stage('sim'):
+            if path is not None:
+                import EXOSIMS.MissionSim as MissionSim
+                # generate EXOSIMS.MissionSim object to calculate integration times
+                self.sim = MissionSim.MissionSim(scriptfile=path)
+                print 'Acquired EXOSIMS data from %r' % (path)
+            else:
+                self.sim = sim
         if dMag is not None:
             try:
                 float(dMag)
@@ -96,6 +170,11 @@ class DoSFuncs(object):
             except TypeError:
                 print 'WA_targ can have only one value'
         self.result = {}
+        # cache of intermediate results
+        if cache_dir is not None:
+            cache = DoSCache(cache_dir, self.sim.genOutSpec(), type(self).__name__, args)
+        else:
+            cache = DoSCache()
         # minimum and maximum values of semi-major axis and planetary radius
         # NO astropy Quantities
         amin = self.sim.PlanetPopulation.arange[0].to('AU').value
@@ -110,61 +189,308 @@ class DoSFuncs(object):
         if Rmax > 45.0:
             print 'Rmax reset to 45.0*R_earth'
         assert Rmax > Rmin, 'Maximum planetary radius is less than minimum planetary radius'
-        # need to get Cmin from contrast curve
-        mode = filter(lambda mode: mode['detectionMode'] == True, self.sim.OpticalSystem.observingModes)[0]
-        WA = np.linspace(mode['IWA'], mode['OWA'], 50)
-        syst = mode['syst']
-        lam = mode['lam']
-        if dMag is None:
-            # use dMagLim when dMag not specified
-            dMag = self.sim.Completeness.dMagLim
-        fZ = self.sim.ZodiacalLight.fZ0
-        fEZ = self.sim.ZodiacalLight.fEZ0
-        if WA_targ is None:
-            core_contrast = syst['core_contrast'](lam,WA)
-            contrast = interpolate.interp1d(WA.to('arcsec').value, core_contrast, \
-                                    kind='cubic', fill_value=1.0)
-            # find minimum value of contrast
-            opt = optimize.minimize_scalar(contrast, \
-                                       bounds=[mode['IWA'].to('arcsec').value, \
-                                               mode['OWA'].to('arcsec').value],\
-                                               method='bounded')
+        with monitor.stage('setup'):
+            # need to get Cmin from contrast curve
+            mode = filter(lambda mode: mode['detectionMode'] == True, self.sim.OpticalSystem.observingModes)[0]
+            WA = np.linspace(mode['IWA'], mode['OWA'], 50)
+            syst = mode['syst']
+            lam = mode['lam']
+            if dMag is None:
+                # use dMagLim when dMag not specified
+                dMag = self.sim.Completeness.dMagLim
+            fZ = self.sim.ZodiacalLight.fZ0
+            fEZ = self.sim.ZodiacalLight.fEZ0
+            if WA_targ is None:
+                core_contrast = syst['core_contrast'](lam,WA)
+                contrast = interpolate.interp1d(WA.to('arcsec').value, core_contrast, \
+                                        kind='cubic', fill_value=1.0)
+                # find minimum value of contrast
+                opt = optimize.minimize_scalar(contrast, \
+                                           bounds=[mode['IWA'].to('arcsec').value, \
+                                                   mode['OWA'].to('arcsec').value],\
+                                                   method='bounded')
+                Cmin = opt.fun
+                WA_targ = opt.x*u.arcsec
+        
+            t_int1 = self.sim.OpticalSystem.calc_intTime(self.sim.TargetList,np.array([0]),fZ,fEZ,dMag,WA_targ,mode)
+            t_int1 = np.repeat(t_int1.value,len(WA))*t_int1.unit
+            sInds = np.repeat(0,len(WA))
+            fZ1 = np.repeat(fZ.value,len(WA))*fZ.unit
+            fEZ1 = np.repeat(fEZ.value,len(WA))*fEZ.unit
+            core_contrast = 10.0**(-0.4*self.sim.OpticalSystem.calc_dMag_per_intTime(t_int1,self.sim.TargetList,sInds,fZ1,fEZ1,WA,mode))
+            contrast = interpolate.interp1d(WA.to('arcsec').value,core_contrast,kind='cubic',fill_value=1.0)
+            opt = optimize.minimize_scalar(contrast,bounds=[mode['IWA'].to('arcsec').value,mode['OWA'].to('arcsec').value],method='bounded')
             Cmin = opt.fun
-            WA_targ = opt.x*u.arcsec
-        
-        t_int1 = self.sim.OpticalSystem.calc_intTime(self.sim.TargetList,np.array([0]),fZ,fEZ,dMag,WA_targ,mode)
-        t_int1 = np.repeat(t_int1.value,len(WA))*t_int1.unit
-        sInds = np.repeat(0,len(WA))
-        fZ1 = np.repeat(fZ.value,len(WA))*fZ.unit
-        fEZ1 = np.repeat(fEZ.value,len(WA))*fEZ.unit
-        core_contrast = 10.0**(-0.4*self.sim.OpticalSystem.calc_dMag_per_intTime(t_int1,self.sim.TargetList,sInds,fZ1,fEZ1,WA,mode))
-        contrast = interpolate.interp1d(WA.to('arcsec').value,core_contrast,kind='cubic',fill_value=1.0)
-        opt = optimize.minimize_scalar(contrast,bounds=[mode['IWA'].to('arcsec').value,mode['OWA'].to('arcsec').value],method='bounded')
-        Cmin = opt.fun
-        
-        # find expected values of p and R
-        if self.sim.PlanetPopulation.prange[0] != self.sim.PlanetPopulation.prange[1]:
-            if hasattr(self.sim.PlanetPopulation,'ps'):
-                f = lambda R: self.sim.PlanetPopulation.get_p_from_Rp(R*u.earthRad)*self.sim.PlanetPopulation.dist_radius(R)
-                pexp, err = integrate.quad(f,self.sim.PlanetPopulation.Rprange[0].value,\
-                                           self.sim.PlanetPopulation.Rprange[1].value,\
-                                           epsabs=0,epsrel=1e-6,limit=100)
+        
+            # find expected values of p and R
+            if self.sim.PlanetPopulation.prange[0] != self.sim.PlanetPopulation.prange[1]:
+                if hasattr(self.sim.PlanetPopulation,'ps'):
+                    f = lambda R: self.sim.PlanetPopulation.get_p_from_Rp(R*u.earthRad)*self.sim.PlanetPopulation.dist_radius(R)
+                    pexp, err = integrate.quad(f,self.sim.PlanetPopulation.Rprange[0].value,\
+                                               self.sim.PlanetPopulation.Rprange[1].value,\
+                                               epsabs=0,epsrel=1e-6,limit=100)
+                else:
+                    f = lambda p: p*self.sim.PlanetPopulation.dist_albedo(p)
+                    pexp, err = integrate.quad(f,self.sim.PlanetPopulation.prange[0],\
+                                           self.sim.PlanetPopulation.prange[1],\
+                                            epsabs=0,epsrel=1e-6,limit=100)
             else:
-                f = lambda p: p*self.sim.PlanetPopulation.dist_albedo(p)
-                pexp, err = integrate.quad(f,self.sim.PlanetPopulation.prange[0],\
-                                       self.sim.PlanetPopulation.prange[1],\
-                                        epsabs=0,epsrel=1e-6,limit=100)
-        else:
-            pexp = self.sim.PlanetPopulation.prange[0]
-        print 'Expected value of geometric albedo: %r' % (pexp)
-        if self.sim.PlanetPopulation.Rprange[0] != self.sim.PlanetPopulation.Rprange[1]:
-            f = lambda R: R*self.sim.PlanetPopulation.dist_radius(R)
-            Rexp, err = integrate.quad(f,self.sim.PlanetPopulation.Rprange[0].to('earthRad').value,\
-                                       self.sim.PlanetPopulation.Rprange[1].to('earthRad').value,\
-                                        epsabs=0,epsrel=1e-4,limit=100)
-            Rexp *= u.earthRad.to('AU')
+                pexp = self.sim.PlanetPopulation.prange[0]
+            print 'Expected value of geometric albedo: %r' % (pexp)
+            if self.sim.PlanetPopulation.Rprange[0] != self.sim.PlanetPopulation.Rprange[1]:
+                f = lambda R: R*self.sim.PlanetPopulation.dist_radius(R)
+                Rexp, err = integrate.quad(f,self.sim.PlanetPopulation.Rprange[0].to('earthRad').value,\
+                                           self.sim.PlanetPopulation.Rprange[1].to('earthRad').value,\
+                                            epsabs=0,epsrel=1e-4,limit=100)
+                Rexp *= u.earthRad.to('AU')
+            else:
+                Rexp = self.sim.PlanetPopulation.Rprange[0].to('AU').value
+        
+        # filter target list and calculate integration times
+        with monitor.stage('targets'):
+            stage = cache.load('targets')
+            if stage is None:
+                keep, smin, smax, t_int = self.filter_targets(mode,amin,amax,fZ,fEZ,dMag,WA_targ,intCutoff)
+                cache.save('targets', keep=keep, smin=smin, smax=smax, t_int=t_int.to('day').value)
+            else:
+                print 'Loaded filtered target list from cache'
+                self.sim.TargetList.revise_lists(stage['keep'])
+                smin = stage['smin']
+                smax = stage['smax']
+                t_int = stage['t_int']*u.day
+
+        with monitor.stage('ck'):
+            ck = cache.load('ck')
+            if ck is None:
+                print 'Beginning ck calculations'
+                ck = self.find_ck(amin,amax,smin,smax,Cmin,pexp,Rexp)
+                # offset to account for zero ck values with nonzero completeness
+                ck += ck[ck>0.0].min()*1e-2
+                print 'Finished ck calculations'
+                cache.save('ck', ck=ck)
+            else:
+                print 'Loaded ck from cache'
+                ck = ck['ck']
+        
+        with monitor.stage('C_inst'):
+            C_inst = cache.load('C_inst')
+            if C_inst is None:
+                # get contrast array for given integration times
+                C_inst = self.find_C_inst(t_int,fZ,fEZ,WA,mode)
+                cache.save('C_inst', C_inst=C_inst)
+            else:
+                C_inst = C_inst['C_inst']
+        
+        # find bin edges for semi-major axis and planetary radius in AU
+        aedges = np.logspace(np.log10(amin), np.log10(amax), abins+1)
+        Redges = np.logspace(np.log10(Rmin*u.earthRad.to('AU')), \
+                         np.log10(Rmax*u.earthRad.to('AU')), Rbins+1)
+        # store aedges and Redges in result
+        self.result['aedges'] = aedges
+        self.result['Redges'] = Redges/u.earthRad.to('AU')
+        
+        # groups of the candidate stars, each star is in one combined group of 
+        # star_groups and group_by
+        groups = self.star_groups()
+        if group_by is None:
+            extra = []
+        elif isinstance(group_by, str):
+            extra = self.attribute_groups(group_by)
         else:
-            Rexp = self.sim.PlanetPopulation.Rprange[0].to('AU').value
+            extra = self.attribute_groups(*group_by)
+        labels = self.group_labels([groups, extra], self.sim.TargetList.nStars)
+        
+        # candidate stars are kept for budget sweeps
+        self.candidates = {'smin': smin, 'smax': smax, 't_int': t_int.to('day').value, \
+                           'ck': ck, 'dist': self.sim.TargetList.dist.to('pc').value, \
+                           'C_inst': C_inst, 'groups': groups, 'extra': extra, 'labels': labels, \
+                           'intCutoff': intCutoff, 'pexp': pexp, \
+                           'WA': WA.to('arcsecond').value, 'Redges': Redges.copy(), \
+                           'solver': solver, 'timeLimit': timeLimit, 'block_mem': block_mem, \
+                           'refine_tol': refine_tol, 'refine_depth': refine_depth}
+        
+        with monitor.stage('select_obs'):
+            stage = cache.load('obs')
+            if stage is None:
+                print 'Beginning %s calculations to determine list of observed stars' % (solver)
+                sInds, info = self.select_obs(t_int.to('day').value,maxTime,ck,solver,timeLimit,full_output=True)
+                print 'Finished %s calculations' % (solver)
+                cache.save('obs', sInds=sInds, **info)
+            else:
+                print 'Loaded list of observed stars from cache'
+                sInds = stage.pop('sInds')
+                info = dict((key, stage[key].item()) for key in stage)
+        monitor.filtered('select_obs', len(ck), len(sInds))
+        self.result['selection'] = info
+        self.candidates['sInds'] = sInds
+        # include only stars chosen for observation
+        self.sim.TargetList.revise_lists(sInds)
+        smin = smin[sInds]
+        smax = smax[sInds]
+        t_int = t_int[sInds]
+        C_inst = C_inst[sInds,:]
+        labels = labels[sInds]
+        ngroups = self.group_count()
+        
+        # store number of observed stars in result
+        NumObs = self.group_totals(np.bincount(labels[labels >= 0], minlength=ngroups))
+        for key in sorted(NumObs):
+            NumObs[key] = int(NumObs[key])
+            if key != 'all':
+                print '%r %s observed' % (NumObs[key], key)
+        NumObs['all'] = self.sim.TargetList.nStars
+        self.result['NumObs'] = NumObs
+        print 'Number of observed targets: %r' % self.sim.TargetList.nStars
+    
+        aa, RR = np.meshgrid(aedges,Redges) # in AU
+    
+        # get depth of search for each group of stars
+        with monitor.stage('DoS'):
+            if store_stars:
+                stars = cache.load('DoS_stars')
+                if stars is None:
+                    print 'Beginning depth of search calculations for each observed star'
+                    stars = self.DoS_stars(aedges, aa, Redges, RR, pexp, smin, smax, \
+                        self.sim.TargetList.dist.to('pc').value, C_inst, WA.to('arcsecond').value, n_jobs, block_mem, \
+                        refine_tol, refine_depth)
+                    print 'Finished depth of search calculations for each observed star'
+                    cache.save('DoS_stars', **stars.arrays())
+                else:
+                    print 'Loaded depth of search of each star from cache'
+                    stars = DoSStars(**stars)
+                self.result['DoS_stars'] = stars
+                DoS_groups = stars.group_sum(labels, ngroups)
+            else:
+                DoS_groups = cache.load('DoS_groups')
+                if DoS_groups is None:
+                    # all groups are found in one pass over the observed stars
+                    print 'Beginning depth of search calculations for observed stars'
+                    DoS_groups = self.DoS_groups(aedges, aa, Redges, RR, pexp, smin, smax, \
+                        self.sim.TargetList.dist.to('pc').value, C_inst, WA.to('arcsecond').value, \
+                        labels, ngroups, n_jobs, block_mem, refine_tol, refine_depth)
+                    print 'Finished depth of search calculations for observed stars'
+                    cache.save('DoS_groups', groups=DoS_groups)
+                else:
+                    print 'Loaded depth of search from cache'
+                    DoS_groups = DoS_groups['groups']
+            DoS = self.group_totals(DoS_groups)
+        # store DoS in result
+        self.result['DoS'] = DoS
+        
+        # find occurrence rate grid
+        with monitor.stage('occ_rates'):
+            Redges /= u.earthRad.to('AU')
+            occ_rates = self.find_occ_rates(aedges,Redges,amin)
+        self.result['occ_rates'] = occ_rates
+        
+        # Multiply depth of search with occurrence rates
+        with monitor.stage('DoS_occ'):
+            print 'Multiplying depth of search grid with occurrence rate grid'
+            self.result['DoS_occ'] = self.group_occ(DoS_groups,occ_rates)
+        
+        # store MissionSim output specification dictionary
+        self.outspec = self.sim.genOutSpec()
+        monitor.stop()
+        if monitor.enabled:
+            self.result['monitor'] = monitor.summary()
+        print 'Calculations finished'
+    
+    @classmethod
+    def from_arrays(cls, dist, t_int, contrast, IWA, OWA, Spec=None, Name=None, arange=(0.1, 100.0), Rprange=(1.0, 30.0), p=0.367, eta=0.1, attrs=None, **kwargs):
+        '''Calculates depth of search for stars given as arrays without 
+        building an EXOSIMS.MissionSim
+        
+        The stars are held by a DoSSim.ArraySim, which stands in for 
+        MissionSim, and the filtering, ck, selection, and depth of search 
+        stages are the same as for a json script. Integration times are 
+        taken as given and instrument contrast depends only on working 
+        angle. The planet population is log-uniform in semi-major axis and 
+        planetary radius with constant geometric albedo.
+        
+        Args:
+            dist (ndarray):
+                1D array of stellar distances in pc
+            t_int (ndarray):
+                1D array of integration times in days
+            contrast (callable):
+                instrument contrast as a function of a 1D array of working 
+                angles in arcsec
+            IWA (float):
+                inner working angle in arcsec
+            OWA (float):
+                outer working angle in arcsec
+            Spec (ndarray):
+                1D array of spectral types, needed by DoSFuncsMulders 
+                (optional)
+            Name (ndarray):
+                1D array of star names (optional)
+            arange (tuple):
+                minimum and maximum semi-major axis in AU (optional)
+            Rprange (tuple):
+                minimum and maximum planetary radius in R_earth (optional)
+            p (float):
+                geometric albedo of all planets (optional)
+            eta (float):
+                number of planets per star (optional)
+            attrs (dict):
+                other 1D arrays of star attributes for group_by and 
+                star_columns (optional)
+            **kwargs:
+                other constructor arguments, e.g. maxTime or solver
+        
+        Returns:
+            obj (DoSFuncs):
+                object of this class with the depth of search results
+        
+        '''
+        
+        from DoSSim import ArraySim
+        sim = ArraySim(dist, t_int, contrast, IWA, OWA, Spec, Name, arange, Rprange, p, eta, attrs)
+        obj = cls(sim=sim, **kwargs)
+        
+        return obj
+    
+    def filter_targets(self,mode,amin,amax,fZ,fEZ,dMag,WA_targ,intCutoff):
+        '''Filters the target list to stars of the stellar types used whose 
+        minimum separation is within the semi-major axis range and whose 
+        integration time is below the cutoff
+        
+        The EXOSIMS TargetList is revised to include only these stars.
+        
+        Args:
+            mode (dict):
+                selected observing mode
+            amin (float):
+                minimum semi-major axis value in AU
+            amax (float):
+                maximum semi-major axis value in AU
+            fZ (Quantity):
+                surface brightness of local zodiacal light
+            fEZ (Quantity):
+                surface brightness of exo-zodiacal light
+            dMag (float):
+                limiting dMag value for integration time calculation
+            WA_targ (Quantity):
+                working angle for target astrophysical contrast
+            intCutoff (float):
+                integration cutoff time per target in days
+        
+        Returns:
+            keep (ndarray):
+                1D array of indices of remaining stars in the original target list
+            smin (ndarray):
+                1D array of minimum separation values in AU
+            smax (ndarray):
+                1D array of maximum separation values in AU
+            t_int (Quantity):
+                1D array of integration times
+        
+        '''
+        
+        # include only stellar types used
+        keep = self.target_types()
+        self.monitor.filtered('target_types', self.sim.TargetList.nStars, len(keep))
+        self.sim.TargetList.revise_lists(keep)
         
         # minimum and maximum separations
         smin = (np.tan(mode['IWA'])*self.sim.TargetList.dist).to('AU').value
@@ -173,15 +499,19 @@ class DoSFuncs(object):
     
         # include only stars where smin > amin
         bigger = np.where(smin>amin)[0]
+        self.monitor.filtered('smin > amin', len(smin), len(bigger))
         self.sim.TargetList.revise_lists(bigger)
         smin = smin[bigger]
         smax = smax[bigger]
+        keep = keep[bigger]
     
         # include only stars where smin < amax
         smaller = np.where(smin<amax)[0]
+        self.monitor.filtered('smin < amax', len(smin), len(smaller))
         self.sim.TargetList.revise_lists(smaller)
         smin = smin[smaller]
         smax = smax[smaller]
+        keep = keep[smaller]
         
         # calculate integration times
         sInds = np.arange(self.sim.TargetList.nStars)
@@ -191,92 +521,646 @@ class DoSFuncs(object):
         
         # remove integration times above cutoff
         cutoff = np.where(t_int.to('day').value<intCutoff)[0]
+        self.monitor.filtered('intCutoff', len(t_int), len(cutoff))
         self.sim.TargetList.revise_lists(cutoff)
         smin = smin[cutoff]
         smax = smax[cutoff]
         t_int = t_int[cutoff]
-
-        print 'Beginning ck calculations'
-        ck = self.find_ck(amin,amax,smin,smax,Cmin,pexp,Rexp)
-        # offset to account for zero ck values with nonzero completeness
-        ck += ck[ck>0.0].min()*1e-2
-        print 'Finished ck calculations'
-        
-        print 'Beginning ortools calculations to determine list of observed stars'
-        sInds = self.select_obs(t_int.to('day').value,maxTime,ck)
-        print 'Finished ortools calculations'
-        # include only stars chosen for observation
-        self.sim.TargetList.revise_lists(sInds)
-        smin = smin[sInds]
-        smax = smax[sInds]
-        t_int = t_int[sInds]
-        ck = ck[sInds]
-        
-        # get contrast array for given integration times
-        sInds2 = np.arange(self.sim.TargetList.nStars)
-        fZ2 = np.repeat(fZ.value,len(WA))*fZ.unit
-        fEZ2 = np.repeat(fEZ.value,len(WA))*fEZ.unit
-        C_inst = np.zeros((len(sInds2),len(WA)))
-        for i in xrange(len(sInds2)):
-            t_int2 = np.repeat(t_int[i].value,len(WA))*t_int.unit
-            sInds2a = np.repeat(sInds2[i],len(WA))
-            C_inst[i,:] = 10.0**(-0.4*self.sim.OpticalSystem.calc_dMag_per_intTime(t_int2,self.sim.TargetList,sInds2a,fZ2,fEZ2,WA,mode))
+        keep = keep[cutoff]
         
-        # store number of observed stars in result
-        self.result['NumObs'] = {"all": self.sim.TargetList.nStars}
-        print 'Number of observed targets: %r' % self.sim.TargetList.nStars
-
-        # find bin edges for semi-major axis and planetary radius in AU
-        aedges = np.logspace(np.log10(amin), np.log10(amax), abins+1)
-        Redges = np.logspace(np.log10(Rmin*u.earthRad.to('AU')), \
-                         np.log10(Rmax*u.earthRad.to('AU')), Rbins+1)
-        # store aedges and Redges in result
-        self.result['aedges'] = aedges
-        self.result['Redges'] = Redges/u.earthRad.to('AU')
+        return keep, smin, smax, t_int
     
-        aa, RR = np.meshgrid(aedges,Redges) # in AU
+    def target_types(self):
+        '''Finds stars in the target list of the stellar types used
+        
+        All stellar types are used.
+        
+        Returns:
+            sInds (ndarray):
+                1D array of star indices in the target list
+        
+        '''
+        
+        sInds = np.arange(self.sim.TargetList.nStars)
+        
+        return sInds
+    
+    def star_groups(self):
+        '''Groups stars in the target list for the depth of search calculations
+        
+        All stars are in the single group 'all'.
+        
+        Returns:
+            groups (list):
+                list of (key, indices) tuples giving the result dictionary key
+                and 1D array of star indices in the target list for each group
+        
+        '''
+        
+        groups = [('all', np.arange(self.sim.TargetList.nStars))]
+        
+        return groups
     
-        # get depth of search 
-        print 'Beginning depth of search calculations for observed stars'
-        if self.sim.TargetList.nStars > 0:
-            DoS = self.DoS_sum(aedges, aa, Redges, RR, pexp, smin, smax, \
-                           self.sim.TargetList.dist.to('pc').value, C_inst, WA.to('arcsecond').value)
+    def attribute_groups(self,attr,bins=1):
+        '''Groups stars in the target list by a TargetList attribute
+        
+        String attributes such as 'Spec' are grouped by their first bins 
+        characters, so bins=2 gives spectral subclasses. Numeric attributes
+        such as 'dist' or 'L' are grouped by the intervals between the 
+        values of bins, in the units of the attribute, and stars outside of
+        bins are not in any group.
+        
+        Args:
+            attr (str):
+                name of the TargetList attribute
+            bins (int or ndarray):
+                number of leading characters for string attributes, or 1D 
+                array of bin edges for numeric attributes (optional)
+        
+        Returns:
+            groups (list):
+                list of (key, indices) tuples giving the result dictionary key
+                and 1D array of star indices in the target list for each group,
+                keys are the leading characters, or '<attr>_<low>-<high>'
+        
+        '''
+        
+        values = getattr(self.sim.TargetList, attr)
+        values = np.asarray(getattr(values, 'value', values))
+        if values.dtype.kind in 'SUO':
+            values = np.array(map(str, values), dtype='S%d' % (bins))
+            keys = np.unique(values)
+            groups = [(str(key), np.where(values == key)[0]) for key in keys]
         else:
-            DoS = np.zeros((aa.shape[0]-1,aa.shape[1]-1))
+            bins = np.asarray(bins, dtype=float)
+            if bins.ndim != 1 or len(bins) < 2:
+                raise ValueError('bins must be a 1D array of at least 2 bin edges for numeric attribute %r' % (attr))
+            inds = np.searchsorted(bins, values, side='right') - 1
+            inds[values == bins[-1]] = len(bins) - 2
+            groups = [('%s_%g-%g' % (attr, bins[i], bins[i+1]), np.where(inds == i)[0]) \
+                      for i in xrange(len(bins)-1)]
+        
+        return groups
+    
+    def group_labels(self,partitions,nStars):
+        '''Finds the combined group of each star from partitions of the stars
+        
+        Each star is labeled by its group in every partition, and the label
+        of the combined group is the index into the product of the 
+        partitions, with an extra group in all but the first partition for 
+        stars in none of its groups. Stars in none of the groups of the 
+        first partition are labeled -1.
+        
+        Args:
+            partitions (list):
+                list of lists of (key, indices) tuples of groups which do not 
+                overlap, see star_groups
+            nStars (int):
+                number of stars
+        
+        Returns:
+            labels (ndarray):
+                1D array of combined group label of each star
+        
+        '''
+        
+        labels = np.zeros(nStars, dtype=int)
+        keys = []
+        for n, groups in enumerate(partitions):
+            # label of stars in none of the groups
+            none = len(groups) if n > 0 else -1
+            part = np.zeros(nStars, dtype=int) + none
+            for g, (key, inds) in enumerate(groups):
+                if key in keys:
+                    raise ValueError('group %r is repeated' % (key))
+                keys.append(key)
+                if np.any(part[inds] != none):
+                    raise ValueError('group %r overlaps another group' % (key))
+                part[inds] = g
+            size = len(groups) + (1 if n > 0 else 0)
+            labels = np.where((labels < 0) | (part < 0), -1, labels*size + part)
+        
+        return labels
+    
+    def group_count(self):
+        '''Finds the number of combined groups of the candidate stars
+        
+        Returns:
+            ngroups (int):
+                number of combined groups, see group_labels
+        
+        '''
+        
+        c = self.candidates
+        ngroups = len(c['groups'])*(len(c['extra']) + 1)
+        
+        return ngroups
+    
+    def group_totals(self,A):
+        '''Sums arrays found for each combined group of the candidate stars 
+        for each group of star_groups and group_by
+        
+        Args:
+            A (ndarray):
+                array with first axis over the combined groups, see 
+                group_labels
+        
+        Returns:
+            totals (dict):
+                dictionary of sums for each group key, 'all' is the sum over 
+                the groups of star_groups if not one of them
+        
+        '''
+        
+        c = self.candidates
+        A = np.asarray(A)
+        A = A.reshape((len(c['groups']), len(c['extra']) + 1) + A.shape[1:])
+        totals = {}
+        for g, (key, inds) in enumerate(c['groups']):
+            totals[key] = A[g].sum(axis=0)
+        for g, (key, inds) in enumerate(c['extra']):
+            totals[key] = A[:,g].sum(axis=0)
+        if 'all' not in totals:
+            totals['all'] = np.sum([totals[key] for key, inds in c['groups']], axis=0)
+        
+        return totals
+    
+    def group_occ(self,A,occ_rates):
+        '''Multiplies depth of search of each combined group of the candidate
+        stars with occurrence rates and sums for each group key
+        
+        Each combined group uses the occurrence rates of its group of 
+        star_groups, or the 'all' occurrence rates if there are none for its
+        key, so groups of group_by are weighted by the stars of each type.
+        
+        Args:
+            A (ndarray):
+                3D array of depth of search with first axis over the combined 
+                groups, see group_labels
+            occ_rates (dict):
+                dictionary containing 2D arrays of occurrence rates
+        
+        Returns:
+            DoS_occ (dict):
+                dictionary of depth of search convolved with occurrence rates 
+                for each key of group_totals
+        
+        '''
+        
+        c = self.candidates
+        A = np.asarray(A)
+        occ = np.array([occ_rates[key] if key in occ_rates else occ_rates['all'] \
+                        for key, inds in c['groups']])
+        occ = np.repeat(occ, len(c['extra']) + 1, axis=0)
+        DoS_occ = self.group_totals(A*occ)
+        
+        return DoS_occ
+    
+    def find_occ_rates(self,aedges,Redges,amin):
+        '''Finds occurrence rates on the grid from the EXOSIMS PlanetPopulation
+        
+        The probability of each bin is found with integrate_population and 
+        kept for the process in DoSOccurrence.rebinned for the population 
+        specification and grid.
+        
+        Args:
+            aedges (ndarray):
+                1D array of semi-major axis bin edges in AU
+            Redges (ndarray):
+                1D array of planetary radius bin edges in R_earth
+            amin (float):
+                minimum semi-major axis in AU
+        
+        Returns:
+            occ_rates (dict):
+                dictionary containing 2D array of occurrence rates, key is: 'all'
+        
+        '''
+        
+        import DoSOccurrence
+        
+        # probability of each bin, reused for the same population and grid
+        spec = getattr(self.sim.PlanetPopulation, '_outspec', None)
+        if spec is None:
+            spec = dict(self.sim.genOutSpec())
+            spec.pop('seed', None)
+        key = ('population', type(self.sim.PlanetPopulation).__name__, \
+               json.dumps(spec, sort_keys=True, default=str), \
+               aedges.tobytes(), Redges.tobytes())
+        if key not in DoSOccurrence.rebinned:
+            DoSOccurrence.rebinned[key] = self.integrate_population(aedges,Redges)
+        etas = DoSOccurrence.rebinned[key]*self.sim.PlanetPopulation.eta
+        occ_rates = {'all': etas}
+        
+        return occ_rates
+    
+    def find_cdf(self,f,x,breaks=None,nodes=16):
+        '''Finds the integral of a probability density function from the 
+        smallest value to each value
+        
+        The intervals between the sorted values and breaks are each 
+        integrated with Gauss-Legendre quadrature in log(x), which is exact 
+        for log-uniform densities. Breaks are points where f may be 
+        discontinuous, such as the limits of its range.
+        
+        Args:
+            f (callable):
+                probability density function accepting arrays of positive 
+                values
+            x (ndarray):
+                1D array of positive values
+            breaks (ndarray):
+                1D array of positive values where f may be discontinuous 
+                (optional)
+            nodes (int):
+                number of quadrature nodes in each interval (optional)
+        
+        Returns:
+            F (ndarray):
+                1D array of integrals of f from the smallest of x and breaks
+                to each value of x
+        
+        '''
+        
+        x = np.array(x, ndmin=1, dtype=float)
+        pts = x if breaks is None else np.hstack((x, breaks))
+        pts = np.unique(pts)
+        t, w = np.polynomial.legendre.leggauss(nodes)
+        lo, hi = np.log(pts[:-1]), np.log(pts[1:])
+        u = np.exp(0.5*(hi - lo)[:,None]*t + 0.5*(hi + lo)[:,None])
+        vals = np.reshape(f(u.ravel()), u.shape)*u
+        F = np.hstack((0.0, np.cumsum(0.5*(hi - lo)*np.dot(vals, w))))
+        
+        return F[np.searchsorted(pts, x)]
+    
+    def integrate_population(self,aedges,Redges,nodes=8):
+        '''Integrates the planet population density over each semi-major 
+        axis--planetary radius bin
+        
+        For separable populations (without dist_sma_radius) the bins are 
+        products of differences of the cumulative distributions of 
+        semi-major axis and planetary radius from find_cdf. Otherwise the
+        joint density is integrated with a tensor product Gauss-Legendre 
+        rule in log(a) and log(R) on each bin. Bins are split at the limits 
+        of arange and Rprange, where the density is discontinuous.
+        
+        Args:
+            aedges (ndarray):
+                1D array of semi-major axis bin edges in AU
+            Redges (ndarray):
+                1D array of planetary radius bin edges in R_earth
+            nodes (int):
+                number of quadrature nodes per axis in each bin for joint 
+                densities (optional)
+        
+        Returns:
+            P (ndarray):
+                2D array of the probability of each bin
+        
+        '''
+        
+        PP = self.sim.PlanetPopulation
+        abreaks = PP.arange.to('AU').value
+        Rbreaks = PP.Rprange.to('earthRad').value
+        if not hasattr(PP,'dist_sma_radius'):
+            Pa = np.diff(self.find_cdf(PP.dist_sma, aedges, abreaks))
+            PR = np.diff(self.find_cdf(PP.dist_radius, Redges, Rbreaks))
+            P = np.outer(PR, Pa)
+            return P
+        
+        t, w = np.polynomial.legendre.leggauss(nodes)
+        def rule(edges, breaks):
+            # edges split at breaks, nodes and weights in each part, and the 
+            # first part of each bin
+            inside = breaks[(breaks > edges[0]) & (breaks < edges[-1])]
+            e = np.union1d(edges, inside)
+            lo, hi = np.log(e[:-1]), np.log(e[1:])
+            x = np.exp(0.5*(hi - lo)[:,None]*t + 0.5*(hi + lo)[:,None])
+            return x, 0.5*(hi - lo)[:,None]*w*x, np.searchsorted(e, edges[:-1])
+        xa, wa, ia = rule(np.asarray(aedges, dtype=float), abreaks)
+        xR, wR, iR = rule(np.asarray(Redges, dtype=float), Rbreaks)
+        P = np.zeros((len(xR),len(xa)))
+        # radius parts in chunks of about 2**22 evaluations
+        chunk = max(2**22//(xa.size*nodes), 1)
+        for i in xrange(0, len(xR), chunk):
+            aa, RR = np.meshgrid(xa.ravel(), xR[i:i+chunk].ravel())
+            f = np.reshape(PP.dist_sma_radius(aa,RR), aa.shape)
+            f *= wR[i:i+chunk].reshape(-1,1)*wa.reshape(1,-1)
+            P[i:i+chunk] = f.reshape(-1,nodes,len(xa),nodes).sum(axis=(1,3))
+        P = np.add.reduceat(np.add.reduceat(P, iR, axis=0), ia, axis=1)
+        
+        return P
+    
+    def find_DoS_occ(self,DoS,occ_rates,aedges,Redges):
+        '''Multiplies depth of search with occurrence rates
+        
+        Occurrence rates are the expected number of planets in each bin, so
+        no bin area factor is applied.
+        
+        Args:
+            DoS (dict):
+                dictionary of depth of search arrays, the last two axes are 
+                planetary radius and semi-major axis bins
+            occ_rates (dict):
+                dictionary containing 2D arrays of occurrence rates
+            aedges (ndarray):
+                1D array of semi-major axis bin edges in AU (unused)
+            Redges (ndarray):
+                1D array of planetary radius bin edges in R_earth (unused)
+        
+        Returns:
+            DoS_occ (dict):
+                dictionary of depth of search convolved with occurrence rates
+                for each key of occ_rates, 'all' is the sum if not included
+        
+        '''
+        
+        DoS_occ = {}
+        for key in occ_rates.keys():
+            DoS_occ[key] = DoS[key]*occ_rates[key]
+        if 'all' not in DoS_occ:
+            DoS_occ['all'] = np.sum([DoS_occ[key] for key in occ_rates.keys()], axis=0)
+        
+        return DoS_occ
+    
+    def frontier(self,maxTime,intCutoff=None):
+        '''Selects candidate stars for several observing time budgets
+        
+        Integration times and ck of the candidate stars are reused from 
+        initialization. With the 'bb' solver, budgets with the same 
+        integration cutoff are solved in one pass by DoSSelect.frontier, 
+        each selection warm starting the next. Other solvers call select_obs
+        for each budget.
+        
+        Args:
+            maxTime (ndarray):
+                1D array of maximum total integration times in days
+            intCutoff (ndarray):
+                1D array of integration cutoff times per target in days, must
+                not exceed the value used for initialization (optional)
+        
+        Returns:
+            frontier (dict):
+                dictionary containing results for each budget with keys:
+                    maxTime (ndarray):
+                        1D array of maximum total integration times in days
+                    intCutoff (ndarray):
+                        1D array of integration cutoff times in days
+                    sInds (list):
+                        list of 1D arrays of selected candidate star indices
+                    objective (ndarray):
+                        1D array of sums of ck of the selected stars
+                    selection (list):
+                        list of dictionaries of solver information
+        
+        '''
+        
+        import DoSSelect
+        
+        c = self.candidates
+        if intCutoff is None:
+            intCutoff = c['intCutoff']
+        maxTime, intCutoff = np.broadcast_arrays(np.array(maxTime, ndmin=1, dtype=float), \
+                                                 np.array(intCutoff, ndmin=1, dtype=float))
+        assert np.all(intCutoff <= c['intCutoff']), 'intCutoff must not exceed the value used for initialization'
+        
+        sel = [None]*len(maxTime)
+        selection = [None]*len(maxTime)
+        for cutoff in np.unique(intCutoff):
+            ok = np.where(c['t_int'] < cutoff)[0]
+            budgets = np.where(intCutoff == cutoff)[0]
+            print 'Selecting observed stars for %r budgets with intCutoff = %r' % (len(budgets), cutoff)
+            if c['solver'] == 'bb':
+                s, info = DoSSelect.frontier(c['t_int'][ok],c['ck'][ok],maxTime[budgets],c['timeLimit'])
+                for i, j in enumerate(budgets):
+                    info[i]['solver'] = 'bb'
+            else:
+                s, info = zip(*[self.select_obs(c['t_int'][ok],maxTime[j],c['ck'][ok],c['solver'],\
+                                c['timeLimit'],full_output=True) for j in budgets])
+            for i, j in enumerate(budgets):
+                sel[j] = ok[s[i]]
+                selection[j] = info[i]
+        frontier = {'maxTime': maxTime, 'intCutoff': intCutoff, 'sInds': sel, \
+                    'objective': np.array([sinfo['objective'] for sinfo in selection]), \
+                    'selection': selection}
+        
+        return frontier
+    
+    def sweep(self,maxTime=None,intCutoff=None,n_jobs=1,frontier=None):
+        '''Calculates depth of search for several observing time budgets
+        
+        Integration times, ck, and instrument contrast of the candidate stars
+        are reused from initialization. Only the selection of observed stars 
+        is repeated for each budget, or taken from the result of frontier.
+        Depth of search is calculated once for each star selected in any 
+        budget, and each budget is the sum over its selected stars.
+        
+        Args:
+            maxTime (ndarray):
+                1D array of maximum total integration times in days, not 
+                needed if frontier is given
+            intCutoff (ndarray):
+                1D array of integration cutoff times per target in days, must
+                not exceed the value used for initialization (optional)
+            n_jobs (int):
+                number of processes for depth of search calculations, -1 uses
+                all cores (optional)
+            frontier (dict):
+                selections of observed stars returned by frontier, used 
+                instead of maxTime and intCutoff (optional)
+        
+        Returns:
+            sweep (dict):
+                dictionary containing results for each budget with keys:
+                    maxTime (ndarray):
+                        1D array of maximum total integration times in days
+                    intCutoff (ndarray):
+                        1D array of integration cutoff times in days
+                    sInds (list):
+                        list of 1D arrays of selected candidate star indices
+                    selection (list):
+                        list of dictionaries of solver information
+                    NumObs (dict):
+                        dictionary of 1D arrays of number of observed stars
+                    DoS (dict):
+                        dictionary of 3D arrays of depth of search indexed by
+                        budget
+                    DoS_occ (dict):
+                        dictionary of 3D arrays of depth of search convolved
+                        with occurrence rates indexed by budget
+        
+        '''
+        
+        c = self.candidates
+        if frontier is None:
+            frontier = self.frontier(maxTime,intCutoff)
+        maxTime = frontier['maxTime']
+        intCutoff = frontier['intCutoff']
+        sel = frontier['sInds']
+        selection = frontier['selection']
+        
+        # depth of search for each star selected in any budget
+        union = np.unique(np.hstack(sel)).astype(int)
+        aedges = self.result['aedges']
+        aa, RR = np.meshgrid(aedges,c['Redges'])
+        print 'Beginning depth of search calculations for %r stars' % (len(union))
+        stars = self.DoS_stars(aedges, aa, c['Redges'], RR, c['pexp'], c['smin'][union], \
+                    c['smax'][union], c['dist'][union], c['C_inst'][union], c['WA'], n_jobs, c['block_mem'], \
+                    c['refine_tol'], c['refine_depth'])
         print 'Finished depth of search calculations'
-        # store DoS in result
-        self.result['DoS'] = {"all": DoS}
         
-        # find occurrence rate grid
-        Redges /= u.earthRad.to('AU')
-        etas = np.zeros((len(Redges)-1,len(aedges)-1))
-        # get joint pdf of semi-major axis and radius
-        if hasattr(self.sim.PlanetPopulation,'dist_sma_radius'):
-            func = lambda a,R: self.sim.PlanetPopulation.dist_sma_radius(a,R)
-        else:
-            func = lambda a,R: self.sim.PlanetPopulation.dist_sma(a)*self.sim.PlanetPopulation.dist_radius(R)
-        aa, RR = np.meshgrid(aedges,Redges)
-        r_norm = Redges[1:] - Redges[:-1]
-        a_norm = aedges[1:] - aedges[:-1]
-        norma, normR = np.meshgrid(a_norm,r_norm)
-        tmp = func(aa,RR)
-        etas = 0.25*(tmp[:-1,:-1]+tmp[1:,:-1]+tmp[:-1,1:]+tmp[1:,1:])*norma*normR
-#        for i in xrange(len(Redges)-1):
-#            print('{} out of {}'.format(i+1,len(Redges)-1))
-#            for j in xrange(len(aedges)-1):
-#                etas[i,j] = integrate.dblquad(func,Redges[i],Redges[i+1],lambda x: aedges[j],lambda x: aedges[j+1])[0]
-        etas *= self.sim.PlanetPopulation.eta
-        self.result['occ_rates'] = {"all": etas}
+        # sum over selected stars in each group
+        labels = c['labels'][union]
+        ngroups = self.group_count()
+        NumObs = []
+        DoS = []
+        DoS_occ = []
+        for s in sel:
+            lab = np.where(np.in1d(union, s), labels, -1)
+            NumObs.append(self.group_totals(np.bincount(lab[lab >= 0], minlength=ngroups)))
+            A = stars.group_sum(lab, ngroups)
+            DoS.append(self.group_totals(A))
+            DoS_occ.append(self.group_occ(A,self.result['occ_rates']))
+        NumObs = dict((key, np.array([x[key] for x in NumObs])) for key in NumObs[0])
+        NumObs['all'] = np.array([len(s) for s in sel])
+        DoS = dict((key, np.array([x[key] for x in DoS])) for key in DoS[0])
+        DoS_occ = dict((key, np.array([x[key] for x in DoS_occ])) for key in DoS_occ[0])
+        sweep = {'maxTime': maxTime, 'intCutoff': intCutoff, 'sInds': sel, \
+                 'selection': selection, 'NumObs': NumObs, 'DoS': DoS, 'DoS_occ': DoS_occ}
         
-        # Multiply depth of search with occurrence rates
+        return sweep
+    
+    def stream(self,sInds=None,rtol=None,n_jobs=1,size=None):
+        '''Generates the running depth of search of observed stars after 
+        each chunk of stars, see DoS_stream
         
-        print 'Multiplying depth of search grid with occurrence rate grid'
-        DoS_occ = DoS*etas*norma*normR
-        self.result['DoS_occ'] = {"all": DoS_occ}
+        Stars are summed in order of decreasing ck, so the stars expected to 
+        contribute most come first. Instrument contrast and groups of the 
+        candidate stars are reused from initialization. The generator may 
+        be stopped at any step, or stops by itself once the expected number
+        of planets of a chunk is below rtol times the running total.
         
-        # store MissionSim output specification dictionary
-        self.outspec = self.sim.genOutSpec()
-        print 'Calculations finished'
+        Args:
+            sInds (ndarray):
+                1D array of candidate star indices, the stars selected at 
+                initialization if None (optional)
+            rtol (float):
+                relative change in the total expected number of planets 
+                below which the generator stops (optional)
+            n_jobs (int):
+                number of processes for depth of search calculations, -1 uses
+                all cores (optional)
+            size (int):
+                maximum number of stars in each chunk (optional)
+        
+        Yields:
+            step (dict):
+                dictionary with keys:
+                    nStars (int):
+                        number of stars summed so far
+                    sInds (ndarray):
+                        1D array of candidate star indices of the chunk
+                    NumObs (dict):
+                        dictionary of number of stars summed so far
+                    DoS (dict):
+                        dictionary of 2D arrays of depth of search summed so
+                        far
+                    DoS_occ (dict):
+                        dictionary of 2D arrays of depth of search convolved
+                        with occurrence rates summed so far
+                    batch_DoS (dict):
+                        dictionary of 2D arrays of depth of search of the 
+                        chunk
+                    batch_DoS_occ (dict):
+                        dictionary of 2D arrays of depth of search convolved
+                        with occurrence rates of the chunk
+                    nplan (float):
+                        total expected number of planets summed so far
+                    change (float):
+                        expected number of planets of the chunk relative to
+                        nplan
+        
+        '''
+        
+        c = self.candidates
+        if sInds is None:
+            sInds = c['sInds']
+        sInds = np.array(sInds, ndmin=1, dtype=int)
+        sInds = sInds[np.argsort(-c['ck'][sInds], kind='mergesort')]
+        aedges = self.result['aedges']
+        aa, RR = np.meshgrid(aedges,c['Redges'])
+        labels = c['labels'][sInds]
+        ngroups = self.group_count()
+        occ_rates = self.result['occ_rates']
+        counts = np.zeros(ngroups, dtype=int)
+        steps = self.DoS_stream(aedges, aa, c['Redges'], RR, c['pexp'], c['smin'][sInds], \
+                    c['smax'][sInds], c['dist'][sInds], c['C_inst'][sInds], c['WA'], labels, ngroups, \
+                    n_jobs, c['block_mem'], c['refine_tol'], c['refine_depth'], size)
+        try:
+            for step in steps:
+                counts += np.bincount(labels[step['stars']], minlength=ngroups)
+                NumObs = self.group_totals(counts)
+                NumObs['all'] = step['nStars']
+                DoS = self.group_totals(step['DoS'])
+                batch = self.group_totals(step['batch'])
+                DoS_occ = self.group_occ(step['DoS'],occ_rates)
+                batch_occ = self.group_occ(step['batch'],occ_rates)
+                nplan = DoS_occ['all'].sum()
+                change = batch_occ['all'].sum()/nplan if nplan > 0 else np.inf
+                yield {'nStars': step['nStars'], 'sInds': sInds[step['stars']], 'NumObs': NumObs, \
+                       'DoS': DoS, 'DoS_occ': DoS_occ, 'batch_DoS': batch, 'batch_DoS_occ': batch_occ, \
+                       'nplan': nplan, 'change': change}
+                if rtol is not None and change < rtol:
+                    print 'Stopped after %r stars with relative change %.3g' % (step['nStars'], change)
+                    return
+        finally:
+            steps.close()
+    
+    def find_C_inst(self,t_int,fZ,fEZ,WA,mode,chunk=None):
+        '''Finds instrument contrast at each working angle for the integration
+        time of each star in the target list
+        
+        All stars and working angles are flattened into a single call to 
+        OpticalSystem.calc_dMag_per_intTime (or one call per chunk of stars)
+        and reshaped.
+        
+        Args:
+            t_int (Quantity):
+                1D array of integration times for each star in the target list
+            fZ (Quantity):
+                surface brightness of local zodiacal light
+            fEZ (Quantity):
+                surface brightness of exo-zodiacal light
+            WA (Quantity):
+                1D array of working angles
+            mode (dict):
+                selected observing mode
+            chunk (int):
+                maximum number of stars per call (optional)
+        
+        Returns:
+            C_inst (ndarray):
+                2D array of instrument contrast (stars by working angle)
+        
+        '''
+        
+        nStars = len(t_int)
+        nWA = len(WA)
+        if chunk is None:
+            chunk = max(nStars, 1)
+        C_inst = np.zeros((nStars,nWA))
+        for i in xrange(0, nStars, chunk):
+            sInds = np.arange(i, min(i+chunk, nStars))
+            n = len(sInds)
+            t_int2 = np.repeat(t_int[sInds].value,nWA)*t_int.unit
+            sInds2 = np.repeat(sInds,nWA)
+            fZ2 = np.repeat(fZ.value,n*nWA)*fZ.unit
+            fEZ2 = np.repeat(fEZ.value,n*nWA)*fEZ.unit
+            WA2 = np.tile(WA.value,n)*WA.unit
+            dMag = self.sim.OpticalSystem.calc_dMag_per_intTime(t_int2,self.sim.TargetList,sInds2,fZ2,fEZ2,WA2,mode)
+            C_inst[sInds,:] = np.reshape(10.0**(-0.4*dMag),(n,nWA))
+        
+        return C_inst
     
     def one_DoS_grid(self,a,R,p,smin,smax,Cmin):
         '''Calculates completeness for one star on constant semi-major axis--
@@ -364,10 +1248,15 @@ class DoSFuncs(object):
 
         return f
     
-    def one_DoS_bins(self,a,R,p,smin,smax,Cmin):
+    def one_DoS_bins(self,a,R,p,smin,smax,Cmin,tol=None,depth=3,dist=None,C_inst=None,WA=None):
         '''Calculates depth of search for each bin by integrating the
         completeness for given semi-major axis and planetary radius
         
+        Each bin is the average of its corners. If tol is given, bins whose
+        corners differ by more than tol are refined with DoS_refine, which 
+        needs dist, C_inst, and WA to find the minimum contrast inside the 
+        bins.
+        
         Args:
             a (ndarray):
                 2D grid of semi-major axis bin edges in AU
@@ -381,6 +1270,19 @@ class DoSFuncs(object):
                 maximum separation in AU
             Cmin (ndarray):
                 2D grid of minimum contrast
+            tol (float):
+                largest difference of completeness between the corners of a 
+                bin which is not refined, no refinement if None (optional)
+            depth (int):
+                maximum number of times a bin is split (optional)
+            dist (float):
+                stellar distance in pc, needed if tol is given (optional)
+            C_inst (ndarray):
+                1D array of instrument contrast at working angle, needed if 
+                tol is given (optional)
+            WA (ndarray):
+                1D array of working angles in arcseconds, needed if tol is 
+                given (optional)
         
         Returns:
             f (ndarray):
@@ -388,12 +1290,382 @@ class DoSFuncs(object):
         
         '''
         
+        if tol is not None:
+            if dist is None or C_inst is None or WA is None:
+                raise ValueError('dist, C_inst, and WA must be specified for refinement')
+            f = self.DoS_refine(a[0,:],R[:,0],p,[smin],[smax],[dist],C_inst,WA,tol,depth,Cmin[:1,:])
+            return f[0]
+        
         tmp = self.one_DoS_grid(a,R,p,smin,smax,Cmin)
         f = 0.25*(tmp[:-1,:-1]+tmp[1:,:-1]+tmp[:-1,1:]+tmp[1:,1:])
         
         return f
 
-    def DoS_sum(self,a,aa,R,RR,pexp,smin,smax,dist,C_inst,WA):
+    def completeness_block(self,a,R,p,smin,smax,Cmin):
+        '''Calculates completeness for a block of stars on constant 
+        semi-major axis--planetary radius grid
+        
+        Gives the same values as one_DoS_grid for each star, see 
+        completeness.
+        
+        Args:
+            a (ndarray):
+                1D array of semi-major axis values in AU
+            R (ndarray):
+                1D array of planetary radius values in AU
+            p (float):
+                average geometric albedo value
+            smin (ndarray):
+                1D array of minimum separation values in AU
+            smax (ndarray):
+                1D array of maximum separation values in AU
+            Cmin (ndarray):
+                2D array of minimum contrast for each star and semi-major axis
+        
+        Returns:
+            f (ndarray):
+                3D array of completeness values for each star on 2D grid
+        
+        '''
+        
+        a = np.asarray(a, dtype=float)[None,None,:]
+        R = np.asarray(R, dtype=float)[None,:,None]
+        smin = np.asarray(smin, dtype=float)[:,None,None]
+        smax = np.asarray(smax, dtype=float)[:,None,None]
+        Cmin = np.asarray(Cmin, dtype=float)[:,None,:]
+        f = self.completeness(a,R,p,smin,smax,Cmin)
+        
+        return f
+    
+    def completeness(self,a,R,p,smin,smax,Cmin):
+        '''Calculates completeness for broadcast arrays of semi-major axis, 
+        planetary radius, and star values
+        
+        Gives the same values as one_DoS_grid. With K = p*(R/a)**2, the 
+        square roots of the contrast limits of one_DoS_grid divided by 
+        sqrt(K) are (1 +- cos(b))/2, which depend only on the star and 
+        semi-major axis, and sqrt(Cmin/K). Masks and these factors are found
+        on the broadcast shape of a and the star values, and the full arrays
+        are updated in place.
+        
+        Args:
+            a (ndarray):
+                array of semi-major axis values in AU
+            R (ndarray):
+                array of planetary radius values in AU
+            p (float):
+                average geometric albedo value
+            smin (ndarray):
+                array of minimum separation values in AU
+            smax (ndarray):
+                array of maximum separation values in AU
+            Cmin (ndarray):
+                array of minimum contrast
+        
+        Returns:
+            f (ndarray):
+                array of completeness values with the broadcast shape of the
+                inputs
+        
+        '''
+        
+        inner = a > smin
+        outer = a > smax
+        # factors for the minimum and maximum separation
+        c = np.sqrt(np.maximum(1.0 - (smin/a)**2, 0.0))
+        h1 = np.where(inner, 0.5*(1.0 + c), 0.0)
+        h2 = 0.5*(1.0 - c)
+        c = np.sqrt(np.maximum(1.0 - (smax/a)**2, 0.0))
+        # only the minimum separation limits the orbit for smin < a <= smax
+        h3 = np.where(outer, 0.5*(1.0 + c), h2)
+        h4 = np.where(outer, 0.5*(1.0 - c), 0.0)
+        # sqrt(Cmin/K)
+        q = np.sqrt(Cmin)*a/np.sqrt(p)
+        q = q*(1.0/R)
+        f = np.maximum(q, h3)
+        np.subtract(h1, f, out=f)
+        np.maximum(f, 0.0, out=f)
+        np.maximum(q, h2, out=q)
+        np.subtract(h4, q, out=q)
+        np.maximum(q, 0.0, out=q)
+        f += q
+        
+        return f
+    
+    def active_region(self,a,R,p,smin,smax,Cmin):
+        '''Finds the bins where the depth of search of each star can be 
+        nonzero
+        
+        Completeness at a grid point is zero for a <= smin, and for 
+        R <= sqrt(Cmin)*a/(sqrt(p)*h) with h = (1 + sqrt(1 - (smin/a)**2))/2,
+        where the planet is fainter than the minimum contrast at every phase
+        with separation above smin. A bin is nonzero only if one of its 
+        corners is, so the nonzero bins of each star lie in the rows from i0
+        and the columns from j0 to j1. The limit is lowered slightly so the 
+        region always contains every nonzero bin.
+        
+        Args:
+            a (ndarray):
+                1D array of semi-major axis bin edges in AU
+            R (ndarray):
+                1D array of planetary radius bin edges in AU
+            p (float):
+                expected value of geometric albedo
+            smin (ndarray):
+                1D array of minimum separation values in AU
+            smax (ndarray):
+                1D array of maximum separation values in AU
+            Cmin (ndarray):
+                2D array of minimum contrast for each star and semi-major axis
+                bin edge
+        
+        Returns:
+            i0 (ndarray):
+                1D array of first planetary radius bin index of each star
+            j0 (ndarray):
+                1D array of first semi-major axis bin index of each star
+            j1 (ndarray):
+                1D array of semi-major axis bin index after the last of each
+                star, equal to j0 if no bin is nonzero
+        
+        '''
+        
+        a = np.asarray(a, dtype=float)[None,:]
+        smin = np.asarray(smin, dtype=float)[:,None]
+        nR, na = len(R) - 1, a.shape[1] - 1
+        c = np.sqrt(np.maximum(1.0 - (smin/a)**2, 0.0))
+        h = np.where(a > smin, 0.5*(1.0 + c), 0.0)
+        with np.errstate(divide='ignore'):
+            Rlim = np.where(h > 0.0, np.sqrt(np.asarray(Cmin, dtype=float))*a/(np.sqrt(p)*h), np.inf)
+        Rlim *= 1.0 - 1e-9
+        # first row of each column with a corner above the limit
+        rows = np.searchsorted(R[1:], np.minimum(Rlim[:,:-1], Rlim[:,1:]), side='right')
+        active = rows < nR
+        j0 = np.argmax(active, axis=1)
+        j1 = na - np.argmax(active[:,::-1], axis=1)
+        i0 = np.where(active, rows, nR).min(axis=1)
+        empty = ~active.any(axis=1)
+        j0[empty] = 0
+        j1[empty] = 0
+        
+        return i0, j0, j1
+    
+    def block_regions(self,a,R,p,smin,smax,Cmin,overhead=4096):
+        '''Generates the completeness of a block of stars on the corners of
+        their active regions
+        
+        Stars are sorted by active region (see active_region) and gathered 
+        in groups while evaluating the group on its bounding region costs 
+        less than evaluating the stars apart, counting overhead grid points 
+        for each evaluation. Stars with no nonzero bins are skipped.
+        
+        Args:
+            a (ndarray):
+                1D array of semi-major axis bin edges in AU
+            R (ndarray):
+                1D array of planetary radius bin edges in AU
+            p (float):
+                expected value of geometric albedo
+            smin (ndarray):
+                1D array of minimum separation values in AU
+            smax (ndarray):
+                1D array of maximum separation values in AU
+            Cmin (ndarray):
+                2D array of minimum contrast for each star and semi-major axis
+                bin edge
+            overhead (int):
+                number of grid points with the cost of one evaluation 
+                (optional)
+        
+        Yields:
+            sInds (ndarray):
+                1D array of indices of the stars of the group in the block
+            i0 (int):
+                first planetary radius bin index of the group
+            j0 (int):
+                first semi-major axis bin index of the group
+            j1 (int):
+                semi-major axis bin index after the last of the group
+            tmp (ndarray):
+                3D array of completeness values at the bin corners of the 
+                region for each star of the group
+        
+        '''
+        
+        nR = len(R) - 1
+        i0, j0, j1 = self.active_region(a,R,p,smin,smax,Cmin)
+        order = [k for k in np.lexsort((i0, j0)) if j1[k] > j0[k]]
+        cost = lambda n, i, j, k: n*((nR - i + 1)*(k - j + 1) + overhead)
+        groups = []
+        for k in order:
+            if groups:
+                g, i, j, l = groups[-1]
+                m = (min(i, i0[k]), min(j, j0[k]), max(l, j1[k]))
+                if cost(len(g)+1, *m) <= cost(len(g), i, j, l) + cost(1, i0[k], j0[k], j1[k]):
+                    groups[-1] = (g + [k],) + m
+                    continue
+            groups.append(([k], i0[k], j0[k], j1[k]))
+        for g, i, j, l in groups:
+            g = np.array(g)
+            tmp = self.completeness_block(a[j:l+1],R[i:],p,smin[g],smax[g],Cmin[g,j:l+1])
+            yield g, i, j, l, tmp
+    
+    def DoS_block(self,a,R,p,smin,smax,Cmin):
+        '''Calculates depth of search for each bin for a block of stars by
+        averaging the completeness at the bin corners
+        
+        Gives the same values as one_DoS_bins for each star. Completeness is
+        evaluated only on the active regions of the stars, see block_regions.
+        
+        Args:
+            a (ndarray):
+                1D array of semi-major axis bin edges in AU
+            R (ndarray):
+                1D array of planetary radius bin edges in AU
+            p (float):
+                expected value of geometric albedo
+            smin (ndarray):
+                1D array of minimum separation values in AU
+            smax (ndarray):
+                1D array of maximum separation values in AU
+            Cmin (ndarray):
+                2D array of minimum contrast for each star and semi-major axis
+                bin edge
+        
+        Returns:
+            f (ndarray):
+                3D array of depth of search values in each bin for each star
+        
+        '''
+        
+        f = np.zeros((len(smin),len(R)-1,len(a)-1))
+        for g, i, j, l, tmp in self.block_regions(a,R,p,smin,smax,Cmin):
+            sub = tmp[:,:-1,:-1] + tmp[:,1:,:-1]
+            sub += tmp[:,:-1,1:]
+            sub += tmp[:,1:,1:]
+            sub *= 0.25
+            f[g,i:,j:l] = sub
+        
+        return f
+    
+    def DoS_refine(self,a,R,p,smin,smax,dist,C_inst,WA,tol=1e-2,depth=3,Cmin=None):
+        '''Calculates depth of search for each bin for a block of stars with
+        adaptive refinement of the bins
+        
+        Bins are averaged from their corners as in DoS_block, except where 
+        the completeness at the four corners differs by more than tol. Those
+        bins are split into four at the geometric midpoints of the edges, 
+        and each part is refined the same way down to depth splits, so 
+        flagged bins get the average of a grid up to 2**depth times finer. 
+        Minimum contrast at the new semi-major axis values is found with 
+        find_Cmin once for each star and value.
+        
+        Args:
+            a (ndarray):
+                1D array of semi-major axis bin edges in AU
+            R (ndarray):
+                1D array of planetary radius bin edges in AU
+            p (float):
+                expected value of geometric albedo
+            smin (ndarray):
+                1D array of minimum separation values in AU
+            smax (ndarray):
+                1D array of maximum separation values in AU
+            dist (ndarray):
+                1D array of stellar distance values in pc
+            C_inst (ndarray):
+                2D array of instrument contrast at working angle for each star
+            WA (ndarray):
+                1D array of working angles in arcseconds
+            tol (float):
+                largest difference of completeness between the corners of a 
+                bin which is not refined (optional)
+            depth (int):
+                maximum number of times a bin is split (optional)
+            Cmin (ndarray):
+                2D array of minimum contrast for each star and semi-major axis
+                bin edge, found with find_Cmin if None (optional)
+        
+        Returns:
+            f (ndarray):
+                3D array of depth of search values in each bin for each star
+        
+        '''
+        
+        a = np.asarray(a, dtype=float)
+        R = np.asarray(R, dtype=float)
+        smin = np.asarray(smin, dtype=float)
+        smax = np.asarray(smax, dtype=float)
+        dist = np.asarray(dist, dtype=float)
+        C_inst = np.array(C_inst, ndmin=2, dtype=float)
+        if Cmin is None:
+            Cmin = self.find_Cmin(a,smin,smax,dist,C_inst,WA)
+        # corner values (radius, semi-major axis) of each bin, zero outside
+        # of the active regions
+        shape = (len(smin),len(R)-1,len(a)-1)
+        v = [np.zeros(shape) for k in xrange(4)]
+        for g, i, j, l, tmp in self.block_regions(a,R,p,smin,smax,Cmin):
+            for x, y in zip(v, [tmp[:,:-1,:-1], tmp[:,:-1,1:], tmp[:,1:,:-1], tmp[:,1:,1:]]):
+                x[g,i:,j:l] = y
+        f = v[0] + v[2]
+        f += v[1]
+        f += v[3]
+        f *= 0.25
+        spread = np.max(v, axis=0) - np.min(v, axis=0)
+        s, i, j = np.nonzero(spread > tol)
+        if depth < 1 or len(s) == 0:
+            return f
+        
+        # bins being refined with their owning bin, star, edges, minimum 
+        # contrast at the semi-major axis edges, corner values, and the 
+        # semi-major axis index on the grid refined level times
+        owner = np.ravel_multi_index((s,i,j), f.shape)
+        f.flat[owner] = 0.0
+        w = np.ones(len(s))
+        a0, a1, R0, R1 = a[j], a[j+1], R[i], R[i+1]
+        C0, C1 = Cmin[s,j], Cmin[s,j+1]
+        v = [x[s,i,j] for x in v]
+        ja = j.astype(np.int64)
+        na = (len(a) - 1)*2**depth + 1
+        leaves = []
+        for level in xrange(1, depth+1):
+            am, Rm = np.sqrt(a0*a1), np.sqrt(R0*R1)
+            ja = 2*ja
+            # minimum contrast at the midpoints once for each star and value
+            key, first, inv = np.unique(s*na + (ja + 1)*2**(depth - level), \
+                                        return_index=True, return_inverse=True)
+            Cm = self.find_Cmin(am[first,None],smin[s[first]],smax[s[first]],\
+                                dist[s[first]],C_inst[s[first]],WA)[inv,0]
+            g = lambda x, y, C: self.completeness(x,y,p,smin[s],smax[s],C)
+            vm0, vm1 = g(a0,Rm,C0), g(a1,Rm,C1)
+            v0m, vmm, v1m = g(am,R0,Cm), g(am,Rm,Cm), g(am,R1,Cm)
+            # the four parts: lower and upper radius, inner and outer 
+            # semi-major axis
+            parts = [((a0,am,R0,Rm,C0,Cm,ja), [v[0],v0m,vm0,vmm]), \
+                     ((am,a1,R0,Rm,Cm,C1,ja+1), [v0m,v[1],vmm,vm1]), \
+                     ((a0,am,Rm,R1,C0,Cm,ja), [vm0,vmm,v[2],v1m]), \
+                     ((am,a1,Rm,R1,Cm,C1,ja+1), [vmm,vm1,v1m,v[3]])]
+            w = 0.25*w
+            cells = []
+            for edges, corners in parts:
+                split = np.max(corners, axis=0) - np.min(corners, axis=0) > tol
+                if level == depth:
+                    split[:] = False
+                leaf = ~split
+                leaves.append((owner[leaf], w[leaf]*0.25*np.sum(corners, axis=0)[leaf]))
+                cells.append([x[split] for x in (owner,w,s) + edges] + \
+                             [x[split] for x in corners])
+            if level == depth or sum(len(c[0]) for c in cells) == 0:
+                break
+            owner, w, s, a0, a1, R0, R1, C0, C1, ja = \
+                [np.hstack([c[k] for c in cells]) for k in xrange(10)]
+            v = [np.hstack([c[k] for c in cells]) for k in xrange(10,14)]
+        owner, val = [np.hstack(x) for x in zip(*leaves)]
+        f += np.bincount(owner, weights=val, minlength=f.size).reshape(f.shape)
+        
+        return f
+
+    def DoS_sum(self,a,aa,R,RR,pexp,smin,smax,dist,C_inst,WA,n_jobs=1,mem=64.0,tol=None,depth=3):
         '''Sums the depth of search
         
         Args:
@@ -417,6 +1689,16 @@ class DoSFuncs(object):
                 instrument contrast at working angle
             WA (ndarray):
                 working angles in arcseconds
+            n_jobs (int):
+                number of processes used to split the stars, -1 uses all 
+                cores (optional)
+            mem (float):
+                memory budget in MB for each block of stars (optional)
+            tol (float):
+                if given, bins are refined where the completeness at the 
+                corners differs by more than tol, see DoS_refine (optional)
+            depth (int):
+                maximum number of times a bin is split (optional)
             
         Returns:
             DoS (ndarray):
@@ -424,35 +1706,419 @@ class DoSFuncs(object):
         
         '''
         
-        DoS = np.zeros((aa.shape[0]-1,aa.shape[1]-1))
-        for i in xrange(len(smin)):
-            Cs = interpolate.InterpolatedUnivariateSpline(WA, C_inst[i], k=1,ext=3)
-            Cmin = np.zeros(a.shape)
-            # expected value of Cmin calculations for each separation
-            for j in xrange(len(a)):
-                if a[j] < smin[i]:
-                    Cmin[j] = 1.0
-                else:
-                    if a[j] > smax[i]:
-                        su = smax[i]
-                    else:
-                        su = a[j]
-                    # find expected value of minimum contrast from contrast curve
-                    tup = np.sqrt(1.0-(smin[i]/a[j])**2)
-                    tlow = np.sqrt(1.0-(su/a[j])**2)
-                    f = lambda t,a=a[j],d=dist[i]: Cs(a*np.sqrt(1.0-t**2)/d)
-                    val = integrate.quad(f, tlow, tup, epsabs=0,epsrel=1e-3,limit=100)[0]
-                    Cmin[j] = val/(tup - tlow)
-                    
-            CC,RR = np.meshgrid(Cmin,R)
-            tmp = self.one_DoS_bins(aa,RR,pexp,smin[i],smax[i],CC)
-            DoS += tmp
+        DoS = self.DoS_groups(a,aa,R,RR,pexp,smin,smax,dist,C_inst,WA,np.zeros(len(smin),dtype=int),\
+                              1,n_jobs,mem,tol,depth)[0]
         
         return DoS
+    
+    def DoS_groups(self,a,aa,R,RR,pexp,smin,smax,dist,C_inst,WA,labels,ngroups,n_jobs=1,mem=64.0,tol=None,depth=3):
+        '''Sums the depth of search for each group of stars in one pass
+        
+        Args:
+            a (ndarray):
+                1D array of semi-major axis bin edge values in AU
+            aa (ndarray):
+                2D grid of semi-major axis bin edge values in AU
+            R (ndarray):
+                1D array of planetary radius bin edge values in AU
+            RR (ndarray):
+                2D grid of planetary radius bin edge values in AU
+            pexp (float):
+                expected value of geometric albedo
+            smin (ndarray):
+                1D array of minimum separation values in AU
+            smax (ndarray):
+                1D array of maximum separation values in AU
+            dist (ndarray):
+                1D array of stellar distance values in pc
+            C_inst (ndarray):
+                instrument contrast at working angle
+            WA (ndarray):
+                working angles in arcseconds
+            labels (ndarray):
+                1D array of group index of each star, stars labeled -1 are 
+                skipped
+            ngroups (int):
+                number of groups
+            n_jobs (int):
+                number of processes used to split the stars, -1 uses all 
+                cores (optional)
+            mem (float):
+                memory budget in MB for each block of stars (optional)
+            tol (float):
+                if given, bins are refined where the completeness at the 
+                corners differs by more than tol, see DoS_refine (optional)
+            depth (int):
+                maximum number of times a bin is split (optional)
+            
+        Returns:
+            DoS (ndarray):
+                3D array of depth of search values summed for each group
+        
+        '''
+        
+        DoS = np.zeros((ngroups,aa.shape[0]-1,aa.shape[1]-1))
+        for step in self.DoS_stream(a,aa,R,RR,pexp,smin,smax,dist,C_inst,WA,labels,ngroups,\
+                                    n_jobs,mem,tol,depth):
+            DoS = step['DoS']
+        
+        return DoS
+    
+    def DoS_stream(self,a,aa,R,RR,pexp,smin,smax,dist,C_inst,WA,labels,ngroups,n_jobs=1,mem=64.0,tol=None,depth=3,size=None):
+        '''Generates the running sum of the depth of search for each group of
+        stars after each chunk of stars
+        
+        Chunks are those of DoS_chunks, in star order, so stars should be 
+        ordered by expected contribution when the generator may be stopped 
+        early. Closing the generator stops the process pool. The yielded 
+        arrays are updated in place by later chunks and must be copied to 
+        be kept.
+        
+        Args:
+            a (ndarray):
+                1D array of semi-major axis bin edge values in AU
+            aa (ndarray):
+                2D grid of semi-major axis bin edge values in AU
+            R (ndarray):
+                1D array of planetary radius bin edge values in AU
+            RR (ndarray):
+                2D grid of planetary radius bin edge values in AU
+            pexp (float):
+                expected value of geometric albedo
+            smin (ndarray):
+                1D array of minimum separation values in AU
+            smax (ndarray):
+                1D array of maximum separation values in AU
+            dist (ndarray):
+                1D array of stellar distance values in pc
+            C_inst (ndarray):
+                instrument contrast at working angle
+            WA (ndarray):
+                working angles in arcseconds
+            labels (ndarray):
+                1D array of group index of each star, stars labeled -1 are 
+                skipped
+            ngroups (int):
+                number of groups
+            n_jobs (int):
+                number of processes used to split the stars, -1 uses all 
+                cores (optional)
+            mem (float):
+                memory budget in MB for each block of stars (optional)
+            tol (float):
+                if given, bins are refined where the completeness at the 
+                corners differs by more than tol, see DoS_refine (optional)
+            depth (int):
+                maximum number of times a bin is split (optional)
+            size (int):
+                maximum number of stars in each chunk (optional)
+        
+        Yields:
+            step (dict):
+                dictionary with keys:
+                    nStars (int):
+                        number of stars summed so far
+                    stars (ndarray):
+                        1D array of indices of the stars of the chunk
+                    DoS (ndarray):
+                        3D array of depth of search summed so far for each 
+                        group
+                    batch (ndarray):
+                        3D array of depth of search of the stars of the chunk
+                        for each group
+        
+        '''
+        
+        keep = np.where(np.asarray(labels) >= 0)[0]
+        if len(keep) == 0:
+            return
+        labels = np.asarray(labels)[keep]
+        DoS = np.zeros((ngroups,aa.shape[0]-1,aa.shape[1]-1))
+        batch = np.zeros(DoS.shape)
+        chunks = self.DoS_chunks(a,aa,R,pexp,smin[keep],smax[keep],dist[keep],C_inst[keep],\
+                                 WA,n_jobs,mem,tol,depth,size)
+        # per-star grids are added in star order so the result does not 
+        # depend on n_jobs
+        k = 0
+        try:
+            for tmp in chunks:
+                batch[:] = 0.0
+                for j in xrange(len(tmp)):
+                    DoS[labels[k+j]] += tmp[j]
+                    batch[labels[k+j]] += tmp[j]
+                yield {'nStars': k + len(tmp), 'stars': keep[k:k+len(tmp)], 'DoS': DoS, 'batch': batch}
+                k += len(tmp)
+        finally:
+            chunks.close()
 
-    def find_ck(self,amin,amax,smin,smax,Cmin,pexp,Rexp):
+    def DoS_stars(self,a,aa,R,RR,pexp,smin,smax,dist,C_inst,WA,n_jobs=1,mem=64.0,tol=None,depth=3):
+        '''Finds the depth of search of each star as a sparse store
+        
+        Args:
+            a (ndarray):
+                1D array of semi-major axis bin edge values in AU
+            aa (ndarray):
+                2D grid of semi-major axis bin edge values in AU
+            R (ndarray):
+                1D array of planetary radius bin edge values in AU
+            RR (ndarray):
+                2D grid of planetary radius bin edge values in AU
+            pexp (float):
+                expected value of geometric albedo
+            smin (ndarray):
+                1D array of minimum separation values in AU
+            smax (ndarray):
+                1D array of maximum separation values in AU
+            dist (ndarray):
+                1D array of stellar distance values in pc
+            C_inst (ndarray):
+                instrument contrast at working angle
+            WA (ndarray):
+                working angles in arcseconds
+            n_jobs (int):
+                number of processes used to split the stars, -1 uses all 
+                cores (optional)
+            mem (float):
+                memory budget in MB for each block of stars (optional)
+            tol (float):
+                if given, bins are refined where the completeness at the 
+                corners differs by more than tol, see DoS_refine (optional)
+            depth (int):
+                maximum number of times a bin is split (optional)
+            
+        Returns:
+            stars (DoSStars):
+                sparse store of depth of search values for each star
+        
+        '''
+        
+        from DoSStars import DoSStars
+        
+        stars = DoSStars((aa.shape[0]-1,aa.shape[1]-1))
+        for tmp in self.DoS_chunks(a,aa,R,pexp,smin,smax,dist,C_inst,WA,n_jobs,mem,tol,depth):
+            stars.append(tmp)
+        
+        return stars
+    
+    def DoS_chunks(self,a,aa,R,pexp,smin,smax,dist,C_inst,WA,n_jobs=1,mem=64.0,tol=None,depth=3,size=None):
+        '''Generates the depth of search of each star for chunks of stars in 
+        star order
+        
+        Each chunk is evaluated by DoS_block, or DoS_refine if tol is given,
+        and the number of stars in a chunk is chosen so that its arrays fit
+        in the memory budget. The fraction of bins outside of the active 
+        regions of the stars (see active_region), which are not evaluated, 
+        is printed.
+        
+        Args:
+            a (ndarray):
+                1D array of semi-major axis bin edge values in AU
+            aa (ndarray):
+                2D grid of semi-major axis bin edge values in AU
+            R (ndarray):
+                1D array of planetary radius bin edge values in AU
+            pexp (float):
+                expected value of geometric albedo
+            smin (ndarray):
+                1D array of minimum separation values in AU
+            smax (ndarray):
+                1D array of maximum separation values in AU
+            dist (ndarray):
+                1D array of stellar distance values in pc
+            C_inst (ndarray):
+                instrument contrast at working angle
+            WA (ndarray):
+                working angles in arcseconds
+            n_jobs (int):
+                number of processes used to split the stars, -1 uses all 
+                cores (optional)
+            mem (float):
+                memory budget in MB for each chunk (optional)
+            tol (float):
+                if given, bins are refined where the completeness at the 
+                corners differs by more than tol, see DoS_refine (optional)
+            depth (int):
+                maximum number of times a bin is split (optional)
+            size (int):
+                maximum number of stars in each chunk (optional)
+        
+        Yields:
+            f (ndarray):
+                3D array of depth of search values in each bin for each star
+                of the chunk
+        
+        '''
+        
+        # expected value of Cmin for each star and semi-major axis
+        Cmin = self.find_Cmin(a,smin,smax,dist,C_inst,WA)
+        # bins outside of the active region of each star are skipped
+        i0, j0, j1 = self.active_region(a,R,pexp,smin,smax,Cmin)
+        cells = (len(R) - 1)*(len(a) - 1)*len(smin)
+        active = np.sum((len(R) - 1 - i0)*(j1 - j0))
+        print 'Skipping %.1f%% of depth of search bins outside of active regions' \
+            % (100.0*(1.0 - active/max(float(cells), 1.0)))
+        self.monitor.count('DoS_stars', len(smin))
+        self.monitor.count('DoS_bins', active)
+        if n_jobs < 1:
+            import multiprocessing
+            n_jobs = multiprocessing.cpu_count()
+        n_jobs = max(min(n_jobs, len(smin)), 1)
+        # about four arrays of the grid size are used for each star
+        chunk = max(int(mem*2**20/(32.0*aa.shape[0]*aa.shape[1])), 1)
+        if size is not None:
+            chunk = max(min(chunk, int(size)), 1)
+        # several chunks per process to balance the load
+        nchunks = max(4*n_jobs, int(np.ceil(len(smin)/float(chunk))))
+        chunks = np.array_split(np.arange(len(smin)), nchunks)
+        args = [(type(self),a,R,pexp,smin[c],smax[c],Cmin[c],dist[c],C_inst[c],WA,tol,depth) \
+                for c in chunks if len(c) > 0]
+        if n_jobs == 1:
+            for arg in args:
+                yield _DoS_bins_chunk(arg)
+        else:
+            import multiprocessing
+            pool = multiprocessing.Pool(n_jobs)
+            try:
+                for f in pool.imap(_DoS_bins_chunk, args):
+                    yield f
+            finally:
+                pool.close()
+                pool.join()
+
+    def find_Cmin(self,a,smin,smax,dist,C_inst,WA):
+        '''Finds the expected value of minimum contrast over the PDF of 
+        separation for each star and semi-major axis
+        
+        With the transformation t = sqrt(1-(s/a)**2) the expected value is the
+        average of C(a*sqrt(1-t**2)/d) over t. The contrast curve C is linear 
+        between working angles (held constant outside of them), so the 
+        integral over each working angle interval is found exactly from the 
+        antiderivative of sqrt(1-t**2). All stars and semi-major axis values 
+        are evaluated at once with one pass over the working angle intervals.
+        
+        Args:
+            a (ndarray):
+                1D array of semi-major axis values in AU, or 2D array of 
+                semi-major axis values for each star
+            smin (ndarray):
+                1D array of minimum separation values in AU
+            smax (ndarray):
+                1D array of maximum separation values in AU
+            dist (ndarray):
+                1D array of stellar distance values in pc
+            C_inst (ndarray):
+                2D array of instrument contrast at working angle for each star
+            WA (ndarray):
+                1D array of working angles in arcseconds
+        
+        Returns:
+            Cmin (ndarray):
+                2D array of expected minimum contrast (stars by semi-major axis),
+                1.0 where a < smin
+        
+        '''
+        
+        a = np.array(a, ndmin=1, dtype=float)
+        if a.ndim == 1:
+            a = a[np.newaxis,:]
+        smin = np.array(smin, ndmin=1, dtype=float)[:,np.newaxis]
+        smax = np.array(smax, ndmin=1, dtype=float)[:,np.newaxis]
+        dist = np.array(dist, ndmin=1, dtype=float)[:,np.newaxis]
+        C_inst = np.array(C_inst, ndmin=2, dtype=float)
+        WA = np.array(WA, ndmin=1, dtype=float)
+        
+        # limits of t for each star and semi-major axis
+        su = np.minimum(a, smax)
+        self.monitor.count('find_Cmin_evals', su.size)
+        tup = np.sqrt(1.0 - np.clip(smin/a, 0.0, 1.0)**2)
+        tlow = np.sqrt(1.0 - np.clip(su/a, 0.0, 1.0)**2)
+        # antiderivative of sqrt(1-t**2)
+        H = lambda t: 0.5*(t*np.sqrt(1.0 - t**2) + np.arcsin(t))
+        # t at working angle W clipped to the limits
+        T = lambda W: np.clip(np.sqrt(np.clip(1.0 - (dist*W/a)**2, 0.0, 1.0)), tlow, tup)
+        
+        val = np.zeros(tup.shape)
+        # constant contrast inside of WA[0]
+        Tk = T(WA[0])
+        val += C_inst[:,:1]*(tup - Tk)
+        # linear contrast between working angles
+        for k in xrange(len(WA)-1):
+            Tk1 = T(WA[k+1])
+            slope = (C_inst[:,k+1:k+2] - C_inst[:,k:k+1])/(WA[k+1] - WA[k])
+            val += (C_inst[:,k:k+1] - slope*WA[k])*(Tk - Tk1) + slope*a/dist*(H(Tk) - H(Tk1))
+            Tk = Tk1
+        # constant contrast outside of WA[-1]
+        val += C_inst[:,-1:]*(Tk - tlow)
+        
+        Cmin = np.ones(val.shape)
+        width = tup - tlow
+        good = width > 0.0
+        Cmin[good] = val[good]/width[good]
+        # only one separation is possible where smin == su
+        point = (a >= smin) & ~good
+        if np.any(point):
+            rows = np.nonzero(point)[0]
+            w = (smin/dist)[rows,0]
+            j = np.clip(np.searchsorted(WA, w) - 1, 0, len(WA) - 2)
+            x = np.clip((w - WA[j])/(WA[j+1] - WA[j]), 0.0, 1.0)
+            Cmin[point] = (1.0 - x)*C_inst[rows,j] + x*C_inst[rows,j+1]
+        
+        return Cmin
+
+    def sma_roots(self,k,b):
+        '''Finds the two positive roots in semi-major axis of the quartic 
+        z**4 - z**3/sqrt(k) + b**2/(4*k) = 0
+        
+        Substituting t = z*sqrt(k) gives t**4 - t**3 + q = 0 with q = k*b**2/4,
+        which has two positive real roots for 0 < q <= 27/256. These are found
+        in closed form from the real root of the resolvent cubic
+        y**3 - 4*q*y - q = 0. q is clipped to 27/256 so that the double root
+        is returned where no real roots exist.
+        
+        Args:
+            k (ndarray):
+                array of flux ratio values normalized by p*R**2 in 1/AU**2
+            b (ndarray):
+                array of separation values in AU (broadcast with k)
+        
+        Returns:
+            zl (ndarray):
+                smaller root in AU
+            zu (ndarray):
+                larger root in AU
+        
+        '''
+        
+        q = np.clip(0.25*k*b**2, 0.0, 27.0/256.0)
+        # real root of resolvent cubic from Cardano's formula
+        disc = np.sqrt(np.clip(0.25*q**2 - 64.0/27.0*q**3, 0.0, None))
+        y = np.cbrt(0.5*q + disc) + np.cbrt(0.5*q - disc)
+        R = np.sqrt(0.25 + y)
+        # quadratic factor t**2 - (1/2 + R)*t + (y/2 + y/(4R)) holds the real roots
+        s = 0.5 + R
+        p = 0.5*y + 0.25*y/R
+        tu = 0.5*(s + np.sqrt(np.clip(s**2 - 4.0*p, 0.0, None)))
+        # product of roots avoids cancellation in the smaller root
+        tl = p/tu
+        zl = tl/np.sqrt(k)
+        zu = tu/np.sqrt(k)
+        
+        return zl, zu
+
+    def find_ck(self,amin,amax,smin,smax,Cmin,pexp,Rexp,nodes=16):
         '''Finds ck metric
         
+        The integral over the normalized flux ratio k is split into at most 
+        five segments bounded by k1 through k6 and the limiting value kmin. 
+        Segments are selected with array masks and all stars are integrated 
+        at once with a fixed Gauss-Legendre rule. Each segment is mapped with 
+        log(k) = log(hi) - log(hi/lo)*u**2, which follows the 1/k decay of the 
+        integrand and removes the square root behavior of the roots where 
+        they coalesce at k4 and k6. With the default number of nodes ck 
+        agrees with the previous per-star adaptive quadrature 
+        (scipy.integrate.quad with epsrel=1e-4 on each segment) to a relative 
+        tolerance of 1e-5.
+        
         Args:
             amin (float):
                 minimum semi-major axis value in AU
@@ -468,6 +2134,8 @@ class DoSFuncs(object):
                 expected value of geometric albedo
             Rexp (float):
                 expected value of planetary radius in AU
+            nodes (int):
+                number of Gauss-Legendre nodes per segment (optional)
             
         Returns:
             ck (ndarray):
@@ -475,11 +2143,14 @@ class DoSFuncs(object):
         
         '''
         
+        smin = np.array(smin, ndmin=1, dtype=float)
+        smax = np.array(smax, ndmin=1, dtype=float)
         an = 1.0/np.log(amax/amin)
         cg = an*(np.sqrt(1.0-(smax/amax)**2) - np.sqrt(1.0-(smin/amax)**2) + np.log(smax/(np.sqrt(1.0-(smax/amax)**2)+1.0))-np.log(smin/(np.sqrt(1.0-(smin/amax)**2)+1.0)))
         
-        # calculate ck
-        anp = an/cg 
+        # calculate ck, zero where smin == smax (cg is 0)
+        anp = np.zeros(cg.shape)
+        anp[cg > 0] = an/cg[cg > 0]
         # intermediate values
         k1 = np.cos(0.5*(np.pi-np.arcsin(smin/amax)))**4/amax**2
         k2 = np.cos(0.5*(np.pi-np.arcsin(smax/amax)))**4/amax**2
@@ -487,107 +2158,48 @@ class DoSFuncs(object):
         k4 = 27.0/64.0*smax**(-2)
         k5 = np.cos(0.5*np.arcsin(smin/amax))**4/amax**2
         k6 = 27.0/64.0*smin**(-2)
-        
-        # set up
-        z = sympy.Symbol('z', positive=True)
-        k = sympy.Symbol('k', positive=True)
-        b = sympy.Symbol('b', positive=True)
-        # solve
-        sol = solve(z**4 - z**3/sympy.sqrt(k) + b**2/(4*k), z)
-        # third and fourth roots give valid roots
-        # lambdify these roots
-        sol3 = sympy.lambdify((k,b), sol[2], "numpy")
-        sol4 = sympy.lambdify((k,b), sol[3], "numpy")
-        
-        # find ck   
-        ck = np.zeros(smin.shape)
         kmin = Cmin/(pexp*Rexp**2)
-        for i in xrange(len(ck)):
-            if smin[i] == smax[i]:
-                ck[i] = 0.0
-            else:
-                # equations to integrate
-                al1 = lambda k: sol3(k,smin[i])
-                au1 = lambda k: sol4(k,smin[i])
-                au2 = lambda k: sol3(k,smax[i])
-                al2 = lambda k: sol4(k,smax[i])
-                
-                f12 = lambda k: anp[i]/(2.0*np.sqrt(k))*(amax - al1(k))
-                f23 = lambda k: anp[i]/(2.0*np.sqrt(k))*(au2(k) - al1(k))
-                f34 = lambda k: anp[i]/(2.0*np.sqrt(k))*(amax - al2(k) + au2(k) - al1(k))
-                f45 = lambda k: anp[i]/(2.0*np.sqrt(k))*(amax - al1(k))
-                f56 = lambda k: anp[i]/(2.0*np.sqrt(k))*(au1(k) - al1(k))
-                f35 = lambda k: anp[i]/(2.0*np.sqrt(k))*(amax - al2(k) + au2(k) - al1(k))
-                f54 = lambda k: anp[i]/(2.0*np.sqrt(k))*(au1(k) - al2(k) + au2(k) - al1(k))
-                f46 = lambda k: anp[i]/(2.0*np.sqrt(k))*(au1(k) - al1(k))
-                
-                if k4[i] < k5[i]:
-                    if kmin < k1[i]:
-                        ck[i] = integrate.quad(f12,k1[i],k2[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        if k2[i] != k3[i]:
-                            ck[i] += integrate.quad(f23,k2[i],k3[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        ck[i] += integrate.quad(f34,k3[i],k4[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        ck[i] += integrate.quad(f45,k4[i],k5[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        ck[i] += integrate.quad(f56,k5[i],k6[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                    elif (kmin > k1[i]) and (kmin < k2[i]):
-                        ck[i] = integrate.quad(f12,kmin,k2[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        if k2[i] != k3[i]:
-                            ck[i] += integrate.quad(f23,k2[i],k3[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        ck[i] += integrate.quad(f34,k3[i],k4[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        ck[i] += integrate.quad(f45,k4[i],k5[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        ck[i] += integrate.quad(f56,k5[i],k6[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                    elif (kmin > k2[i]) and (kmin < k3[i]):
-                        ck[i] = integrate.quad(f23,kmin,k3[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        ck[i] += integrate.quad(f34,k3[i],k4[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        ck[i] += integrate.quad(f45,k4[i],k5[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        ck[i] += integrate.quad(f56,k5[i],k6[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                    elif (kmin > k3[i]) and (kmin < k4[i]):
-                        ck[i] = integrate.quad(f34,kmin,k4[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        ck[i] += integrate.quad(f45,k4[i],k5[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        ck[i] += integrate.quad(f56,k5[i],k6[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                    elif (kmin > k4[i]) and (kmin < k5[i]):
-                        ck[i] = integrate.quad(f45,kmin,k5[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        ck[i] += integrate.quad(f56,k5[i],k6[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                    elif (kmin < k6[i]):
-                        ck[i] = integrate.quad(f56,kmin,k6[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                    else:
-                        ck[i] = 0.0
-                else:
-                    if kmin < k1[i]:
-                        ck[i] = integrate.quad(f12,k1[i],k2[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        if k2[i] != k3[i]:
-                            ck[i] += integrate.quad(f23,k2[i],k3[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        ck[i] += integrate.quad(f35,k3[i],k5[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        ck[i] += integrate.quad(f54,k5[i],k4[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        ck[i] += integrate.quad(f46,k4[i],k6[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                    elif (kmin > k1[i]) and (kmin < k2[i]):
-                        ck[i] = integrate.quad(f12,kmin,k2[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        if k2[i] != k3[i]:
-                            ck[i] += integrate.quad(f23,k2[i],k3[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        ck[i] += integrate.quad(f35,k3[i],k5[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        ck[i] += integrate.quad(f54,k5[i],k4[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        ck[i] += integrate.quad(f46,k4[i],k6[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                    elif (kmin > k2[i]) and (kmin < k3[i]):
-                        ck[i] = integrate.quad(f23,kmin,k3[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        ck[i] += integrate.quad(f35,k3[i],k5[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        ck[i] += integrate.quad(f54,k5[i],k4[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        ck[i] += integrate.quad(f46,k4[i],k6[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                    elif (kmin > k3[i]) and (kmin < k5[i]):
-                        ck[i] = integrate.quad(f35,kmin,k5[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        ck[i] += integrate.quad(f54,k5[i],k4[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        ck[i] += integrate.quad(f46,k4[i],k6[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                    elif (kmin > k5[i]) and (kmin < k4[i]):
-                        ck[i] = integrate.quad(f54,kmin,k4[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                        ck[i] += integrate.quad(f46,k4[i],k6[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                    elif (kmin < k6[i]):
-                        ck[i] = integrate.quad(f46,kmin,k6[i],limit=50,epsabs=0,epsrel=1e-4)[0]
-                    else:
-                        ck[i] = 0.0
-                
+        # k4 < k5 gives segments k3-k4-k5-k6 otherwise k3-k5-k4-k6
+        order = k4 < k5
+        k45 = np.minimum(k4, k5)
+        k54 = np.maximum(k4, k5)
+        
+        # segment limits, each row is one segment for all stars
+        lo = np.vstack((k1, k2, k3, k45, k54))
+        hi = np.vstack((k2, k3, k45, k54, k6))
+        # integrate only above kmin
+        lo = np.maximum(lo, kmin)
+        hi = np.maximum(hi, lo)
+        
+        # Gauss-Legendre nodes and weights on [0,1]
+        x, w = np.polynomial.legendre.leggauss(nodes)
+        x = 0.5*(x + 1.0)
+        w = 0.5*w
+        # log(k) = log(hi) - log(hi/lo)*u**2, dk = 2*log(hi/lo)*k*u*du
+        L = np.log(hi/lo)[:,:,np.newaxis]
+        k = hi[:,:,np.newaxis]*np.exp(-L*x**2)
+        
+        self.monitor.count('find_ck_evals', k.size)
+        al1, au1 = self.sma_roots(k, smin[:,np.newaxis])
+        au2, al2 = self.sma_roots(k, smax[:,np.newaxis])
+        
+        f = np.zeros(k.shape)
+        f[0] = amax - al1[0]
+        f[1] = au2[1] - al1[1]
+        f[2] = amax - al2[2] + au2[2] - al1[2]
+        f[3] = np.where(order[:,np.newaxis], amax - al1[3], \
+                        au1[3] - al2[3] + au2[3] - al1[3])
+        f[4] = au1[4] - al1[4]
+        f *= anp[:,np.newaxis]/(2.0*np.sqrt(k))
+        
+        ck = np.sum(f*2.0*L*k*x*w, axis=(0,2))
+        ck[cg <= 0] = 0.0
+        
         return ck
 
-    def select_obs(self,t0,maxTime,ck):
-        '''Selects stars for observation using ortools
+    def select_obs(self,t0,maxTime,ck,solver='cbc',timeLimit=None,full_output=False):
+        '''Selects stars for observation by maximizing the sum of ck within 
+        the total observation time
         
         Args:
             t0 (ndarray):
@@ -596,37 +2208,41 @@ class DoSFuncs(object):
                 total observation time allotted in days
             ck (ndarray):
                 1D array of ck metric
+            solver (str):
+                name of the solver in DoSSelect.solvers: 'cbc' (ortools 
+                mixed integer programming), 'bb' (exact branch and bound),
+                'dp' (dynamic programming on scaled integration times), or
+                'greedy' (optional)
+            timeLimit (float):
+                maximum solver time in seconds (optional)
+            full_output (bool):
+                if True, information about the solution is also returned 
+                (optional)
         
         Returns:
             sInds (ndarray):
                 1D array of star indices selected for observation
+            info (dict):
+                solver, objective, bound, relative optimality gap, optimal 
+                flag, and solver time in seconds, only returned if 
+                full_output is True
         
         '''
-
-        #set up solver
-        solver = pywraplp.Solver('SolveIntegerProblem',pywraplp.Solver.CBC_MIXED_INTEGER_PROGRAMMING)
-        #need one var per state
-        xs = [ solver.IntVar(0.0,1.0, 'x'+str(j)) for j in range(len(ck)) ]
-        #constraint is x_i*t_i < maxtime
-        constraint1 = solver.Constraint(-solver.infinity(),maxTime)
-        for j,x in enumerate(xs):
-            constraint1.SetCoefficient(x, t0[j])
-        #objective is max x_i*comp_i
-        objective = solver.Objective()
-        for j,x in enumerate(xs):
-            objective.SetCoefficient(x, ck[j])
-        objective.SetMaximization()
-        res = solver.Solve()
-        print 'Objective function value: %r' % (solver.Objective().Value())
-        #collect result
-        xs2 = np.array([x.solution_value() for x in xs])
-        
-        # observed star indices for depth of search calculations
-        sInds = np.where(xs2>0)[0]
+        
+        import time
+        import DoSSelect
+        
+        t1 = time.time()
+        sInds, info = DoSSelect.solvers[solver](t0,ck,maxTime,timeLimit=timeLimit)
+        info['solver'] = solver
+        info['time'] = time.time() - t1
+        print 'Objective function value: %r (bound %r, gap %.2e)' % (info['objective'], info['bound'], info['gap'])
+        
+        if full_output:
+            return sInds, info
         
         return sInds
 
-
     def plot_dos(self,targ,name,path=None):
         '''Plots depth of search as a filled contour plot with contour lines
         
@@ -637,44 +2253,13 @@ class DoSFuncs(object):
             name (str):
                 string indicating what to put in title of figure
             path (str):
-                desired path to save figure (pdf, optional)
-        
-        '''
-        
-        acents = 0.5*(self.result['aedges'][1:]+self.result['aedges'][:-1])
-        a = np.hstack((self.result['aedges'][0],acents,self.result['aedges'][-1]))
-        a = np.around(a,4)
-        Rcents = 0.5*(self.result['Redges'][1:]+self.result['Redges'][:-1])
-        R = np.hstack((self.result['Redges'][0],Rcents,self.result['Redges'][-1]))
-        R = np.around(R,4)
-        DoS = self.result['DoS'][targ]
-        # extrapolate to left-most boundary
-        tmp = DoS[:,0] + (a[0]-a[1])*((DoS[:,1]-DoS[:,0])/(a[2]-a[1]))
-        DoS = np.insert(DoS, 0, tmp, axis=1)
-        # extrapolate to right-most boundary
-        tmp = DoS[:,-1] + (a[-1]-a[-2])*((DoS[:,-1]-DoS[:,-2])/(a[-2]-a[-3]))
-        DoS = np.insert(DoS, -1, tmp, axis=1)
-        # extrapolate to bottom-most boundary
-        tmp = DoS[0,:] + (R[0]-R[1])*((DoS[1,:]-DoS[0,:])/(R[2]-R[1]))
-        DoS = np.insert(DoS, 0, tmp, axis=0)
-        # extrapolate to upper-most boundary
-        tmp = DoS[-1,:] + (R[-1]-R[-2])*((DoS[-1,:]-DoS[-2,:])/(R[-2]-R[-3]))
-        DoS = np.insert(DoS, -1, tmp, axis=0)
-        DoS = np.ma.masked_where(DoS<=0.0, DoS)
-        fig = plt.figure()
-        ax = fig.add_subplot(111)
-        cs = ax.contourf(a,R,DoS,locator=ticker.LogLocator())
-        cs2 = ax.contour(a,R,DoS,levels=cs.levels[1:],colors='k')
-        ax.set_xscale('log')
-        ax.set_yscale('log')
-        ax.set_xlabel('a (AU)')
-        ax.set_ylabel('R ($R_\oplus$)')
-        ax.set_title('Depth of Search - '+name+' ('+str(self.result['NumObs'][targ])+')')
-        cbar = fig.colorbar(cs)
-        ax.clabel(cs2, fmt=ticker.LogFormatterMathtext(), colors='k')
-        if path != None:
-            fig.savefig(path, format='pdf', dpi=600, bbox_inches='tight', pad_inches=0.1)
-        plt.show()
+                desired path to save figure (pdf, optional), the figure is 
+                shown if None
+        
+        '''
+        
+        self._plot(self.result['DoS'][targ], \
+                   'Depth of Search - '+name+' ('+str(self.result['NumObs'][targ])+')', path)
 
     def plot_nplan(self,targ,name,path=None):
         '''Plots depth of search convolved with occurrence rates as a filled 
@@ -683,48 +2268,74 @@ class DoSFuncs(object):
         Args:
             targ (str):
                 string indicating which key to access from depth of search 
-                result dictionary
+                convolved with occurrence rates result dictionary
             name (str):
                 string indicating what to put in title of figure
             path (str):
-                desired path to save figure (pdf, optional)
-        
-        '''
-        
-        acents = 0.5*(self.result['aedges'][1:]+self.result['aedges'][:-1])
-        a = np.hstack((self.result['aedges'][0],acents,self.result['aedges'][-1]))
-        a = np.around(a,4)
-        Rcents = 0.5*(self.result['Redges'][1:]+self.result['Redges'][:-1])
-        R = np.hstack((self.result['Redges'][0],Rcents,self.result['Redges'][-1]))
-        R = np.around(R,4)
-        DoS_occ = self.result['DoS_occ'][targ]
-        # extrapolate to left-most boundary
-        tmp = DoS_occ[:,0] + (a[0]-a[1])*((DoS_occ[:,1]-DoS_occ[:,0])/(a[2]-a[1]))
-        DoS_occ = np.insert(DoS_occ, 0, tmp, axis=1)
-        # extrapolate to right-most boundary
-        tmp = DoS_occ[:,-1] + (a[-1]-a[-2])*((DoS_occ[:,-1]-DoS_occ[:,-2])/(a[-2]-a[-3]))
-        DoS_occ = np.insert(DoS_occ, -1, tmp, axis=1)
-        # extrapolate to bottom-most boundary
-        tmp = DoS_occ[0,:] + (R[0]-R[1])*((DoS_occ[1,:]-DoS_occ[0,:])/(R[2]-R[1]))
-        DoS_occ = np.insert(DoS_occ, 0, tmp, axis=0)
-        # extrapolate to upper-most boundary
-        tmp = DoS_occ[-1,:] + (R[-1]-R[-2])*((DoS_occ[-1,:]-DoS_occ[-2,:])/(R[-2]-R[-3]))
-        DoS_occ = np.insert(DoS_occ, -1, tmp, axis=0)
-        DoS_occ = np.ma.masked_where(DoS_occ <= 0.0, DoS_occ)
+                desired path to save figure (pdf, optional), the figure is 
+                shown if None
+        
+        '''
+        
+        self._plot(self.result['DoS_occ'][targ], \
+                   'Number of Planets - '+name+' ('+str(self.result['NumObs'].get(targ, 0))+')', path)
+    
+    def _plot(self,Z,title,path):
+        '''Plots a grid with pyplot, saving it to path or showing it'''
+        
+        import matplotlib.pyplot as plt
+        import matplotlib.colorbar as colorbar
+        from DoSPlot import draw
+        
         fig = plt.figure()
         ax = fig.add_subplot(111)
-        cs = ax.contourf(a,R,DoS_occ,locator=ticker.LogLocator())
-        cs2 = ax.contour(a,R,DoS_occ,levels=cs.levels[1:],colors='k')
-        ax.set_xscale('log')
-        ax.set_yscale('log')
-        ax.set_xlabel('a (AU)')
-        ax.set_ylabel('R ($R_\oplus$)')
-        ax.set_title('Number of Planets - '+name+' ('+str(self.result['NumObs'][targ])+')')
-        cbar = fig.colorbar(cs)
-        ax.clabel(cs2, fmt=ticker.LogFormatterMathtext(), colors='k')
-        if path != None:
+        cax, kw = colorbar.make_axes(ax)
+        draw(ax, cax, self.result['aedges'], self.result['Redges'], Z, title)
+        if path is None:
+            plt.show()
+        else:
             fig.savefig(path, format='pdf', dpi=600, bbox_inches='tight', pad_inches=0.1)
-        plt.show()
+            plt.close(fig)
+    
+    def save_plots(self, directory, n_jobs=1, fmt='pdf', rows=None, cols=None):
+        '''Saves depth of search and expected planet plots of every group
+        without a display, rendered in a process pool, see DoSPlot
+        
+        Plots are saved as 'DoS_<key>.<fmt>' and 'nplan_<key>.<fmt>', or 
+        with rows and cols as the pages of 'DoS.pdf' and 'nplan.pdf' with 
+        rows*cols panels per page.
+        
+        Args:
+            directory (str):
+                string containing directory path for files
+            n_jobs (int):
+                number of rendering processes, -1 uses all cores (optional)
+            fmt (str):
+                file format of single plots (optional)
+            rows (int):
+                number of rows of panels on a page (optional)
+            cols (int):
+                number of columns of panels on a page (optional)
+        
+        '''
+        
+        from DoSPlot import DoSPlot
+        
+        names = {'DoS': 'Depth of Search', 'nplan': 'Number of Planets'}
+        results = {'DoS': self.result['DoS'], 'nplan': self.result['DoS_occ']}
+        dpi = 600 if fmt == 'pdf' else 100
+        with DoSPlot(self.result['aedges'], self.result['Redges'], n_jobs, dpi=dpi, batch=1) as plots:
+            for kind in ['DoS', 'nplan']:
+                # each kind is plotted for the keys of its own result
+                keys = sorted(results[kind])
+                grids = [results[kind][key] for key in keys]
+                titles = [names[kind]+' - '+key+' ('+str(self.result['NumObs'].get(key, 0))+')' for key in keys]
+                if rows is None and cols is None:
+                    for key, Z, title in zip(keys, grids, titles):
+                        plots.plot(Z, title, os.path.join(directory, kind+'_'+key+'.'+fmt))
+                else:
+                    plots.page(grids, titles, os.path.join(directory, kind+'.pdf'), rows or 1, cols or 1)
+        print 'Plots saved in '+directory
     
     def save_results(self, path):
         '''Saves results and outspec dictionaries to disk
@@ -740,6 +2351,58 @@ class DoSFuncs(object):
             pickle.dump(x, f)
             print 'Results saved as '+path
         
+    def save_archive(self, path, mode='w'):
+        '''Saves results, the observed star table, and outspec to a chunked 
+        result archive, see DoSArchive
+        
+        Arrays are named 'aedges', 'Redges', 'DoS/<key>', 'occ_rates/<key>',
+        'DoS_occ/<key>', 'stars/<column>' for the TargetList columns in 
+        star_columns, and 'DoS_stars/<array>' with store_stars. NumObs, 
+        selection, monitor, the units of the star columns, and outspec are archive 
+        attributes.
+        
+        Args:
+            path (str):
+                string containing directory path for the archive
+            mode (str):
+                'w' to replace an existing archive or 'a' to add to it 
+                (optional)
+        
+        Returns:
+            archive (DoSArchive):
+                archive of the results
+        
+        '''
+        
+        from DoSArchive import DoSArchive
+        archive = DoSArchive(path, mode)
+        archive.write('aedges', self.result['aedges'])
+        archive.write('Redges', self.result['Redges'])
+        for name in ['DoS', 'occ_rates', 'DoS_occ']:
+            for key in sorted(self.result[name]):
+                archive.write(name+'/'+key, self.result[name][key])
+        if 'DoS_stars' in self.result:
+            arrays = self.result['DoS_stars'].arrays()
+            for key in sorted(arrays):
+                archive.write('DoS_stars/'+key, arrays[key])
+        units = {}
+        for col in self.star_columns:
+            if not hasattr(self.sim.TargetList, col):
+                continue
+            x = getattr(self.sim.TargetList, col)
+            if hasattr(x, 'unit'):
+                units[col] = str(x.unit)
+                x = x.value
+            x = np.asarray(x)
+            if x.dtype.kind in 'OU':
+                x = np.array(map(str, x))
+            archive.write('stars/'+col, x)
+        archive.update(NumObs=self.result['NumObs'], selection=self.result.get('selection'), \
+                       monitor=self.result.get('monitor'), units=units, outspec=json.loads(json.dumps(self.outspec, default=str)))
+        print 'Results saved as '+path
+        
+        return archive
+        
     def save_json(self, path):
         '''Saves json file used to generate results to disk
         
@@ -786,3 +2449,34 @@ class DoSFuncs(object):
         # save DoS_occ
         for key in self.result['DoS_occ'].keys():
             np.savetxt(directory+'/DoS_occ_'+key+'.csv', self.result['DoS_occ'][key], delimiter=', ')
+
+def _DoS_bins_chunk(args):
+    '''Calculates depth of search in each bin for a chunk of stars, used by
+    DoSFuncs.DoS_chunks, also as a process pool worker
+    
+    Args:
+        args (tuple):
+            class of the DoSFuncs object, 1D array of semi-major axis bin edge
+            values in AU, 1D array of planetary radius bin edge values in AU,
+            expected value of geometric albedo, 1D arrays of minimum and 
+            maximum separation values in AU, 2D array of expected minimum
+            contrast, 1D array of stellar distance values in pc, and 2D array
+            of instrument contrast for the chunk, 1D array of working angles
+            in arcseconds, refinement tolerance (None for no refinement), and
+            maximum refinement depth
+    
+    Returns:
+        f (ndarray):
+            3D array of depth of search values in each bin for each star
+    
+    '''
+    
+    cls, a, R, pexp, smin, smax, Cmin, dist, C_inst, WA, tol, depth = args
+    # kernel methods do not depend on instance state
+    obj = cls.__new__(cls)
+    if tol is None:
+        f = obj.DoS_block(a,R,pexp,smin,smax,Cmin)
+    else:
+        f = obj.DoS_refine(a,R,pexp,smin,smax,dist,C_inst,WA,tol,depth,Cmin)
+    
+    return f
@@ -7,29 +7,20 @@ Updated Mon Oct 22, 2018
 """
 
 import numpy as np
-import os
-import EXOSIMS.MissionSim as MissionSim
-import scipy.integrate as integrate
-import scipy.interpolate as interpolate
-import scipy.optimize as optimize
-import astropy.constants as const
-import astropy.units as u
-try:
-    import cPickle as pickle
-except:
-    import pickle
 from DoSFuncs import DoSFuncs
+# scipy and astropy are imported in methods
 
 class DoSFuncsMulders(DoSFuncs):
     '''Calculates depth of search values for a given input EXOSIMS json script. 
     Only stellar types M, K, G, and F are used. All other stellar types are 
-    filtered out. Occurrence rates are extrapolated from data in Mulders 2015.
+    filtered out. Occurrence rates are extrapolated from data in Mulders 2015,
+    or another occurrence table registered in DoSOccurrence.
     
     'core_contrast' must be specified in the input json script as either a 
     path to a fits file or a constant value, otherwise the default contrast 
     value from EXOSIMS will be used
     
-    path must be specified
+    path or sim must be specified, see from_arrays for inputs given as arrays
     
     Args:
         path (str):
@@ -46,6 +37,47 @@ class DoSFuncsMulders(DoSFuncs):
             limiting dMag value for integration time calculation (optional)
         WA_targ (astropy Quantity):
             working angle for target astrophysical contrast (optional)
+        n_jobs (int):
+            number of processes for depth of search calculations, -1 uses 
+            all cores (optional)
+        cache_dir (str):
+            directory for cached intermediate results, results are reused
+            when the outspec and arguments are unchanged (optional)
+        store_stars (bool):
+            if True, the depth of search of each observed star is kept in
+            result['DoS_stars'] (optional)
+        solver (str):
+            solver for the selection of observed stars: 'cbc', 'bb', 'dp', or
+            'greedy', see select_obs (optional)
+        timeLimit (float):
+            maximum time in seconds for the selection solver (optional)
+        block_mem (float):
+            memory budget in MB for each block of stars in the depth of 
+            search calculations (optional)
+        refine_tol (float):
+            if given, depth of search bins whose corner completeness values
+            differ by more than refine_tol are refined, see DoS_refine 
+            (optional)
+        refine_depth (int):
+            maximum number of times a depth of search bin is split when 
+            refine_tol is given (optional)
+        occ_table (str):
+            name of the occurrence table registered in DoSOccurrence 
+            (optional)
+        occ_stat (str):
+            statistic of the occurrence table used, 'Mean' or 'Upper' for 
+            Mulders 2015 (optional)
+        group_by (tuple):
+            TargetList attribute name and bins grouping the stars in 
+            addition to stellar type, see attribute_groups, e.g. ('Spec', 2)
+            for spectral subclasses or ('dist', [0, 5, 10, 20]) for distance
+            shells in pc (optional)
+        sim (object):
+            object providing the parts of EXOSIMS.MissionSim used here, such
+            as DoSSim.ArraySim, used instead of path (optional)
+        monitor (DoSMonitor):
+            records time, memory, star counts, and evaluation counts of each
+            stage, True for a new DoSMonitor, disabled if None (optional)
             
     Attributes:
         result (dict):
@@ -54,7 +86,7 @@ class DoSFuncsMulders(DoSFuncs):
                 NumObs (dict):
                     dictionary containing number of observations for each 
                     stellar type, keys are: 'Mstars', 'Kstars', 'Gstars', 
-                    'Fstars', and 'all'
+                    'Fstars', 'all', and the keys of the group_by groups
                 aedges (ndarray):
                     1D array of semi-major axis bin edges in AU
                 Redges (ndarray):
@@ -62,7 +94,7 @@ class DoSFuncsMulders(DoSFuncs):
                 DoS (dict):
                     dictionary containing 2D arrays of depth of search for
                     each stellar type, keys are: 'Mstars', 'Kstars', 'Gstars',
-                    'Fstars', and 'all'
+                    'Fstars', 'all', and the keys of the group_by groups
                 occ_rates (dict):
                     dictionary containing 2D arrays of occurrence rates
                     extrapolated from Mulders 2015, keys are: 'Mstars', 'Kstars',
@@ -70,285 +102,138 @@ class DoSFuncsMulders(DoSFuncs):
                 DoS_occ (dict):
                     dictionary containing 2D arrays of depth of search convolved
                     with the extrapolated occurrence rates, keys are: 'Mstars',
-                    'Kstars', 'Gstars', 'Fstars', and 'all'
+                    'Kstars', 'Gstars', 'Fstars', 'all', and the keys of the 
+                    group_by groups
+                DoS_stars (DoSStars):
+                    sparse store of depth of search for each observed star,
+                    only included if store_stars is True
+                selection (dict):
+                    solver, objective, bound, relative optimality gap, 
+                    optimal flag, and solver time of the selection of 
+                    observed stars
+                monitor (dict):
+                    summary of the stages from DoSMonitor.summary, only
+                    included if monitor is enabled
         sim (object):
             EXOSIMS.MissionSim object used to generate target list and 
             integration times
         outspec (dict):
             EXOSIMS.MissionSim output specification
+        candidates (dict):
+            separations, integration times, ck, instrument contrast, and 
+            groups of the stars considered for observation, and the indices 
+            of the selected stars, used by sweep and stream
+        occ_table (str):
+            name of the occurrence table
+        occ_stat (str):
+            statistic of the occurrence table used
     
     '''
     
-    def __init__(self, path=None, abins=100, Rbins=30, maxTime=365.0, intCutoff=30.0, dMag=None, WA_targ=None):
-        if path is None:
-            raise ValueError('path must be specified')
-        if path is not None:
-            # generate EXOSIMS.MissionSim object to calculate integration times
-            self.sim = MissionSim.MissionSim(scriptfile=path)
-            print 'Acquired EXOSIMS data from %r' % (path)
-        if dMag is not None:
-            try:
-                float(dMag)
-            except TypeError:
-                print 'dMag can have only one value'
-        if WA_targ is not None:
-            try:
-                float(WA_targ.value)
-            except AttributeError:
-                print 'WA_targ must be astropy Quantity'
-            except TypeError:
-                print 'WA_targ can have only one value'
-        self.result = {}
-        # minimum and maximum values of semi-major axis and planetary radius
-        # NO astropy Quantities
-        amin = self.sim.PlanetPopulation.arange[0].to('AU').value
-        amax = self.sim.PlanetPopulation.arange[1].to('AU').value
-        Rmin = self.sim.PlanetPopulation.Rprange[0].to('earthRad').value
-        assert Rmin < 45.0, 'Minimum planetary radius is above extrapolation range'
-        if Rmin < 0.35:
-            print 'Rmin reset to 0.35*R_earth'
-            Rmin = 0.35
-        Rmax = self.sim.PlanetPopulation.Rprange[1].to('earthRad').value
-        assert Rmax > 0.35, 'Maximum planetary radius is below extrapolation range'
-        if Rmax > 45.0:
-            print 'Rmax reset to 45.0*R_earth'
-        assert Rmax > Rmin, 'Maximum planetary radius is less than minimum planetary radius'
-        # need to get Cmin from contrast curve
-        mode = filter(lambda mode: mode['detectionMode'] == True, self.sim.OpticalSystem.observingModes)[0]
-        WA = np.linspace(mode['IWA'], mode['OWA'], 50)
-        syst = mode['syst']
-        lam = mode['lam']
-        if dMag is None:
-            # use dMagLim when dMag not specified
-            dMag = self.sim.Completeness.dMagLim
-        fZ = self.sim.ZodiacalLight.fZ0
-        fEZ = self.sim.ZodiacalLight.fEZ0
-        if WA_targ is None:
-            core_contrast = syst['core_contrast'](lam,WA)
-            contrast = interpolate.interp1d(WA.to('arcsec').value, core_contrast, \
-                                    kind='cubic', fill_value=1.0)
-            # find minimum value of contrast
-            opt = optimize.minimize_scalar(contrast, \
-                                       bounds=[mode['IWA'].to('arcsec').value, \
-                                               mode['OWA'].to('arcsec').value],\
-                                               method='bounded')
-            Cmin = opt.fun
-            WA_targ = opt.x*u.arcsec
+    occ_table = 'Mulders'
+    occ_stat = 'Mean'
+    
+    def __init__(self, path=None, *args, **kwargs):
+        self.occ_table = kwargs.pop('occ_table', self.occ_table)
+        self.occ_stat = kwargs.pop('occ_stat', self.occ_stat)
+        DoSFuncs.__init__(self, path, *args, **kwargs)
+    
+    def target_types(self):
+        '''Finds stars in the target list of the stellar types used
         
-        t_int1 = self.sim.OpticalSystem.calc_intTime(self.sim.TargetList,np.array([0]),fZ,fEZ,dMag,WA_targ,mode)
-        t_int1 = np.repeat(t_int1.value,len(WA))*t_int1.unit
-        sInds = np.repeat(0,len(WA))
-        fZ1 = np.repeat(fZ.value,len(WA))*fZ.unit
-        fEZ1 = np.repeat(fEZ.value,len(WA))*fEZ.unit
-        core_contrast = 10.0**(-0.4*self.sim.OpticalSystem.calc_dMag_per_intTime(t_int1,self.sim.TargetList,sInds,fZ1,fEZ1,WA,mode))
-        contrast = interpolate.interp1d(WA.to('arcsec').value,core_contrast,kind='cubic',fill_value=1.0)
-        opt = optimize.minimize_scalar(contrast,bounds=[mode['IWA'].to('arcsec').value,mode['OWA'].to('arcsec').value],method='bounded')
-        Cmin = opt.fun
+        Only stellar types M, K, G, and F are used.
         
-        # find expected values of p and R
-        if self.sim.PlanetPopulation.prange[0] != self.sim.PlanetPopulation.prange[1]:
-            if hasattr(self.sim.PlanetPopulation,'ps'):
-                f = lambda R: self.sim.PlanetPopulation.get_p_from_Rp(R*u.earthRad)*self.sim.PlanetPopulation.dist_radius(R)
-                pexp, err = integrate.quad(f,self.sim.PlanetPopulation.Rprange[0].value,\
-                                           self.sim.PlanetPopulation.Rprange[1].value,\
-                                           epsabs=0,epsrel=1e-6,limit=100)
-            else:
-                f = lambda p: p*self.sim.PlanetPopulation.dist_albedo(p)
-                pexp, err = integrate.quad(f,self.sim.PlanetPopulation.prange[0],\
-                                       self.sim.PlanetPopulation.prange[1],\
-                                        epsabs=0,epsrel=1e-6,limit=100)
-        else:
-            pexp = self.sim.PlanetPopulation.prange[0]
-        print 'Expected value of geometric albedo: %r' % (pexp)
-        if self.sim.PlanetPopulation.Rprange[0] != self.sim.PlanetPopulation.Rprange[1]:
-            f = lambda R: R*self.sim.PlanetPopulation.dist_radius(R)
-            Rexp, err = integrate.quad(f,self.sim.PlanetPopulation.Rprange[0].to('earthRad').value,\
-                                       self.sim.PlanetPopulation.Rprange[1].to('earthRad').value,\
-                                        epsabs=0,epsrel=1e-4,limit=100)
-            Rexp *= u.earthRad.to('AU')
-        else:
-            Rexp = self.sim.PlanetPopulation.Rprange[0].to('AU').value
+        Returns:
+            sInds (ndarray):
+                1D array of star indices in the target list
+        
+        '''
         
         # include only F G K M stars
-        spec = np.array(map(str, self.sim.TargetList.Spec))
-        iF = np.where(np.core.defchararray.startswith(spec, 'F'))[0]
-        iG = np.where(np.core.defchararray.startswith(spec, 'G'))[0]
-        iK = np.where(np.core.defchararray.startswith(spec, 'K'))[0]
-        iM = np.where(np.core.defchararray.startswith(spec, 'M'))[0]
-        i = np.append(np.append(iF, iG), iK)
-        i = np.append(i,iM)
-        i = np.unique(i)
-        self.sim.TargetList.revise_lists(i)
+        spec = np.array(map(str, self.sim.TargetList.Spec), dtype='S1')
+        sInds = np.where(np.in1d(spec, ['M', 'K', 'G', 'F']))[0]
         print 'Filtered target stars to only include M, K, G, and F type'
-        # minimum and maximum separations
-        smin = (np.tan(mode['IWA'])*self.sim.TargetList.dist).to('AU').value
-        smax = (np.tan(mode['OWA'])*self.sim.TargetList.dist).to('AU').value
-        smax[smax>amax] = amax
-    
-        # include only stars where smin > amin
-        bigger = np.where(smin>amin)[0]
-        self.sim.TargetList.revise_lists(bigger)
-        smin = smin[bigger]
-        smax = smax[bigger]
+        
+        return sInds
     
-        # include only stars where smin < amax
-        smaller = np.where(smin<amax)[0]
-        self.sim.TargetList.revise_lists(smaller)
-        smin = smin[smaller]
-        smax = smax[smaller]
+    def star_groups(self):
+        '''Groups stars in the target list by stellar type for the depth of 
+        search calculations
         
-        # calculate integration times
-        sInds = np.arange(self.sim.TargetList.nStars)
+        Returns:
+            groups (list):
+                list of (key, indices) tuples giving the result dictionary key
+                and 1D array of star indices in the target list for each group,
+                keys are: 'Mstars', 'Kstars', 'Gstars', and 'Fstars'
         
-        # calculate maximum integration time
-        t_int = self.sim.OpticalSystem.calc_intTime(self.sim.TargetList, sInds, fZ, fEZ, dMag, WA_targ, mode)
+        '''
         
-        # remove integration times above cutoff
-        cutoff = np.where(t_int.to('day').value<intCutoff)[0]
-        self.sim.TargetList.revise_lists(cutoff)
-        smin = smin[cutoff]
-        smax = smax[cutoff]
-        t_int = t_int[cutoff]
-
-        print 'Beginning ck calculations'
-        ck = self.find_ck(amin,amax,smin,smax,Cmin,pexp,Rexp)
-        # offset to account for zero ck values with nonzero completeness
-        ck += ck[ck>0.0].min()*1e-2
-        print 'Finished ck calculations'
+        # find which are M K G F stars from the first letter of the type
+        spec = np.array(map(str, self.sim.TargetList.Spec), dtype='S1')
+        groups = [(key+'stars', np.where(spec == key)[0]) for key in ['M', 'K', 'G', 'F']]
+        
+        return groups
+    
+    def find_occ_rates(self,aedges,Redges,amin):
+        '''Finds occurrence rates on the grid for each stellar type by 
+        extrapolating from Mulders 2015 or the table named by occ_table
+        
+        Args:
+            aedges (ndarray):
+                1D array of semi-major axis bin edges in AU
+            Redges (ndarray):
+                1D array of planetary radius bin edges in R_earth
+            amin (float):
+                minimum semi-major axis in AU
+        
+        Returns:
+            occ_rates (dict):
+                dictionary containing 2D arrays of occurrence rates, keys are:
+                'Mstars', 'Kstars', 'Gstars', and 'Fstars'
         
-        print 'Beginning ortools calculations to determine list of observed stars'
-        sInds = self.select_obs(t_int.to('day').value,maxTime,ck)
-        print 'Finished ortools calculations'
-        # include only stars chosen for observation
-        self.sim.TargetList.revise_lists(sInds)
-        smin = smin[sInds]
-        smax = smax[sInds]
-        t_int = t_int[sInds]
-        ck = ck[sInds]
+        '''
         
-        # get contrast array for given integration times
-        sInds2 = np.arange(self.sim.TargetList.nStars)
-        fZ2 = np.repeat(fZ.value,len(WA))*fZ.unit
-        fEZ2 = np.repeat(fEZ.value,len(WA))*fEZ.unit
-        C_inst = np.zeros((len(sInds2),len(WA)))
-        for i in xrange(len(sInds2)):
-            t_int2 = np.repeat(t_int[i].value,len(WA))*t_int.unit
-            sInds2a = np.repeat(sInds2[i],len(WA))
-            C_inst[i,:] = 10.0**(-0.4*self.sim.OpticalSystem.calc_dMag_per_intTime(t_int2,self.sim.TargetList,sInds2a,fZ2,fEZ2,WA,mode))
+        import astropy.constants as const
+        import astropy.units as u
+        import DoSOccurrence
         
-        # find which are M K G F stars
-        spec = np.array(map(str, self.sim.TargetList.Spec))
-        Mlist = np.where(np.core.defchararray.startswith(spec, 'M'))[0]
-        Klist = np.where(np.core.defchararray.startswith(spec, 'K'))[0]
-        Glist = np.where(np.core.defchararray.startswith(spec, 'G'))[0]
-        Flist = np.where(np.core.defchararray.startswith(spec, 'F'))[0]
-        print '%r M stars observed' % (len(Mlist))
-        print '%r K stars observed' % (len(Klist))
-        print '%r G stars observed' % (len(Glist))
-        print '%r F stars observed' % (len(Flist))
-        print '%r total stars observed' % (len(Mlist)+len(Klist)+len(Glist)+len(Flist))
-        NumObs = {'Mstars':len(Mlist), 'Kstars':len(Klist), 'Gstars':len(Glist),\
-              'Fstars':len(Flist), 'all':(len(Mlist)+len(Klist)+len(Glist)\
-                           +len(Flist))}
-        # store number of observed stars in result
-        self.result['NumObs'] = NumObs
-        # find bin edges for semi-major axis and planetary radius in AU
-        aedges = np.logspace(np.log10(amin), np.log10(amax), abins+1)
-        Redges = np.logspace(np.log10(Rmin*u.earthRad.to('AU')), \
-                         np.log10(Rmax*u.earthRad.to('AU')), Rbins+1)
-        # store aedges and Redges in result
-        self.result['aedges'] = aedges
-        self.result['Redges'] = Redges/u.earthRad.to('AU')
-    
-        aa, RR = np.meshgrid(aedges,Redges) # in AU
-    
-        # get depth of search for each stellar type
-        DoS = {}
-        print 'Beginning depth of search calculations for observed M stars'
-        if len(Mlist) > 0:
-            DoS['Mstars'] = self.DoS_sum(aedges, aa, Redges, RR, pexp, smin[Mlist], \
-               smax[Mlist], self.sim.TargetList.dist[Mlist].to('pc').value, C_inst[Mlist,:], WA)
-        else:
-            DoS['Mstars'] = np.zeros((aa.shape[0]-1,aa.shape[1]-1))
-        print 'Finished depth of search calculations for observed M stars'
-        print 'Beginning depth of search calculations for observed K stars'
-        if len(Klist) > 0:
-            DoS['Kstars'] = self.DoS_sum(aedges, aa, Redges, RR, pexp, smin[Klist], \
-               smax[Klist], self.sim.TargetList.dist[Klist].to('pc').value, C_inst[Klist,:], WA)
-        else:
-            DoS['Kstars'] = np.zeros((aa.shape[0]-1,aa.shape[1]-1))
-        print 'Finished depth of search calculations for observed K stars'
-        print 'Beginning depth of search calculations for observed G stars'
-        if len(Glist) > 0:
-            DoS['Gstars'] = self.DoS_sum(aedges, aa, Redges, RR, pexp, smin[Glist], \
-               smax[Glist], self.sim.TargetList.dist[Glist].to('pc').value, C_inst[Glist,:], WA)
-        else:
-            DoS['Gstars'] = np.zeros((aa.shape[0]-1,aa.shape[1]-1))
-        print 'Finished depth of search calculations for observed G stars'
-        print 'Beginning depth of search calculations for observed F stars'
-        if len(Flist) > 0:
-            DoS['Fstars'] = self.DoS_sum(aedges, aa, Redges, RR, pexp, smin[Flist], \
-               smax[Flist], self.sim.TargetList.dist[Flist].to('pc').value, C_inst[Flist,:], WA)
-        else:
-            DoS['Fstars'] = np.zeros((aa.shape[0]-1,aa.shape[1]-1))
-        print 'Finished depth of search calculations for observed F stars'
-        DoS['all'] = DoS['Mstars'] + DoS['Kstars'] + DoS['Gstars'] + DoS['Fstars']
-        # store DoS in result
-        self.result['DoS'] = DoS
-    
-        # load occurrence data from file
-        print 'Loading occurrence data'
-        directory = os.path.dirname(os.path.abspath(__file__))
-        rates = pickle.load(open(directory+'/Mulders.ocr','rb'))
+        # occurrence data is loaded once per process
+        rates, meta = DoSOccurrence.load(self.occ_table)
     
         # values from Mulders
-        Redges /= u.earthRad.to('AU')     
         Periods = rates['PeriodEdges']*u.day
         Radii = rates['RpEdges']
         dP = np.log10(Periods[1:]/Periods[:-1]).decompose().value
         dR = np.log10(Radii[1:]/Radii[:-1])
         ddP, ddR = np.meshgrid(dP, dR)
+        
+        # probability of each semi-major axis bin, shared by stellar types
+        fa = self.sim.PlanetPopulation.dist_sma
+        fac2 = np.diff(self.find_cdf(fa, aedges, self.sim.PlanetPopulation.arange.to('AU').value))
     
-        # extrapolate occurrence values to new grid
+        # extrapolate occurrence values to new grid, rebinned grids are 
+        # reused for the same table, grid, and semi-major axis distribution
         occ_rates = {}
-        print 'Extrapolating occurrence rates for M stars'
-        occ_rates['Mstars'] = self.find_occurrence(0.35*const.M_sun,ddP,ddR,Radii,\
-                 Periods,rates['MstarsMean'],aedges,Redges,\
-                              self.sim.PlanetPopulation.dist_sma,amin)
-        print 'Extrapolating occurrence rates for K stars'
-        occ_rates['Kstars'] = self.find_occurrence(0.70*const.M_sun,ddP,ddR,Radii,\
-                 Periods,rates['KstarsMean'],aedges,Redges,\
-                              self.sim.PlanetPopulation.dist_sma,amin)
-        print 'Extrapolating occurrence rates for G stars'
-        occ_rates['Gstars'] = self.find_occurrence(0.91*const.M_sun,ddP,ddR,Radii,\
-                 Periods,rates['GstarsMean'],aedges,Redges,\
-                              self.sim.PlanetPopulation.dist_sma,amin)
-        print 'Extrapolating occurrence rates for F stars'
-        occ_rates['Fstars'] = self.find_occurrence(1.08*const.M_sun,ddP,ddR,Radii,\
-                 Periods,rates['FstarsMean'],aedges,Redges,\
-                              self.sim.PlanetPopulation.dist_sma,amin)
-        self.result['occ_rates'] = occ_rates
-          
-        # Multiply depth of search with occurrence rates
-        r_norm = Redges[1:] - Redges[:-1]
-        a_norm = aedges[1:] - aedges[:-1]
-        norma, normR = np.meshgrid(a_norm,r_norm)
-        DoS_occ = {}
-        print 'Multiplying depth of search grid with occurrence rate grid'
-        DoS_occ['Mstars'] = DoS['Mstars']*occ_rates['Mstars']*norma*normR
-        DoS_occ['Kstars'] = DoS['Kstars']*occ_rates['Kstars']*norma*normR
-        DoS_occ['Gstars'] = DoS['Gstars']*occ_rates['Gstars']*norma*normR
-        DoS_occ['Fstars'] = DoS['Fstars']*occ_rates['Fstars']*norma*normR
-        DoS_occ['all'] = DoS_occ['Mstars']+DoS_occ['Kstars']+DoS_occ['Gstars']+DoS_occ['Fstars']
-        self.result['DoS_occ'] = DoS_occ
+        for key, name in [('Mstars', 'M'), ('Kstars', 'K'), ('Gstars', 'G'), ('Fstars', 'F')]:
+            mass = meta['masses'][key]
+            ckey = (self.occ_table, self.occ_stat, mass, amin, aedges.tobytes(), \
+                    Redges.tobytes(), fac2.tobytes())
+            if ckey not in DoSOccurrence.rebinned:
+                print 'Extrapolating occurrence rates for %s stars' % (name)
+                DoSOccurrence.rebinned[ckey] = self.find_occurrence(mass*const.M_sun,ddP,ddR,\
+                    Radii,Periods,rates[key+self.occ_stat],aedges,Redges,fa,amin,fac2)
+            occ_rates[key] = DoSOccurrence.rebinned[ckey].copy()
         
-        # store MissionSim output specification dictionary
-        self.outspec = self.sim.genOutSpec()
-        print 'Calculations finished'
+        return occ_rates
         
-    def find_occurrence(self,Mass,ddP,ddR,R,P,Matrix,aedges,Redges,fa,amin):
+    def find_occurrence(self,Mass,ddP,ddR,R,P,Matrix,aedges,Redges,fa,amin,fac2=None):
         '''Extrapolates occurrence rates from Mulders 2015
         
+        Occurrence is taken as uniform in planetary radius within each 
+        Mulders bin, so the rates in the radius bins are differences of the
+        interpolated cumulative occurrence. The semi-major axis dependence 
+        follows fa, integrated with find_cdf.
+        
         Args:
             Mass (Quantity):
                 Stellar type mass astropy Quantity in kg
@@ -370,6 +255,9 @@ class DoSFuncsMulders(DoSFuncs):
                 probability density function of semi-major axis
             amin (float):
                 minimum semi-major axis in AU
+            fac2 (ndarray):
+                1D array of integrals of fa over each semi-major axis bin, 
+                found from fa if None (optional)
         
         Returns:
             etas (ndarray):
@@ -377,35 +265,21 @@ class DoSFuncsMulders(DoSFuncs):
         
         '''
         
+        import astropy.constants as const
+        
         sma = ((const.G*Mass*P**2/(4.0*np.pi**2))**(1.0/3.0)).decompose().to('AU').value
         
         occ = Matrix*ddP*ddR
         occAll = np.sum(occ, axis=1)
         
-        etas = np.zeros((len(Redges)-1,len(aedges)-1))
-        fac1 = integrate.quad(fa, amin, sma[-1])[0]
+        breaks = self.sim.PlanetPopulation.arange.to('AU').value
+        if fac2 is None:
+            fac2 = np.diff(self.find_cdf(fa, aedges, breaks))
+        fac1 = np.diff(self.find_cdf(fa, [amin, sma[-1]], breaks))[0]
         # occurrence rate as function of R
-        Rvals = np.zeros((len(Redges)-1,))
-        for i in xrange(len(Redges)-1):
-            for j in xrange(len(R)):
-                if Redges[i] < R[j]:
-                    break
-            for k in xrange(len(R)):
-                if Redges[i+1] < R[k]:
-                    break
-            if k-j == 0:
-                Rvals[i] = (Redges[i+1]-Redges[i])/(R[j]-R[j-1])*occAll[j-1]
-            elif k-j == 1:
-                Rvals[i] = (R[j]-Redges[i])/(R[j]-R[j-1])*occAll[j-1]
-                Rvals[i] += (Redges[i+1]-R[j])/(R[j+1]-R[j])*occAll[j]
-            else:
-                Rvals[i] = (R[j]-Redges[i])/(R[j]-R[j-1])*occAll[j-1]
-                Rvals[i] += np.sum(occAll[j:k-1])
-                Rvals[i] += (Redges[i+1]-R[k-1])/(R[k]-R[k-1])*occAll[k-1]
+        Rvals = np.diff(np.interp(Redges, R, np.hstack((0.0, np.cumsum(occAll)))))
         
         # extrapolate to new grid
-        for i in xrange(len(aedges)-1):
-            fac2 = integrate.quad(fa, aedges[i], aedges[i+1])[0]
-            etas[:,i] = Rvals*fac2/fac1
+        etas = np.outer(Rvals, fac2)/fac1
         
         return etas
\ No newline at end of file
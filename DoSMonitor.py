@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16, 2026
+"""
+
+import sys
+import time
+
+class DoSMonitor(object):
+    '''Records wall time, CPU time, and peak memory of each stage of the
+    depth of search calculations, with star counts and evaluation counts
+
+    Stages are timed with 'with monitor.stage(name):'. Every record goes
+    through record, which subclasses may override to forward records
+    elsewhere (e.g. to logging) as they happen. A disabled monitor records
+    nothing and its stage returns a shared empty context, so it costs about
+    one attribute lookup per call. Counts are kept only in the calling
+    process, so work done in process pool workers is not counted.
+
+    Args:
+        enabled (bool):
+            if False, nothing is recorded (optional)
+        profile (str):
+            path for cProfile statistics of the calculations between start
+            and stop, viewed with pstats (optional)
+
+    Attributes:
+        enabled (bool):
+            True if records are kept
+        stages (list):
+            list of dictionaries with name, wall and cpu time in seconds,
+            peak resident set size and its increase during the stage in MB
+            (None if unavailable) for each stage in order
+        stars (list):
+            list of dictionaries with name and number of stars before and
+            after each filter in order
+        counts (dict):
+            dictionary of evaluation counts, kept by DoSFuncs as 
+            'find_ck_evals' (quadrature nodes of find_ck), 'find_Cmin_evals'
+            (stars by semi-major axis values of find_Cmin), 'DoS_stars' 
+            (stars passed to the depth of search kernel), and 'DoS_bins' 
+            (bins evaluated in the active regions of those stars)
+
+    '''
+
+    def __init__(self, enabled=True, profile=None):
+        self.enabled = enabled
+        self.profile = profile
+        self.stages = []
+        self.stars = []
+        self.counts = {}
+        self._profiler = None
+        self._t0 = None
+
+    def start(self):
+        '''Starts the total wall time and the profiler'''
+
+        if not self.enabled:
+            return
+        self._t0 = time.time()
+        if self.profile is not None:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def stop(self):
+        '''Stops the profiler and writes its statistics to profile'''
+
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile)
+            self._profiler = None
+            print 'Profile saved as '+self.profile
+
+    def stage(self, name):
+        '''Context timing a stage
+
+        Args:
+            name (str):
+                name of the stage
+
+        Returns:
+            context (object):
+                context manager recording the stage on exit
+
+        '''
+
+        if not self.enabled:
+            return _null
+
+        return _Stage(self, name)
+
+    def filtered(self, name, before, after):
+        '''Records the number of stars before and after a filter
+
+        Args:
+            name (str):
+                name of the filter
+            before (int):
+                number of stars before the filter
+            after (int):
+                number of stars after the filter
+
+        '''
+
+        if not self.enabled:
+            return
+        self.record('stars', {'name': name, 'before': int(before), 'after': int(after)})
+
+    def count(self, name, n=1):
+        '''Adds n to an evaluation count
+
+        Args:
+            name (str):
+                name of the count
+            n (int):
+                number to add (optional)
+
+        '''
+
+        if not self.enabled:
+            return
+        self.record('counts', {'name': name, 'n': int(n)})
+
+    def record(self, kind, values):
+        '''Keeps a record
+
+        Args:
+            kind (str):
+                'stages', 'stars', or 'counts'
+            values (dict):
+                values of the record, see the attributes
+
+        '''
+
+        if kind == 'counts':
+            self.counts[values['name']] = self.counts.get(values['name'], 0) + values['n']
+        else:
+            getattr(self, kind).append(values)
+
+    def summary(self):
+        '''Finds a summary of the records which can be saved as json
+
+        Returns:
+            summary (dict):
+                dictionary with keys 'stages', 'stars', 'counts', 'wall'
+                (total wall time in seconds since start), and 'peak_rss'
+                (peak resident set size in MB), empty if disabled
+
+        '''
+
+        if not self.enabled:
+            return {}
+        summary = {'stages': [dict(s) for s in self.stages], \
+                   'stars': [dict(s) for s in self.stars], \
+                   'counts': dict(self.counts), \
+                   'wall': None if self._t0 is None else time.time() - self._t0, \
+                   'peak_rss': peak_rss()}
+
+        return summary
+
+class _Stage(object):
+    '''Context recording one stage of a DoSMonitor'''
+
+    def __init__(self, monitor, name):
+        self.monitor = monitor
+        self.name = name
+
+    def __enter__(self):
+        self.rss = peak_rss()
+        self.wall = time.time()
+        self.cpu = time.clock() if not hasattr(time, 'process_time') else time.process_time()
+        return self
+
+    def __exit__(self, *exc):
+        cpu = time.clock() if not hasattr(time, 'process_time') else time.process_time()
+        rss = peak_rss()
+        self.monitor.record('stages', {'name': self.name, 'wall': time.time() - self.wall, \
+            'cpu': cpu - self.cpu, 'peak_rss': rss, \
+            'rss_increase': None if rss is None else rss - self.rss})
+        return False
+
+class _Null(object):
+    '''Empty context of a disabled DoSMonitor'''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_null = _Null()
+
+def peak_rss():
+    '''Peak resident set size of this process in MB, None if unavailable'''
+
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return rss/2.0**20 if sys.platform == 'darwin' else rss/2.0**10
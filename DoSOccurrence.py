@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16, 2026
+
+Registry of occurrence rate tables used by DoSFuncsMulders.
+
+Tables are stored in a versioned binary format which is memory-mapped when
+loaded: a 12 byte preamble (magic string, format version, header length), a
+JSON header with the name, dtype, shape, and offset of each array and the
+table metadata, and the raw little-endian arrays aligned to 64 bytes.
+
+A table has the arrays 'PeriodEdges' (days) and 'RpEdges' (R_earth), and
+2D arrays of occurrence rates '<type><stat>' (radius by period bins) for
+each stellar type and statistic, e.g. 'MstarsMean'. The metadata 'masses'
+gives the mass of each stellar type in solar masses.
+
+Tables are loaded once per process and kept in a module-level cache, and
+rebinned occurrence rates, from tables or the EXOSIMS planet population,
+can be kept in rebinned by the caller.
+"""
+
+import numpy as np
+import os
+import json
+import struct
+try:
+    import cPickle as pickle
+except:
+    import pickle
+
+MAGIC = b'DOSOCC'
+VERSION = 1
+_preamble = '<6sHI'
+_align = 64
+
+# table paths by name
+directory = os.path.dirname(os.path.abspath(__file__))
+tables = {'Mulders': os.path.join(directory, 'Mulders.occ')}
+
+# tables loaded in this process by name
+_loaded = {}
+# occurrence rates rebinned to depth of search grids, keyed by the caller
+rebinned = {}
+
+def write(path, arrays, meta=None):
+    '''Writes arrays to an occurrence table file
+
+    Args:
+        path (str):
+            path of the table file
+        arrays (dict):
+            dictionary of arrays
+        meta (dict):
+            JSON serializable table metadata (optional)
+
+    '''
+
+    arrays = dict((key, np.ascontiguousarray(val, dtype=np.asarray(val).dtype.newbyteorder('<'))) \
+                  for key, val in arrays.items())
+    # offsets are relative to the end of the header
+    entries = {}
+    offset = 0
+    for key in sorted(arrays):
+        entries[key] = {'dtype': arrays[key].dtype.str, 'shape': list(arrays[key].shape), \
+                        'offset': offset}
+        offset += -(-arrays[key].nbytes//_align)*_align
+    header = json.dumps({'arrays': entries, 'meta': meta or {}}, sort_keys=True).encode('utf-8')
+    # pad the header so the data starts aligned
+    start = -(-(struct.calcsize(_preamble) + len(header))//_align)*_align
+    header += b' '*(start - struct.calcsize(_preamble) - len(header))
+    with open(path, 'wb') as f:
+        f.write(struct.pack(_preamble, MAGIC, VERSION, len(header)))
+        f.write(header)
+        for key in sorted(arrays):
+            f.seek(start + entries[key]['offset'])
+            f.write(arrays[key].tobytes())
+        f.truncate(start + offset)
+
+def read(path):
+    '''Reads an occurrence table file with memory-mapped arrays
+
+    Args:
+        path (str):
+            path of the table file
+
+    Returns:
+        arrays (dict):
+            dictionary of read-only memory-mapped arrays
+        meta (dict):
+            table metadata
+
+    '''
+
+    with open(path, 'rb') as f:
+        pre = f.read(struct.calcsize(_preamble))
+        if len(pre) < struct.calcsize(_preamble) or pre[:len(MAGIC)] != MAGIC:
+            raise ValueError('%r is not an occurrence table file' % (path))
+        magic, version, n = struct.unpack(_preamble, pre)
+        if version != VERSION:
+            raise ValueError('%r has occurrence table format version %r, expected %r' \
+                             % (path, version, VERSION))
+        header = json.loads(f.read(n).decode('utf-8'))
+    start = struct.calcsize(_preamble) + n
+    arrays = {}
+    for key, entry in header['arrays'].items():
+        shape = tuple(entry['shape'])
+        if np.prod(shape) == 0:
+            arrays[str(key)] = np.zeros(shape, dtype=entry['dtype'])
+        else:
+            arrays[str(key)] = np.memmap(path, dtype=entry['dtype'], mode='r', \
+                                         offset=start + entry['offset'], shape=shape)
+
+    return arrays, header['meta']
+
+def convert(src, dst, masses=None, source=None):
+    '''Converts a pickled dictionary occurrence table, such as Mulders.ocr,
+    to an occurrence table file
+
+    Args:
+        src (str):
+            path of the pickled dictionary of arrays
+        dst (str):
+            path of the table file
+        masses (dict):
+            mass of each stellar type in solar masses (optional)
+        source (str):
+            description of the source of the table (optional)
+
+    '''
+
+    with open(src, 'rb') as f:
+        rates = pickle.load(f)
+    meta = {'masses': masses or {}, 'source': source}
+    write(dst, rates, meta)
+
+def register(name, path):
+    '''Registers an occurrence table file under a name
+
+    Args:
+        name (str):
+            name of the table
+        path (str):
+            path of the table file
+
+    '''
+
+    tables[name] = os.path.abspath(path)
+    _loaded.pop(name, None)
+
+def load(name):
+    '''Loads a registered occurrence table, once per process
+
+    Args:
+        name (str):
+            name of the table
+
+    Returns:
+        arrays (dict):
+            dictionary of read-only memory-mapped arrays
+        meta (dict):
+            table metadata
+
+    '''
+
+    if name not in _loaded:
+        if name not in tables:
+            raise ValueError('unknown occurrence table %r, registered tables are %r' \
+                             % (name, sorted(tables)))
+        _loaded[name] = read(tables[name])
+
+    return _loaded[name]
+
+def clear():
+    '''Empties the caches of loaded tables and rebinned occurrence rates'''
+
+    _loaded.clear()
+    rebinned.clear()
@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16, 2026
+
+Headless rendering of depth of search and expected planet grids as filled
+contour plots with contour lines.
+
+Figures are drawn with the Agg canvas directly, without pyplot, so
+rendering needs no display and does not touch the pyplot figure manager.
+Each process keeps one figure for each panel layout and reuses it for
+every plot, clearing the axes instead of building a new figure. DoSPlot
+queues plots and renders them in a process pool while the caller goes on
+computing, and pages of several panels and multi-page PDF files are
+supported.
+"""
+
+import numpy as np
+import os
+
+# figures reused by this process, keyed by layout
+_figures = {}
+
+def extend_grid(aedges, Redges, Z):
+    '''Extends a grid of bin values to the bin edges for contour plots
+
+    Values are placed at the bin centers and linearly extrapolated to the
+    first and last bin edges along each axis, and values which are not
+    positive are masked.
+
+    Args:
+        aedges (ndarray):
+            1D array of semi-major axis bin edges
+        Redges (ndarray):
+            1D array of planetary radius bin edges
+        Z (ndarray):
+            2D array of values in each bin (planetary radius bins by
+            semi-major axis bins)
+
+    Returns:
+        a (ndarray):
+            1D array of semi-major axis values of the extended grid
+        R (ndarray):
+            1D array of planetary radius values of the extended grid
+        Z (ndarray):
+            2D masked array of values on the extended grid
+
+    '''
+
+    aedges = np.asarray(aedges, dtype=float)
+    Redges = np.asarray(Redges, dtype=float)
+    a = np.around(np.hstack((aedges[0], 0.5*(aedges[1:] + aedges[:-1]), aedges[-1])), 4)
+    R = np.around(np.hstack((Redges[0], 0.5*(Redges[1:] + Redges[:-1]), Redges[-1])), 4)
+    Z = np.asarray(Z, dtype=float)
+    # extrapolate to left-most and right-most boundaries
+    left = Z[:,0] + (a[0] - a[1])*(Z[:,1] - Z[:,0])/(a[2] - a[1])
+    right = Z[:,-1] + (a[-1] - a[-2])*(Z[:,-1] - Z[:,-2])/(a[-2] - a[-3])
+    Z = np.column_stack((left, Z, right))
+    # extrapolate to bottom-most and upper-most boundaries
+    bottom = Z[0,:] + (R[0] - R[1])*(Z[1,:] - Z[0,:])/(R[2] - R[1])
+    top = Z[-1,:] + (R[-1] - R[-2])*(Z[-1,:] - Z[-2,:])/(R[-2] - R[-3])
+    Z = np.vstack((bottom, Z, top))
+
+    return a, R, np.ma.masked_where(Z <= 0.0, Z)
+
+def draw(ax, cax, aedges, Redges, Z, title, levels=None, ylabel='R ($R_\oplus$)'):
+    '''Draws a grid as a filled contour plot with contour lines on existing
+    axes, which are cleared first
+
+    Args:
+        ax (Axes):
+            matplotlib axes of the plot
+        cax (Axes):
+            matplotlib axes of the colorbar
+        aedges (ndarray):
+            1D array of semi-major axis bin edges in AU
+        Redges (ndarray):
+            1D array of planetary radius bin edges
+        Z (ndarray):
+            2D array of values in each bin
+        title (str):
+            title of the plot
+        levels (list):
+            contour levels, logarithmically spaced levels are chosen if None
+            (optional)
+        ylabel (str):
+            label of the planetary radius axis (optional)
+
+    '''
+
+    import matplotlib.ticker as ticker
+
+    a, R, Z = extend_grid(aedges, Redges, Z)
+    ax.cla()
+    cax.cla()
+    if levels is None:
+        cs = ax.contourf(a, R, Z, locator=ticker.LogLocator())
+        cs2 = ax.contour(a, R, Z, levels=cs.levels[1:], colors='k')
+    else:
+        cs = ax.contourf(a, R, Z, locator=ticker.LogLocator(), levels=levels)
+        cs2 = ax.contour(a, R, Z, levels=cs.levels, colors='k')
+    ax.set_xscale('log')
+    ax.set_yscale('log')
+    ax.set_xlabel('a (AU)')
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    ax.figure.colorbar(cs, cax=cax)
+    ax.clabel(cs2, fmt=ticker.LogFormatterMathtext(), colors='k')
+
+def figure(rows=1, cols=1):
+    '''Returns the figure of this process for a panel layout, creating it
+    on first use
+
+    Args:
+        rows (int):
+            number of rows of panels (optional)
+        cols (int):
+            number of columns of panels (optional)
+
+    Returns:
+        fig (Figure):
+            matplotlib figure with an Agg canvas
+        axes (list):
+            list of (plot axes, colorbar axes) of each panel in row order
+
+    '''
+
+    if (rows, cols) not in _figures:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        import matplotlib.colorbar as colorbar
+        fig = Figure(figsize=(6.4*cols, 4.8*rows))
+        FigureCanvasAgg(fig)
+        fig.subplots_adjust(hspace=0.3)
+        axes = []
+        for i in xrange(rows*cols):
+            ax = fig.add_subplot(rows, cols, i+1)
+            cax, kw = colorbar.make_axes(ax)
+            axes.append((ax, cax))
+        _figures[(rows, cols)] = (fig, axes)
+
+    return _figures[(rows, cols)]
+
+def render(aedges, Redges, grids, titles, path, rows=1, cols=1, levels=None, ylabel='R ($R_\oplus$)', dpi=100):
+    '''Renders grids to a file in this process, rows*cols panels per page
+
+    Files ending in '.pdf' may hold several pages, other formats hold one.
+
+    Args:
+        aedges (ndarray):
+            1D array of semi-major axis bin edges in AU
+        Redges (ndarray):
+            1D array of planetary radius bin edges
+        grids (list):
+            list of 2D arrays of values in each bin
+        titles (list):
+            list of titles of the grids
+        path (str):
+            path of the file, the format is given by the extension
+        rows (int):
+            number of rows of panels on a page (optional)
+        cols (int):
+            number of columns of panels on a page (optional)
+        levels (list):
+            contour levels, logarithmically spaced levels are chosen if None
+            (optional)
+        ylabel (str):
+            label of the planetary radius axis (optional)
+        dpi (int):
+            resolution in dots per inch (optional)
+
+    '''
+
+    fig, axes = figure(rows, cols)
+    n = len(axes)
+    npages = max(int(np.ceil(len(grids)/float(n))), 1)
+    multi = os.path.splitext(path)[1].lower() == '.pdf'
+    if npages > 1 and not multi:
+        raise ValueError('%r holds one page, %r grids need %r pages' % (path, len(grids), npages))
+    if multi:
+        from matplotlib.backends.backend_pdf import PdfPages
+        out = PdfPages(path)
+    try:
+        for page in xrange(npages):
+            for i, (ax, cax) in enumerate(axes):
+                k = page*n + i
+                ax.set_visible(k < len(grids))
+                cax.set_visible(k < len(grids))
+                if k < len(grids):
+                    draw(ax, cax, aedges, Redges, grids[k], titles[k], levels, ylabel)
+            if multi:
+                out.savefig(fig, dpi=dpi, bbox_inches='tight', pad_inches=0.1)
+            else:
+                fig.savefig(path, dpi=dpi, bbox_inches='tight', pad_inches=0.1)
+    finally:
+        if multi:
+            out.close()
+
+class DoSPlot(object):
+    '''Renders depth of search grids in a process pool, decoupled from the
+    calculations which produce them
+
+    Plots are queued by plot and page and rendered in the background by
+    n_jobs processes, each reusing its figures. Single plots are sent to
+    the pool in batches, and each page or multi-page file is rendered by
+    one process. close waits for all plots and raises any rendering error.
+    With n_jobs=1 plots are rendered when they are sent.
+
+    Args:
+        aedges (ndarray):
+            1D array of semi-major axis bin edges in AU
+        Redges (ndarray):
+            1D array of planetary radius bin edges
+        n_jobs (int):
+            number of rendering processes, -1 uses all cores (optional)
+        levels (list):
+            contour levels, logarithmically spaced levels are chosen for each
+            plot if None (optional)
+        ylabel (str):
+            label of the planetary radius axis (optional)
+        dpi (int):
+            resolution in dots per inch (optional)
+        batch (int):
+            number of single plots sent to a process at once (optional)
+
+    '''
+
+    def __init__(self, aedges, Redges, n_jobs=1, levels=None, ylabel='R ($R_\oplus$)', dpi=100, batch=8):
+        self.aedges = np.array(aedges, dtype=float)
+        self.Redges = np.array(Redges, dtype=float)
+        self.options = {'levels': levels, 'ylabel': ylabel, 'dpi': dpi}
+        self.batch = max(int(batch), 1)
+        if n_jobs < 1:
+            import multiprocessing
+            n_jobs = multiprocessing.cpu_count()
+        if n_jobs > 1:
+            import multiprocessing
+            self.pool = multiprocessing.Pool(n_jobs)
+        else:
+            self.pool = None
+        self._pending = []
+        self._results = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+        elif self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+
+    def plot(self, Z, title, path):
+        '''Queues a single plot
+
+        Args:
+            Z (ndarray):
+                2D array of values in each bin
+            title (str):
+                title of the plot
+            path (str):
+                path of the file, the format is given by the extension
+
+        '''
+
+        self._pending.append(([np.array(Z)], [title], path, 1, 1))
+        if len(self._pending) >= self.batch:
+            self.flush()
+
+    def page(self, grids, titles, path, rows, cols):
+        '''Queues a page, or a multi-page PDF file, of panels
+
+        Args:
+            grids (list):
+                list of 2D arrays of values in each bin
+            titles (list):
+                list of titles of the panels
+            path (str):
+                path of the file, '.pdf' files hold as many pages of
+                rows*cols panels as needed
+            rows (int):
+                number of rows of panels on a page
+            cols (int):
+                number of columns of panels on a page
+
+        '''
+
+        self._pending.append(([np.array(Z) for Z in grids], list(titles), path, rows, cols))
+        self.flush()
+
+    def flush(self):
+        '''Sends the queued plots to be rendered'''
+
+        if len(self._pending) == 0:
+            return
+        args = (self.aedges, self.Redges, self.options, self._pending)
+        self._pending = []
+        if self.pool is None:
+            _render_batch(args)
+        else:
+            self._results.append(self.pool.apply_async(_render_batch, (args,)))
+
+    def close(self):
+        '''Renders the queued plots and waits for all plots to finish'''
+
+        self.flush()
+        try:
+            for res in self._results:
+                res.get()
+        finally:
+            self._results = []
+            if self.pool is not None:
+                self.pool.close()
+                self.pool.join()
+                self.pool = None
+
+def _render_batch(args):
+    '''Renders a batch of plots, used by DoSPlot, also as a process pool
+    worker
+
+    Args:
+        args (tuple):
+            1D arrays of semi-major axis and planetary radius bin edges,
+            dictionary of levels, ylabel, and dpi, and list of (grids,
+            titles, path, rows, cols) of each file
+
+    '''
+
+    aedges, Redges, options, jobs = args
+    for grids, titles, path, rows, cols in jobs:
+        render(aedges, Redges, grids, titles, path, rows, cols, **options)
@@ -0,0 +1,499 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16, 2026
+
+Solvers for the selection of observed stars, a 0/1 knapsack problem which
+maximizes the sum of ck subject to the sum of integration times not
+exceeding maxTime. Every solver has the signature
+
+    sInds, info = solver(t0, ck, maxTime, timeLimit=None)
+
+where sInds is the 1D array of selected star indices and info is a
+dictionary with keys:
+    objective (float):
+        sum of ck of the selected stars
+    bound (float):
+        upper bound on the optimal objective
+    gap (float):
+        relative optimality gap (bound - objective)/bound
+    optimal (bool):
+        True if the solver proved the selection optimal (within its gap
+        tolerance)
+
+The solvers are collected in the solvers dictionary keyed by name.
+"""
+
+import numpy as np
+import time
+
+def lp_bound(t0, ck, maxTime):
+    '''Finds the linear programming (Dantzig) upper bound of the knapsack
+
+    Args:
+        t0 (ndarray):
+            1D array of integration times in days
+        ck (ndarray):
+            1D array of ck metric
+        maxTime (float):
+            total observation time allotted in days
+
+    Returns:
+        bound (float):
+            upper bound on the optimal objective
+
+    '''
+
+    t, v, order = _sorted(t0, ck, maxTime)
+    bound, k = _lp(t, v, maxTime)
+
+    return bound
+
+def greedy(t0, ck, maxTime, timeLimit=None):
+    '''Selects stars in order of decreasing ck per unit integration time
+
+    Stars which do not fit in the remaining time are skipped. The best
+    single star is used instead if it has a larger ck, so the objective is
+    at least half the optimum. The cost is dominated by one sort.
+
+    Args:
+        t0 (ndarray):
+            1D array of integration times in days
+        ck (ndarray):
+            1D array of ck metric
+        maxTime (float):
+            total observation time allotted in days
+        timeLimit (float):
+            not used, included for a common signature (optional)
+
+    Returns:
+        sInds (ndarray):
+            1D array of star indices selected for observation
+        info (dict):
+            objective, bound, gap, and optimal flag of the selection
+
+    '''
+
+    t, v, order = _sorted(t0, ck, maxTime)
+    take = _fill(t, np.zeros(len(t), dtype=bool), maxTime)
+    sInds = order[take]
+    if len(t) > 0 and v.max() > v[take].sum():
+        sInds = order[[np.argmax(v)]]
+    info = _info(sInds, t0, ck, maxTime)
+
+    return np.sort(sInds), info
+
+def dp(t0, ck, maxTime, timeLimit=None, tbins=10000):
+    '''Selects stars by dynamic programming over integration times scaled to
+    integers
+
+    Stars are first fixed in or out of the selection by the reduction of
+    _reduce. Integration times of the remaining core stars are measured in
+    units of the remaining time/tbins and rounded up, so the selection
+    always fits in maxTime, and the time lost to rounding is filled in order
+    of decreasing ck per unit integration time. The bound is the dynamic
+    programming optimum with integration times rounded down. Memory and
+    time scale as the number of core stars times tbins.
+
+    Args:
+        t0 (ndarray):
+            1D array of integration times in days
+        ck (ndarray):
+            1D array of ck metric
+        maxTime (float):
+            total observation time allotted in days
+        timeLimit (float):
+            not used, included for a common signature (optional)
+        tbins (int):
+            number of integer time units in the remaining time (optional)
+
+    Returns:
+        sInds (ndarray):
+            1D array of star indices selected for observation
+        info (dict):
+            objective, bound, gap, and optimal flag of the selection
+
+    '''
+
+    t, v, order, fixed, C, sInds = _reduce(t0, ck, maxTime)
+    bound = np.sum(np.asarray(ck, dtype=float)[fixed])
+    if len(t) > 0 and C > 0.0:
+        w, keep, best = _dp_table(np.ceil(t/C*tbins).astype(int), v, tbins)
+        take = np.zeros(len(t), dtype=bool)
+        take[_dp_select(w, keep, tbins)] = True
+        take = _fill(t, take, C)
+        sInds = _better(sInds, np.append(fixed, order[take]), ck)
+        w, keep, best = _dp_table(np.floor(t/C*tbins).astype(int), v, tbins, keep=False)
+        bound += best[tbins]
+    info = _info(sInds, t0, ck, maxTime, bound)
+
+    return sInds, info
+
+def branch_bound(t0, ck, maxTime, timeLimit=None, gapTol=0.0, sInds=None):
+    '''Selects stars by breadth-first branch and bound with dominance
+
+    Stars are first fixed in or out of the selection by the reduction of
+    _reduce, with the better of the dp selection and the given selection as
+    the incumbent. The remaining core 
+    stars are decided one at a time in order of decreasing ck per unit 
+    integration time. Each partial selection (state) is extended by 
+    excluding or including the next star, states which take more time for 
+    no more ck than another state are dropped, and states are bounded by 
+    the linear programming relaxation of the stars not yet decided. As in 
+    mixed integer programming solvers, states whose bound is within the 
+    relative gap tolerance of the incumbent are pruned, so the selection is
+    exact with the default tolerance of zero. If the time limit is reached,
+    the best selection found is returned with its gap.
+
+    Args:
+        t0 (ndarray):
+            1D array of integration times in days
+        ck (ndarray):
+            1D array of ck metric
+        maxTime (float):
+            total observation time allotted in days
+        timeLimit (float):
+            maximum solver time in seconds (optional)
+        gapTol (float):
+            relative optimality gap tolerance (optional)
+        sInds (ndarray):
+            1D array of star indices of a selection which fits in maxTime, 
+            used as the incumbent instead of the dp selection if better 
+            after filling the remaining time (optional)
+
+    Returns:
+        sInds (ndarray):
+            1D array of star indices selected for observation
+        info (dict):
+            objective, bound, gap, and optimal flag of the selection
+
+    '''
+
+    start = time.time()
+    # a better incumbent fixes more stars
+    if sInds is None:
+        sInds, info = dp(t0, ck, maxTime)
+    else:
+        sInds = _better(greedy(t0, ck, maxTime)[0], _warm(t0, ck, maxTime, sInds), ck)
+    t, v, order, fixed, C, sInds = _reduce(t0, ck, maxTime, sInds)
+    v0 = np.sum(np.asarray(ck, dtype=float)[fixed])
+    n = len(t)
+    W = np.append(0.0, np.cumsum(t))
+    V = np.append(0.0, np.cumsum(v))
+    # objective of the core stars in the incumbent
+    best = np.sum(np.asarray(ck, dtype=float)[sInds]) - v0
+    bound = best
+    found = None
+    complete = True
+    # time used and objective of each state, with the parent state and
+    # whether the star was taken for each step
+    T = np.zeros(1)
+    Obj = np.zeros(1)
+    parents = []
+    taken = []
+    for i in range(n):
+        if timeLimit is not None and time.time() - start > timeLimit:
+            complete = False
+            break
+        m = len(T)
+        T = np.append(T, T + t[i])
+        Obj = np.append(Obj, Obj + v[i])
+        parent = np.tile(np.arange(m), 2)
+        take = np.arange(2*m) >= m
+        # drop states over the time limit and dominated states
+        keep = np.where(T <= C)[0]
+        keep = keep[np.lexsort((-Obj[keep], T[keep]))]
+        prev = np.maximum.accumulate(Obj[keep])
+        keep = keep[np.append(True, Obj[keep][1:] > prev[:-1])]
+        T, Obj, parent, take = T[keep], Obj[keep], parent[keep], take[keep]
+        parents.append(parent)
+        taken.append(take)
+        j = np.argmax(Obj)
+        if Obj[j] > best:
+            best = Obj[j]
+            found = (i, j)
+        # linear programming bound of stars i+1..n-1
+        ub = Obj + _lp_remaining(W, V, t, v, i+1, C - T)
+        prune = ub - best <= gapTol*(v0 + best)
+        if np.any(prune):
+            bound = max(bound, ub[prune].max())
+        T, Obj = T[~prune], Obj[~prune]
+        parents[-1], taken[-1] = parent[~prune], take[~prune]
+        if found is not None and found[0] == i:
+            # index of the incumbent among the states kept
+            found = (i, j, parent[j], take[j])
+        if len(T) == 0:
+            break
+    if not complete:
+        # undecided states bound the optimum
+        bound = max(bound, np.max(Obj + _lp_remaining(W, V, t, v, i, C - T)))
+    if found is not None:
+        i, j, parent, take = found
+        sel = [i] if take else []
+        for k in range(i-1, -1, -1):
+            if taken[k][parent]:
+                sel.append(k)
+            parent = parents[k][parent]
+        sInds = np.sort(np.append(fixed, order[sel]))
+    info = _info(sInds, t0, ck, maxTime, v0 + bound)
+    info['optimal'] = complete
+
+    return sInds, info
+
+def cbc(t0, ck, maxTime, timeLimit=None):
+    '''Selects stars with the ortools CBC mixed integer programming solver
+
+    Args:
+        t0 (ndarray):
+            1D array of integration times in days
+        ck (ndarray):
+            1D array of ck metric
+        maxTime (float):
+            total observation time allotted in days
+        timeLimit (float):
+            maximum solver time in seconds (optional)
+
+    Returns:
+        sInds (ndarray):
+            1D array of star indices selected for observation
+        info (dict):
+            objective, bound, gap, and optimal flag of the selection
+
+    '''
+
+    from ortools.linear_solver import pywraplp
+
+    #set up solver
+    solver = pywraplp.Solver('SolveIntegerProblem',pywraplp.Solver.CBC_MIXED_INTEGER_PROGRAMMING)
+    if timeLimit is not None:
+        solver.SetTimeLimit(int(1000*timeLimit))
+    #need one var per state
+    xs = [ solver.IntVar(0.0,1.0, 'x'+str(j)) for j in range(len(ck)) ]
+    #constraint is x_i*t_i < maxtime
+    constraint1 = solver.Constraint(-solver.infinity(),maxTime)
+    for j,x in enumerate(xs):
+        constraint1.SetCoefficient(x, t0[j])
+    #objective is max x_i*comp_i
+    objective = solver.Objective()
+    for j,x in enumerate(xs):
+        objective.SetCoefficient(x, ck[j])
+    objective.SetMaximization()
+    res = solver.Solve()
+    #collect result
+    xs2 = np.array([x.solution_value() for x in xs])
+
+    # observed star indices for depth of search calculations
+    sInds = np.where(xs2>0.5)[0]
+    info = _info(sInds, t0, ck, maxTime, solver.Objective().BestBound())
+    info['optimal'] = res == pywraplp.Solver.OPTIMAL
+
+    return sInds, info
+
+solvers = {'cbc': cbc, 'dp': dp, 'bb': branch_bound, 'greedy': greedy}
+
+def frontier(t0, ck, maxTime, timeLimit=None):
+    '''Selects stars for a sequence of total observation times in one pass
+
+    Budgets are solved in increasing order with branch_bound. The 
+    selection for each budget, filled with stars in order of decreasing ck
+    per unit integration time, is the incumbent for the next, which usually
+    fixes most stars and leaves a small core, so the whole ck versus time 
+    frontier costs little more than a single selection.
+
+    Args:
+        t0 (ndarray):
+            1D array of integration times in days
+        ck (ndarray):
+            1D array of ck metric
+        maxTime (ndarray):
+            1D array of total observation times in days
+        timeLimit (float):
+            maximum solver time in seconds for each budget (optional)
+
+    Returns:
+        sInds (list):
+            list of 1D arrays of star indices selected for each budget
+        info (list):
+            list of dictionaries of objective, bound, gap, and optimal flag
+            of the selection for each budget
+
+    '''
+
+    maxTime = np.array(maxTime, ndmin=1, dtype=float)
+    sInds = [None]*len(maxTime)
+    info = [None]*len(maxTime)
+    prev = None
+    for i in np.argsort(maxTime, kind='mergesort'):
+        sInds[i], info[i] = branch_bound(t0, ck, maxTime[i], timeLimit=timeLimit, sInds=prev)
+        prev = sInds[i]
+
+    return sInds, info
+
+def _sorted(t0, ck, maxTime):
+    '''Returns integration times, ck, and indices of the stars which fit in
+    maxTime sorted by decreasing ck per unit integration time'''
+
+    t0 = np.asarray(t0, dtype=float)
+    ck = np.asarray(ck, dtype=float)
+    fit = np.where((t0 <= maxTime) & (ck > 0.0))[0]
+    order = fit[np.argsort(-ck[fit]/t0[fit], kind='mergesort')]
+
+    return t0[order], ck[order], order
+
+def _lp(t, v, maxTime):
+    '''Returns the linear programming bound and the index of the critical
+    star for stars sorted by decreasing ck per unit integration time'''
+
+    W = np.cumsum(t)
+    k = np.searchsorted(W, maxTime, side='right')
+    bound = v[:k].sum()
+    if k < len(t):
+        bound += (maxTime - (W[k-1] if k > 0 else 0.0))*v[k]/t[k]
+
+    return bound, k
+
+def _lp_remaining(W, V, t, v, j, r):
+    '''Returns the linear programming bound of stars j..n-1 for each
+    remaining time r, W and V are the cumulative sums of t and v with a
+    leading zero'''
+
+    n = len(t)
+    k = np.searchsorted(W, W[j] + r, side='right') - 1
+    ub = V[k] - V[j]
+    part = k < n
+    kp = k[part]
+    ub[part] += (r[part] - (W[kp] - W[j]))*v[kp]/t[kp]
+
+    return ub
+
+def _fill(t, take, maxTime):
+    '''Adds stars in order to a selection while they fit in maxTime'''
+
+    used = t[take].sum()
+    for j, tj in enumerate(t.tolist()):
+        if not take[j] and used + tj <= maxTime:
+            take[j] = True
+            used += tj
+
+    return take
+
+def _reduce(t0, ck, maxTime, sInds=None):
+    '''Fixes stars in or out of the selection with the Dembo-Hammer
+    reduction test
+
+    Forcing a star away from its value in the linear programming solution
+    lowers the bound by at least |ck - r t0|, where r is the ck per unit
+    integration time of the critical star. Stars for which the lowered
+    bound does not exceed the objective of the incumbent selection sInds
+    (the greedy selection if None) are fixed.
+
+    Returns:
+        t (ndarray):
+            1D array of integration times of the core stars sorted by
+            decreasing ck per unit integration time
+        v (ndarray):
+            1D array of ck of the core stars
+        order (ndarray):
+            1D array of indices of the core stars
+        fixed (ndarray):
+            1D array of indices of the stars fixed in the selection
+        C (float):
+            time remaining for the core stars
+        sInds (ndarray):
+            1D array of indices of the incumbent selection
+
+    '''
+
+    if sInds is None:
+        sInds, info = greedy(t0, ck, maxTime)
+    objective = np.sum(np.asarray(ck, dtype=float)[sInds])
+    t, v, order = _sorted(t0, ck, maxTime)
+    bound, k = _lp(t, v, maxTime)
+    if k == len(t):
+        # all stars fit
+        return t[:0], v[:0], order[:0], np.sort(order), maxTime - t.sum(), np.sort(order)
+    U = bound - np.abs(v - v[k]/t[k]*t)
+    fix = U <= objective
+    fix[k] = False
+    ones = fix & (np.arange(len(t)) < k)
+    core = ~fix
+    C = maxTime - t[ones].sum()
+
+    return t[core], v[core], order[core], np.sort(order[ones]), C, sInds
+
+def _warm(t0, ck, maxTime, sInds):
+    '''Fills the remaining time of a selection with stars in order of
+    decreasing ck per unit integration time'''
+
+    t, v, order = _sorted(t0, ck, maxTime)
+    take = np.in1d(order, sInds)
+    take = _fill(t, take, maxTime)
+
+    return np.sort(order[take])
+
+def _better(sInds1, sInds2, ck):
+    '''Returns the selection with the larger objective'''
+
+    ck = np.asarray(ck, dtype=float)
+    if np.sum(ck[sInds2]) > np.sum(ck[sInds1]):
+        return np.sort(sInds2)
+
+    return sInds1
+
+def _dp_table(w, v, tbins, keep=True):
+    '''Fills the dynamic programming table of the knapsack on integer times
+
+    Returns:
+        w (ndarray):
+            1D array of integer integration times
+        keep (ndarray):
+            2D boolean array, keep[i,c] is True if star i is taken in the
+            best selection of stars 0..i with at most c time units, None if
+            keep is False
+        best (ndarray):
+            1D array of the best objective with at most c time units
+
+    '''
+
+    table = np.zeros((len(w), tbins+1), dtype=bool) if keep else None
+    best = np.zeros(tbins+1)
+    for i in range(len(w)):
+        if w[i] > tbins:
+            continue
+        cand = best[:tbins+1-w[i]] + v[i]
+        better = cand > best[w[i]:]
+        if keep:
+            table[i,w[i]:] = better
+        best[w[i]:] = np.where(better, cand, best[w[i]:])
+
+    return w, table, best
+
+def _dp_select(w, keep, c):
+    '''Recovers the stars selected with at most c time units from the
+    dynamic programming table'''
+
+    take = []
+    for i in range(len(w)-1, -1, -1):
+        if keep[i,c]:
+            take.append(i)
+            c -= w[i]
+
+    return np.array(take[::-1], dtype=int)
+
+def _gap(objective, bound):
+    '''Relative optimality gap'''
+
+    if bound <= 0.0:
+        return 0.0
+
+    return max(bound - objective, 0.0)/bound
+
+def _info(sInds, t0, ck, maxTime, bound=np.inf):
+    '''Objective and bound of a selection, the bound is the smaller of the
+    given bound and the linear programming bound'''
+
+    objective = float(np.sum(np.asarray(ck, dtype=float)[sInds]))
+    bound = max(min(lp_bound(t0, ck, maxTime), bound), objective)
+    gap = _gap(objective, bound)
+    info = {'objective': objective, 'bound': float(bound), 'gap': float(gap), 'optimal': gap == 0.0}
+
+    return info
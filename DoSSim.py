@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16, 2026
+"""
+
+import numpy as np
+import json
+import hashlib
+# astropy is imported in methods
+
+class ArraySim(object):
+    '''Stand-in for EXOSIMS.MissionSim built from arrays, used by
+    DoSFuncs.from_arrays
+
+    Only the parts of MissionSim used by DoSFuncs are provided: a TargetList
+    holding the given star columns, an OpticalSystem with one detection mode
+    whose integration times are the given values and whose instrument
+    contrast depends only on working angle, a PlanetPopulation with
+    log-uniform semi-major axis and planetary radius and constant albedo,
+    and ZodiacalLight and Completeness values which are not used by the
+    stand-in OpticalSystem.
+
+    Args:
+        dist (ndarray):
+            1D array of stellar distances in pc
+        t_int (ndarray):
+            1D array of integration times in days
+        contrast (callable):
+            instrument contrast as a function of a 1D array of working
+            angles in arcsec
+        IWA (float):
+            inner working angle in arcsec
+        OWA (float):
+            outer working angle in arcsec
+        Spec (ndarray):
+            1D array of spectral types, needed by DoSFuncsMulders (optional)
+        Name (ndarray):
+            1D array of star names (optional)
+        arange (tuple):
+            minimum and maximum semi-major axis in AU (optional)
+        Rprange (tuple):
+            minimum and maximum planetary radius in R_earth (optional)
+        p (float):
+            geometric albedo of all planets (optional)
+        eta (float):
+            number of planets per star (optional)
+        attrs (dict):
+            other 1D arrays of star attributes for group_by and
+            star_columns, e.g. 'Vmag' or 'L' (optional)
+
+    Attributes:
+        TargetList (ArrayTargetList):
+            stand-in for EXOSIMS TargetList
+        OpticalSystem (ArrayOpticalSystem):
+            stand-in for EXOSIMS OpticalSystem
+        PlanetPopulation (ArrayPlanetPopulation):
+            stand-in for EXOSIMS PlanetPopulation
+        ZodiacalLight (object):
+            stand-in for EXOSIMS ZodiacalLight with zero fZ0 and fEZ0
+        Completeness (object):
+            stand-in for EXOSIMS Completeness with dMagLim
+
+    '''
+
+    def __init__(self, dist, t_int, contrast, IWA, OWA, Spec=None, Name=None, arange=(0.1, 100.0), Rprange=(1.0, 30.0), p=0.367, eta=0.1, attrs=None):
+        import astropy.units as u
+
+        dist = np.array(dist, ndmin=1, dtype=float)
+        t_int = np.array(t_int, ndmin=1, dtype=float)
+        nStars = len(dist)
+        if t_int.shape != (nStars,):
+            raise ValueError('t_int must have one value for each star')
+        if Spec is None:
+            Spec = ['']*nStars
+        if Name is None:
+            Name = ['%d' % (i) for i in xrange(nStars)]
+        columns = {'dist': dist*u.pc, 't_int': t_int*u.day, \
+                   'Spec': np.array(Spec), 'Name': np.array(Name)}
+        for key in (attrs or {}):
+            columns[key] = attrs[key]
+        for key in columns:
+            if len(columns[key]) != nStars:
+                raise ValueError('%s must have one value for each star' % (key))
+        self.TargetList = ArrayTargetList(columns)
+        self.OpticalSystem = ArrayOpticalSystem(contrast, IWA, OWA)
+        self.PlanetPopulation = ArrayPlanetPopulation(arange, Rprange, p, eta)
+        self.ZodiacalLight = type('ZodiacalLight', (object,), \
+            {'fZ0': 0.0/u.arcsec**2, 'fEZ0': 0.0/u.arcsec**2})()
+        self.Completeness = type('Completeness', (object,), {'dMagLim': 22.5})()
+        # inputs are hashed so that cache keys change with the arrays
+        h = hashlib.sha1()
+        for key in sorted(columns):
+            x = np.asarray(getattr(columns[key], 'value', columns[key]))
+            h.update(key.encode('utf-8'))
+            h.update(x.tobytes() if x.dtype.kind not in 'OU' else json.dumps(map(str, x)).encode('utf-8'))
+        WA = np.linspace(IWA, OWA, 50)
+        self._outspec = {'modules': {'MissionSim': type(self).__name__}, \
+                         'stars': h.hexdigest(), 'nStars': nStars, \
+                         'IWA': float(IWA), 'OWA': float(OWA), \
+                         'core_contrast': [float(c) for c in self.OpticalSystem.contrast(WA)], \
+                         'arange': [float(a) for a in arange], \
+                         'Rprange': [float(R) for R in Rprange], \
+                         'prange': [float(p), float(p)], 'eta': float(eta)}
+
+    def genOutSpec(self, tofile=None):
+        '''Finds the output specification of the inputs
+
+        Stars are given by a hash of their columns and the contrast curve by
+        its values at the 50 working angles used by DoSFuncs.
+
+        Args:
+            tofile (str):
+                path of a json file to write the specification to (optional)
+
+        Returns:
+            outspec (dict):
+                output specification
+
+        '''
+
+        outspec = dict(self._outspec)
+        if tofile is not None:
+            with open(tofile, 'w') as f:
+                json.dump(outspec, f, sort_keys=True, indent=4)
+
+        return outspec
+
+class ArrayTargetList(object):
+    '''Stand-in for EXOSIMS TargetList holding star columns
+
+    Args:
+        columns (dict):
+            1D arrays (or astropy Quantities) of star attributes
+
+    Attributes:
+        catalog_atts (list):
+            names of the star attributes
+        nStars (int):
+            number of stars
+
+    '''
+
+    def __init__(self, columns):
+        self.catalog_atts = sorted(columns)
+        for key in self.catalog_atts:
+            setattr(self, key, columns[key])
+        self.nStars = len(columns['dist'])
+
+    def revise_lists(self, sInds):
+        '''Keeps only the stars sInds in every star attribute
+
+        Args:
+            sInds (ndarray):
+                1D array of star indices to keep
+
+        '''
+
+        sInds = np.array(sInds, ndmin=1, dtype=int)
+        for key in self.catalog_atts:
+            setattr(self, key, getattr(self, key)[sInds])
+        self.nStars = len(sInds)
+
+class ArrayOpticalSystem(object):
+    '''Stand-in for EXOSIMS OpticalSystem with integration times taken from
+    the TargetList and contrast depending only on working angle
+
+    Args:
+        contrast (callable):
+            instrument contrast as a function of a 1D array of working
+            angles in arcsec
+        IWA (float):
+            inner working angle in arcsec
+        OWA (float):
+            outer working angle in arcsec
+
+    Attributes:
+        observingModes (list):
+            list containing the single detection mode
+
+    '''
+
+    def __init__(self, contrast, IWA, OWA):
+        import astropy.units as u
+
+        self.contrast = contrast
+        syst = {'name': 'array', 'core_contrast': self.core_contrast}
+        self.observingModes = [{'detectionMode': True, 'IWA': IWA*u.arcsec, \
+                                'OWA': OWA*u.arcsec, 'lam': 500.0*u.nm, 'syst': syst}]
+
+    def core_contrast(self, lam, WA):
+        '''Instrument contrast at working angles WA (Quantity)'''
+
+        return np.asarray(self.contrast(WA.to('arcsec').value), dtype=float)
+
+    def calc_intTime(self, TL, sInds, fZ, fEZ, dMag, WA, mode):
+        '''Integration times of the stars sInds, independent of dMag'''
+
+        return TL.t_int[np.array(sInds, ndmin=1, dtype=int)]
+
+    def calc_dMag_per_intTime(self, intTimes, TL, sInds, fZ, fEZ, WA, mode):
+        '''Limiting dMag from the contrast at working angles WA, independent
+        of integration time'''
+
+        return -2.5*np.log10(self.core_contrast(mode['lam'], WA))
+
+class ArrayPlanetPopulation(object):
+    '''Stand-in for EXOSIMS PlanetPopulation with log-uniform semi-major
+    axis and planetary radius and constant geometric albedo
+
+    Args:
+        arange (tuple):
+            minimum and maximum semi-major axis in AU
+        Rprange (tuple):
+            minimum and maximum planetary radius in R_earth
+        p (float):
+            geometric albedo of all planets
+        eta (float):
+            number of planets per star
+
+    '''
+
+    def __init__(self, arange, Rprange, p, eta):
+        import astropy.units as u
+
+        self.arange = np.array(arange, dtype=float)*u.AU
+        self.Rprange = np.array(Rprange, dtype=float)*u.earthRad
+        self.prange = np.array([p, p], dtype=float)
+        self.eta = eta
+        self._outspec = {'arange': list(arange), 'Rprange': list(Rprange), \
+                         'prange': [p, p], 'eta': eta}
+
+    def loguniform(self, x, lo, hi):
+        '''Log-uniform probability density on [lo, hi]'''
+
+        x = np.asarray(x, dtype=float)
+
+        return np.where((x >= lo) & (x <= hi), 1.0/(x*np.log(hi/lo)), 0.0)
+
+    def dist_sma(self, a):
+        '''Probability density of semi-major axis in AU'''
+
+        return self.loguniform(a, *self.arange.to('AU').value)
+
+    def dist_radius(self, Rp):
+        '''Probability density of planetary radius in R_earth'''
+
+        return self.loguniform(Rp, *self.Rprange.to('earthRad').value)
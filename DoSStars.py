@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16, 2026
+"""
+
+import numpy as np
+
+class DoSStars(object):
+    '''Sparse store of the depth of search of each star
+
+    Only the nonzero bins of each star's grid are kept. Entries are stored
+    in star order in compressed sparse row form: the values and flattened
+    bin indices of star i are data[indptr[i]:indptr[i+1]] and
+    indices[indptr[i]:indptr[i+1]]. Sums over any subset of stars add the
+    stars in order, so they are identical to summing the dense grids.
+
+    Args:
+        shape (tuple):
+            shape of the depth of search grid of one star (planetary radius
+            bins by semi-major axis bins)
+        data (ndarray):
+            1D array of nonzero depth of search values (optional)
+        indices (ndarray):
+            1D array of flattened bin indices of the values (optional)
+        indptr (ndarray):
+            1D array of offsets of each star in data and indices (optional)
+
+    Attributes:
+        shape (tuple):
+            shape of the depth of search grid of one star
+        data (ndarray):
+            1D array of nonzero depth of search values
+        indices (ndarray):
+            1D array of flattened bin indices of the values
+        indptr (ndarray):
+            1D array of offsets of each star in data and indices
+
+    '''
+
+    def __init__(self, shape, data=None, indices=None, indptr=None):
+        self.shape = tuple(int(n) for n in shape)
+        if data is None:
+            data = np.zeros(0)
+            indices = np.zeros(0, dtype=np.int32)
+            indptr = np.zeros(1, dtype=np.int64)
+        self._data = [np.asarray(data, dtype=float)]
+        self._indices = [np.asarray(indices, dtype=np.int32)]
+        self._indptr = [np.asarray(indptr, dtype=np.int64)]
+
+    @property
+    def data(self):
+        self._compact()
+        return self._data[0]
+
+    @property
+    def indices(self):
+        self._compact()
+        return self._indices[0]
+
+    @property
+    def indptr(self):
+        self._compact()
+        return self._indptr[0]
+
+    @property
+    def nStars(self):
+        return sum(len(p) for p in self._indptr) - 1
+
+    def _compact(self):
+        '''Joins the chunks added by append'''
+
+        if len(self._data) > 1:
+            self._data = [np.concatenate(self._data)]
+            self._indices = [np.concatenate(self._indices)]
+            self._indptr = [np.concatenate(self._indptr)]
+
+    def append(self, f):
+        '''Adds stars to the store
+
+        Args:
+            f (ndarray):
+                3D array of depth of search values in each bin for each star
+
+        '''
+
+        f = np.reshape(f, (-1, self.shape[0]*self.shape[1]))
+        rows, cols = np.nonzero(f)
+        counts = np.bincount(rows, minlength=len(f))
+        self._data.append(f[rows,cols])
+        self._indices.append(cols.astype(np.int32))
+        self._indptr.append(self._indptr[-1][-1] + np.cumsum(counts))
+
+    def arrays(self):
+        '''Returns the arrays of the store
+
+        Returns:
+            arrays (dict):
+                dictionary of arrays which recreate the store with
+                DoSStars(**arrays)
+
+        '''
+
+        arrays = {'shape': np.array(self.shape), 'data': self.data, \
+                  'indices': self.indices, 'indptr': self.indptr}
+
+        return arrays
+
+    def star(self, i):
+        '''Returns the depth of search grid of one star
+
+        Args:
+            i (int):
+                index of the star
+
+        Returns:
+            f (ndarray):
+                2D array of depth of search values for the star
+
+        '''
+
+        start, stop = self.indptr[i], self.indptr[i+1]
+        f = np.zeros(self.shape[0]*self.shape[1])
+        f[self.indices[start:stop]] = self.data[start:stop]
+
+        return f.reshape(self.shape)
+
+    def sum(self, sInds=None):
+        '''Sums the depth of search of a subset of stars
+
+        Args:
+            sInds (ndarray):
+                1D array of star indices, or boolean mask with one value 
+                for each star (e.g. dist < 10), all stars if None (optional)
+
+        Returns:
+            DoS (ndarray):
+                2D array of summed depth of search values
+
+        '''
+
+        data, indices = self.data, self.indices
+        if sInds is not None:
+            sInds = np.asarray(sInds)
+            if sInds.dtype == bool:
+                if sInds.shape != (self.nStars,):
+                    raise ValueError('mask must have one value for each of the %d stars' % (self.nStars))
+                sInds = np.flatnonzero(sInds)
+            keep = np.in1d(self._stars(), sInds)
+            data, indices = data[keep], indices[keep]
+        DoS = np.bincount(indices, weights=data, minlength=self.shape[0]*self.shape[1])
+
+        return DoS.reshape(self.shape)
+
+    def group_sum(self, labels, ngroups):
+        '''Sums the depth of search of the stars in each group in one pass
+
+        Args:
+            labels (ndarray):
+                1D array of group index of each star, stars labeled -1 are
+                skipped
+            ngroups (int):
+                number of groups
+
+        Returns:
+            DoS (ndarray):
+                3D array of summed depth of search values for each group
+
+        '''
+
+        cells = self.shape[0]*self.shape[1]
+        labels = np.asarray(labels)[self._stars()]
+        keep = labels >= 0
+        DoS = np.bincount(labels[keep]*cells + self.indices[keep], weights=self.data[keep], \
+                          minlength=ngroups*cells)
+
+        return DoS.reshape((ngroups,) + self.shape)
+
+    def totals(self):
+        '''Finds the depth of search of each star summed over all bins
+
+        Returns:
+            totals (ndarray):
+                1D array of summed depth of search values for each star
+
+        '''
+
+        totals = np.bincount(self._stars(), weights=self.data, minlength=self.nStars)
+
+        return totals
+
+    def top(self, i, j, k=10):
+        '''Finds the stars contributing most to one bin
+
+        Args:
+            i (int):
+                planetary radius bin index
+            j (int):
+                semi-major axis bin index
+            k (int):
+                maximum number of stars returned (optional)
+
+        Returns:
+            sInds (ndarray):
+                1D array of star indices sorted by decreasing contribution
+            f (ndarray):
+                1D array of depth of search values of the stars in the bin
+
+        '''
+
+        keep = np.where(self.indices == i*self.shape[1] + j)[0]
+        order = np.argsort(self.data[keep])[::-1][:k]
+        sInds = self._stars()[keep[order]]
+        f = self.data[keep[order]]
+
+        return sInds, f
+
+    def _stars(self):
+        '''Returns the star index of each stored value'''
+
+        return np.repeat(np.arange(self.nStars), np.diff(self.indptr))
@@ -3,13 +3,9 @@ import scipy.interpolate as interpolate
 import scipy.integrate as integrate
 import astropy.units as u
 from EXOSIMS.StarCatalog.EXOCAT1 import EXOCAT1
-import matplotlib.pyplot as plt
-import matplotlib.ticker as ticker
-try:
-    import cPickle as pickle
-except:
-    import pickle
 import os
+from DoS.DoSArchive import DoSArchive
+from DoS.DoSPlot import DoSPlot
 
 """
 This script does not use the DoSFuncs object to calculate depth-of-search. Instead, it
@@ -19,15 +15,22 @@ separation given semi-major axis. The target list comes from the 'targets.txt' f
 Depth-of-search is calculated using a numerical version of depth-of-search from 
 Garrett et al. 2017 where orbital eccentricity is assumed to be zero.
 
+Completeness is found from a table of the CDF of p*Phi for each of the dists (see 
+phase_cdf) instead of quadrature of the flux ratio PDF at each grid point, so all
+grid points of a chunk of targets are evaluated at once (F_batch, DoS_batch). F and F_v
+are the quadrature versions, kept for comparison.
+
 p*Phi comes from grids produced by STScI. These grids are evaluated at solar metallicity (0.0)
 and averaged over cloud level using the frequencies from Mark. The resulting p*Phi is an 
 interpolant for each of the listed dists (semi-major axis) with phase angle (beta) the 
 independent variable (Riemann sum over wavelength has been performed to build the interpolant).
 
-The pickled dictionary 'DoS.res' contains the results. Top level keys include:
+The DoSArchive 'DoS.arc' contains the results. Arrays include:
     aedges: 1-D ndarray of semi-major axis bin edges
     Rpedges: 1-D ndarray of planetary radius bin edges
-    DoS: dictionary of depth-of-search results where the keys are the target names from 'targets.txt'
+    DoS: 3-D ndarray of depth-of-search results with one row per target, labeled with the 
+        target names from 'targets.txt', appended as each chunk of targets is finished
+The depth-of-search of one target is read with DoSArchive('DoS.arc').read('DoS', name).
 
 Plots of depth-of-search for each target are saved in the Plots folder. 
 """
@@ -39,6 +42,10 @@ abins = 100
 Rpmin = 1.0  # R_earth
 Rpmax = 22.6  # R_earth
 Rpbins = 30
+# number of processes rendering plots, -1 uses all cores
+n_jobs = -1
+# memory budget in MB for each chunk of targets
+mem = 64.0
 
 # wavelength and bandpass information
 lam = 575  # nm
@@ -83,7 +90,8 @@ def get_Cmin(a, d, smin, smax):
         tup = np.sqrt(1.0 - (smin / a) ** 2)
         tlow = np.sqrt(1.0 - (su / a) ** 2)
         ft = lambda t, a=a, d=d: contrast(a * np.sqrt(1.0 - t ** 2) / d)
-        val = integrate.quadrature(ft, tlow, tup, tol=1e-6, rtol=1e-6)[0]
+        # contrast is ~1e-10 so only the relative tolerance is used
+        val = integrate.quadrature(ft, tlow, tup, tol=0.0, rtol=1e-6)[0]
         Cmin = val / (tup - tlow)
 
     return Cmin
@@ -126,6 +134,55 @@ for d in dists:
 REinAU = (1.0*u.earthRad).to('AU').value
 
 
+# ================================================================================
+# CDF of flux ratio scaled by a**2/Rp**2 for each distance given
+def phase_cdf(pinv):
+    """
+    Tabulates the CDF of y = FR*a**2/Rp**2 = p*Phi(beta) for a p*Phi inverse interpolant
+
+    The PDF of y is 0.5*sin(beta(y))*|beta'(y)|. beta(y) is linear between the knots
+    of the interpolant, so the integral over each interval between knots is exactly
+    0.5*|cos(beta_i) - cos(beta_i+1)|, and the integral of f_FR_given_a_Rp from FR1 to
+    FR2 is cdf(FR2*a**2/Rp**2) - cdf(FR1*a**2/Rp**2).
+
+    Args:
+        pinv (InterpolatedUnivariateSpline): linear interpolant of beta as a function of p*Phi
+
+    Returns:
+        table (tuple): 1-D ndarrays of the knots in p*Phi, beta at the knots, and CDF at the knots
+    """
+
+    y = pinv.get_knots()
+    b = pinv(y)
+    G = np.hstack((0.0, np.cumsum(0.5*np.abs(np.diff(np.cos(b))))))
+
+    return y, b, G
+
+
+def cdf(y, table):
+    """
+    Evaluates the CDF tabulated by phase_cdf
+
+    Args:
+        y (ndarray): values of FR*a**2/Rp**2
+        table (tuple): table from phase_cdf
+
+    Returns:
+        G (ndarray): CDF values, constant outside of the knots
+    """
+
+    knots, b, G = table
+    y = np.clip(y, knots[0], knots[-1])
+    i = np.clip(np.searchsorted(knots, y, side='right') - 1, 0, len(knots) - 2)
+    w = (y - knots[i])/(knots[i+1] - knots[i])
+    by = (1.0 - w)*b[i] + w*b[i+1]
+
+    return G[i] + 0.5*np.abs(np.cos(b[i]) - np.cos(by))
+
+
+cdfs = dict((d, phase_cdf(pphinv[d])) for d in dists)
+
+
 # ================================================================================
 # conditional PDF of flux ratio given semi-major axis and planetary radius
 def f_FR_given_a_Rp(FR, a, Rp):
@@ -210,6 +267,105 @@ def F(a, Rp, smin, smax, d):
 F_v = np.vectorize(F)
 
 
+def get_Cmin_batch(a, d, smin, smax, nodes=8):
+    """
+    Finds contrast by weighted average over PDF of separation given semi-major axis (as
+    get_Cmin) for all targets and semi-major axis values at once. The integral over t is
+    split at the working angles of the contrast curve and each part is found with
+    Gauss-Legendre quadrature.
+
+    Args:
+        a (ndarray): 1-D array of semi-major axis values in AU
+        d (ndarray): 1-D array of distance to each target in pc
+        smin (ndarray): 1-D array of minimum separation of each target in AU
+        smax (ndarray): 1-D array of maximum separation of each target in AU
+        nodes (int): number of quadrature nodes in each part
+
+    Returns:
+        Cmin (ndarray): 2-D array of weighted average contrast (targets x a)
+    """
+
+    a = np.array(a, ndmin=1, dtype=float)[None, :]
+    d = np.array(d, ndmin=1, dtype=float)[:, None]
+    smin = np.array(smin, ndmin=1, dtype=float)[:, None]
+    smax = np.array(smax, ndmin=1, dtype=float)[:, None]
+    su = np.minimum(a, smax)
+    tup = np.sqrt(1.0 - np.clip(smin/a, 0.0, 1.0)**2)
+    tlow = np.sqrt(1.0 - np.clip(su/a, 0.0, 1.0)**2)
+    # t at each working angle clipped to the limits, decreasing with working angle
+    T = np.clip(np.sqrt(np.clip(1.0 - (d*WA[:, None, None]/a)**2, 0.0, 1.0)), tlow, tup)
+    brk = np.concatenate((tup[None], T, tlow[None]))
+    lo, hi = brk[1:], brk[:-1]
+    x, w = np.polynomial.legendre.leggauss(nodes)
+    t = 0.5*(hi - lo)[..., None]*x + 0.5*(hi + lo)[..., None]
+    ft = contrast(a[..., None]*np.sqrt(1.0 - t**2)/d[..., None])
+    val = np.sum(0.5*(hi - lo)*np.dot(ft, w), axis=0)
+
+    width = tup - tlow
+    Cmin = np.where(width > 0.0, val/np.where(width > 0.0, width, 1.0), contrast(smin/d))
+    Cmin[np.broadcast_to(a < smin, Cmin.shape)] = 1.0
+
+    return Cmin
+
+
+def F_batch(a, Rp, smin, smax, d):
+    """
+    Conditional probability of FR given a, Rp (as F) for arrays of targets on a grid, with
+    each integral of f_FR_given_a_Rp found from the CDF tables (cdfs). Contrast and phase
+    function limits are found once for each target and semi-major axis and shared by all
+    planetary radii, the scaled grid a**2/Rp**2 and CDF table are shared by all targets.
+
+    Args:
+        a (ndarray): 1-D array of semi-major axis values (in AU)
+        Rp (ndarray): 1-D array of planetary radius values (in AU)
+        smin (ndarray): 1-D array of minimum projected separation of each target (IWA*d in AU)
+        smax (ndarray): 1-D array of maximum projected separation of each target (OWA*d in AU)
+        d (ndarray): 1-D array of distance to each target in pc
+
+    Returns:
+        f (ndarray): 3-D array of conditional probability (targets x Rp x a)
+    """
+
+    a = np.array(a, ndmin=1, dtype=float)
+    Rp = np.array(Rp, ndmin=1, dtype=float)
+    smin = np.array(smin, ndmin=1, dtype=float)[:, None]
+    smax = np.array(smax, ndmin=1, dtype=float)[:, None]
+    d = np.array(d, ndmin=1, dtype=float)
+    Cmin = get_Cmin_batch(a, d, smin[:, 0], smax[:, 0])
+    x = a[None, :]**2/Rp[:, None]**2
+    da = distinterp(a)
+
+    f = np.zeros((len(d), len(Rp), len(a)))
+    for dd in np.unique(da):
+        cols = np.where(da == dd)[0]
+        ac = a[cols]
+        xc = x[None, :, cols]
+        Cm = Cmin[:, None, cols]
+        # phase function limits of each target and semi-major axis
+        bmin = np.arcsin(np.clip(smin/ac, 0.0, 1.0))
+        bmax = np.arcsin(np.clip(smax/ac, 0.0, 1.0))
+        C1 = pphi[dd](np.pi - bmin)[:, None, :]/xc
+        C2 = pphi[dd](bmin)[:, None, :]/xc
+        C3 = pphi[dd](np.pi - bmax)[:, None, :]/xc
+        C4 = pphi[dd](bmax)[:, None, :]/xc
+        # CDF at each limit
+        G = lambda C: cdf(C*xc, cdfs[dd])
+        Gm, G1, G2, G3, G4 = G(Cm), G(C1), G(C2), G(C3), G(C4)
+        # smax > a
+        inner = np.where(Cm > C2, 0.0, np.where(Cm > C1, G2 - Gm, G2 - G1))
+        # smax <= a
+        outer = np.select([Cm > C2, Cm > C4, Cm > C3, Cm > C1],
+                          [0.0, G2 - Gm, G2 - G4, G2 - G4 + G3 - Gm],
+                          G2 - G4 + G3 - G1)
+        fc = np.where((smax > ac)[:, None, :], inner, outer)
+        fc[np.broadcast_to((smin > ac)[:, None, :], fc.shape)] = 0.0
+        f[:, :, cols] = fc
+    # completeness must be <= 1
+    f[f > 1] = 1.0
+
+    return f
+
+
 # calculate depth-of-search for each bin
 def DoS_bins(a, Rp, smin, smax, d):
     """
@@ -226,62 +382,40 @@ def DoS_bins(a, Rp, smin, smax, d):
         f (ndarray): 2-D array of depth-of-search values in each bin
     """
 
-    tmp = F_v(a, Rp, smin, smax, d)
+    tmp = F_batch(a[0, :], Rp[:, 0], smin, smax, d)[0]
     f = 0.25*(tmp[:-1, :-1] + tmp[1:, :-1] + tmp[:-1, 1:] + tmp[1:, 1:])
 
     return f
 
 
-def plot_dos(aedges, Rpedges, DoS, name, path=None):
-    """Plots depth of search as a filled contour plot with contour lines
+# calculate depth-of-search for each bin for many targets
+def DoS_batch(a, Rp, smin, smax, d, mem=64.0):
+    """
+    Calculates depth-of-search for each bin for arrays of targets, in chunks of targets
+    whose arrays fit in the memory budget
 
     Args:
-        aedges (ndarray):
-            1-D array of semi-major axis bin edges
-        Rpedges (ndarray):
-            1-D array of planetary radius bin edges
-        DoS (ndarray):
-            2-D array of depth-of-search values
-        name (str):
-            string indicating what to put in title of figure
-        path (str):
-            desired path to save figure (png, optional)
-
+        a (ndarray): 1-D array of semi-major axis bin edges
+        Rp (ndarray): 1-D array of planetary radius bin edges
+        smin (ndarray): 1-D array of minimum projected separation of each target (IWA*d in AU)
+        smax (ndarray): 1-D array of maximum projected separation of each target (OWA*d in AU)
+        d (ndarray): 1-D array of distance to each target in pc
+        mem (float): memory budget in MB for each chunk of targets
+
+    Yields:
+        inds (ndarray): 1-D array of indices of the targets of the chunk
+        f (ndarray): 3-D array of depth-of-search values in each bin (targets x Rp x a)
     """
 
-    acents = 0.5 * (aedges[1:] + aedges[:-1])
-    a = np.hstack((aedges[0], acents, aedges[-1]))
-    a = np.around(a, 4)
-    Rcents = 0.5 * (Rpedges[1:] + Rpedges[:-1])
-    R = np.hstack((Rpedges[0], Rcents, Rpedges[-1]))
-    R = np.around(R, 4)
-    # extrapolate to left-most boundary
-    tmp = DoS[:, 0] + (a[0] - a[1]) * ((DoS[:, 1] - DoS[:, 0]) / (a[2] - a[1]))
-    DoS = np.insert(DoS, 0, tmp, axis=1)
-    # extrapolate to right-most boundary
-    tmp = DoS[:, -1] + (a[-1] - a[-2]) * ((DoS[:, -1] - DoS[:, -2]) / (a[-2] - a[-3]))
-    DoS = np.insert(DoS, -1, tmp, axis=1)
-    # extrapolate to bottom-most boundary
-    tmp = DoS[0, :] + (R[0] - R[1]) * ((DoS[1, :] - DoS[0, :]) / (R[2] - R[1]))
-    DoS = np.insert(DoS, 0, tmp, axis=0)
-    # extrapolate to upper-most boundary
-    tmp = DoS[-1, :] + (R[-1] - R[-2]) * ((DoS[-1, :] - DoS[-2, :]) / (R[-2] - R[-3]))
-    DoS = np.insert(DoS, -1, tmp, axis=0)
-    DoS = np.ma.masked_where(DoS <= 0.0, DoS)
-    fig = plt.figure()
-    ax = fig.add_subplot(111)
-    cs = ax.contourf(a, R, DoS, locator=ticker.LogLocator(), levels=[1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1e0])
-    cs2 = ax.contour(a, R, DoS, colors='k', levels=cs.levels)
-    ax.set_xscale('log')
-    ax.set_yscale('log')
-    ax.set_xlabel('a (AU)')
-    ax.set_ylabel('$R_p$ ($R_\oplus$)')
-    ax.set_title('Depth of Search - ' + name)
-    cbar = fig.colorbar(cs)
-    ax.clabel(cs2, fmt=ticker.LogFormatterMathtext(), colors='k')
-    if path is not None:
-        fig.savefig(path, format='png', dpi=100, bbox_inches='tight', pad_inches=0.1)
-    plt.close(fig)
+    smin = np.array(smin, ndmin=1, dtype=float)
+    smax = np.array(smax, ndmin=1, dtype=float)
+    d = np.array(d, ndmin=1, dtype=float)
+    # about 20 arrays of the grid size are used for each target
+    chunk = max(int(mem*2**20/(160.0*len(a)*len(Rp))), 1)
+    for i in xrange(0, len(d), chunk):
+        tmp = F_batch(a, Rp, smin[i:i+chunk], smax[i:i+chunk], d[i:i+chunk])
+        f = 0.25*(tmp[:, :-1, :-1] + tmp[:, 1:, :-1] + tmp[:, :-1, 1:] + tmp[:, 1:, 1:])
+        yield np.arange(i, i+len(f)), f
 
 
 # =============================================================================
@@ -297,32 +431,32 @@ with open('targets.txt', 'r') as f:
     targs = f.read().split('\n')
 
 # =============================================================================
-# set up an output dictionary to save results
-out_dict = {}
-out_dict['aedges'] = aedges
-out_dict['Rpedges'] = Rpedges/REinAU
-out_dict['DoS'] = {}
+# set up an archive to save results
+archive = DoSArchive('DoS.arc', 'w')
+archive.write('aedges', aedges)
+archive.write('Rpedges', Rpedges/REinAU)
 catName = cat.Name.tolist()
 
 # =============================================================================
 # do depth-of-search calculations for each star in target list
 if not os.path.isdir('Plots'):
     os.mkdir('Plots')
-for i in xrange(len(targs)):
-    print('Depth-of-search for {} - {}/{} targets'.format(targs[i], i+1, len(targs)))
-    # get target index in catalog
-    sInd = np.where(targs[i] == cat.Name)[0]
-    # minimum and maximum projected separation
-    smin = (np.tan(WA[0]*as_to_rad)*cat.dist[sInd]).to('AU').value
-    smax = (np.tan(WA[-1]*as_to_rad)*cat.dist[sInd]).to('AU').value
-    d = cat.dist[sInd].to('pc').value
-    # depth-of-search calculation
-    dos = DoS_bins(aa, RR, smin, smax, d)
-    # save a plot
-    plot_dos(aedges, Rpedges/REinAU, dos, targs[i], 'Plots/'+targs[i]+'.png')
-    # store result in output dictionary
-    out_dict['DoS'][catName[int(sInd)]] = dos
-
-# save depth-of-search results to disk
-with open('DoS.res', 'wb') as f:
-    pickle.dump(out_dict, f)
+# plots are rendered in background processes while the calculations go on
+plots = DoSPlot(aedges, Rpedges/REinAU, n_jobs=n_jobs, levels=[1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1e0],
+                ylabel='$R_p$ ($R_\oplus$)', dpi=100)
+# minimum and maximum projected separation of all targets
+sInds = np.array([np.where(targ == cat.Name)[0][0] for targ in targs])
+smin = (np.tan(WA[0]*as_to_rad)*cat.dist[sInds]).to('AU').value
+smax = (np.tan(WA[-1]*as_to_rad)*cat.dist[sInds]).to('AU').value
+d = cat.dist[sInds].to('pc').value
+# depth-of-search calculation for chunks of targets
+for inds, dos in DoS_batch(aedges, Rpedges, smin, smax, d, mem=mem):
+    print('Depth-of-search for {}/{} targets'.format(inds[-1]+1, len(targs)))
+    for i, f in zip(inds, dos):
+        # queue a plot
+        plots.plot(f, 'Depth of Search - ' + targs[i], 'Plots/'+targs[i]+'.png')
+    # append results to the archive on disk
+    archive.append('DoS', dos, [catName[int(sInds[i])] for i in inds])
+
+# wait for the plots to finish
+plots.close()
@@ -2,14 +2,10 @@ import numpy as np
 import scipy.interpolate as interpolate
 import astropy.units as u
 from EXOSIMS.StarCatalog.EXOCAT1 import EXOCAT1
-import matplotlib.pyplot as plt
-import matplotlib.ticker as ticker
 import scipy.optimize as optimize
-try:
-    import cPickle as pickle
-except:
-    import pickle
 import os
+from DoS.DoSArchive import DoSArchive
+from DoS.DoSPlot import DoSPlot
 
 """
 This script does not use the DoSFuncs object to calculate depth-of-search. Instead, it
@@ -19,15 +15,22 @@ list comes from the 'targets.txt' file. Depth-of-search is calculated using a nu
 of depth-of-search from Garrett et al. 2017. This is done with a Monte Carlo method where 
 orbital eccentricity is assumed to be Rayleigh distributed.
 
+The same samples are used for every grid point and target. FR > Cmin is equivalent to
+Rp**2 > Cmin*r**2/p*Phi, so sorting these values for each semi-major axis gives the
+completeness for all planetary radii at once (F_batch, DoS_batch). F and F_v are the
+sample-by-sample versions, kept for comparison.
+
 p*Phi comes from grids produced by STScI. These grids are evaluated at solar metallicity (0.0)
 and averaged over cloud level using the frequencies from Mark. The resulting p*Phi is an 
 interpolant for each of the listed dists (semi-major axis) with phase angle (beta) the 
 independent variable (Riemann sum over wavelength has been performed to build the interpolant).
 
-The pickled dictionary 'DoS.res' contains the results. Top level keys include:
+The DoSArchive 'DoS.arc' contains the results. Arrays include:
     aedges: 1-D ndarray of semi-major axis bin edges
     Rpedges: 1-D ndarray of planetary radius bin edges
-    DoS: dictionary of depth-of-search results where the keys are the target names from 'targets.txt'
+    DoS: 3-D ndarray of depth-of-search results with one row per target, labeled with the 
+        target names from 'targets.txt', appended as each chunk of targets is finished
+The depth-of-search of one target is read with DoSArchive('DoS.arc').read('DoS', name).
 
 Plots of depth-of-search for each target are saved in the Plots folder. 
 """
@@ -41,6 +44,10 @@ abins = 100
 Rpmin = 1.0  # R_earth
 Rpmax = 22.6  # R_earth
 Rpbins = 30
+# number of processes rendering plots, -1 uses all cores
+n_jobs = -1
+# memory budget in MB for each chunk of targets
+mem = 64.0
 # earth radius in units of AU
 REinAU = (1.0*u.earthRad).to('AU').value
 
@@ -202,6 +209,53 @@ def F(a, Rp, smin, smax, d):
 F_v = np.vectorize(F)
 
 
+def F_batch(a, Rp, smin, smax, d):
+    """
+    Completeness given semi-major axis and planetary radius (as F) for arrays of targets
+    on a grid. Orbital radius, separation and p*Phi of the samples are found once for each
+    semi-major axis and shared by all targets, and each target's samples are sorted by the
+    smallest planetary radius (squared) detectable so all planetary radii are counted at once.
+
+    Args:
+        a (ndarray): 1-D array of semi-major axis values (in AU)
+        Rp (ndarray): 1-D array of planetary radius values (in AU)
+        smin (ndarray): 1-D array of minimum separation of each target (in AU)
+        smax (ndarray): 1-D array of maximum separation of each target (in AU)
+        d (ndarray): 1-D array of distance to each target (in pc)
+
+    Returns:
+        comp (ndarray): 3-D array of completeness values (targets x Rp x a)
+    """
+
+    a = np.array(a, ndmin=1, dtype=float)
+    Rp2 = np.array(Rp, ndmin=1, dtype=float)**2
+    smin = np.array(smin, ndmin=1, dtype=float)[:, None]
+    smax = np.array(smax, ndmin=1, dtype=float)[:, None]
+    d = np.array(d, ndmin=1, dtype=float)[:, None]
+
+    comp = np.zeros((len(d), len(Rp2), len(a)))
+    for j in xrange(len(a)):
+        pphij = pphi[float(distinterp(a[j]))]
+        # planets too faint at any separation
+        good = Rp2/(0.01*a[j])**2*pphij(0.0) >= Cmin_abs
+        if not np.any(good):
+            continue
+        r = a[j]*ecosE
+        s = r*sinb
+        pb = pphij(b)
+        r2pb = np.full(samps, np.inf)
+        r2pb[pb > 0] = r[pb > 0]**2/pb[pb > 0]
+        # FR > Cmins where Rp**2 > q
+        q = np.where((s > smin) & (s < smax), contrast(s/d)*r2pb, np.inf)
+        q.sort(axis=1)
+        for k in xrange(len(d)):
+            comp[k, good, j] = np.searchsorted(q[k], Rp2[good], side='left')
+        comp[(2.0*a[j] < smin[:, 0]), :, j] = 0.0
+    comp /= float(samps)
+
+    return comp
+
+
 # calculate depth-of-search for each bin
 def DoS_bins(a, Rp, smin, smax, d):
     """
@@ -218,62 +272,40 @@ def DoS_bins(a, Rp, smin, smax, d):
         f (ndarray): 2-D array of depth-of-search values in each bin
     """
 
-    tmp = F_v(a, Rp, smin, smax, d)
+    tmp = F_batch(a[0, :], Rp[:, 0], smin, smax, d)[0]
     f = 0.25*(tmp[:-1, :-1] + tmp[1:, :-1] + tmp[:-1, 1:] + tmp[1:, 1:])
 
     return f
 
 
-def plot_dos(aedges, Rpedges, DoS, name, path=None):
-    """Plots depth of search as a filled contour plot with contour lines
+# calculate depth-of-search for each bin for many targets
+def DoS_batch(a, Rp, smin, smax, d, mem=64.0):
+    """
+    Calculates depth-of-search for each bin for arrays of targets, in chunks of targets
+    whose sample arrays fit in the memory budget
 
     Args:
-        aedges (ndarray):
-            1-D array of semi-major axis bin edges
-        Rpedges (ndarray):
-            1-D array of planetary radius bin edges
-        DoS (ndarray):
-            2-D array of depth-of-search values
-        name (str):
-            string indicating what to put in title of figure
-        path (str):
-            desired path to save figure (png, optional)
-
+        a (ndarray): 1-D array of semi-major axis bin edges
+        Rp (ndarray): 1-D array of planetary radius bin edges
+        smin (ndarray): 1-D array of minimum projected separation of each target (IWA*d in AU)
+        smax (ndarray): 1-D array of maximum projected separation of each target (OWA*d in AU)
+        d (ndarray): 1-D array of distance to each target in pc
+        mem (float): memory budget in MB for each chunk of targets
+
+    Yields:
+        inds (ndarray): 1-D array of indices of the targets of the chunk
+        f (ndarray): 3-D array of depth-of-search values in each bin (targets x Rp x a)
     """
 
-    acents = 0.5 * (aedges[1:] + aedges[:-1])
-    a = np.hstack((aedges[0], acents, aedges[-1]))
-    a = np.around(a, 4)
-    Rcents = 0.5 * (Rpedges[1:] + Rpedges[:-1])
-    R = np.hstack((Rpedges[0], Rcents, Rpedges[-1]))
-    R = np.around(R, 4)
-    # extrapolate to left-most boundary
-    tmp = DoS[:, 0] + (a[0] - a[1]) * ((DoS[:, 1] - DoS[:, 0]) / (a[2] - a[1]))
-    DoS = np.insert(DoS, 0, tmp, axis=1)
-    # extrapolate to right-most boundary
-    tmp = DoS[:, -1] + (a[-1] - a[-2]) * ((DoS[:, -1] - DoS[:, -2]) / (a[-2] - a[-3]))
-    DoS = np.insert(DoS, -1, tmp, axis=1)
-    # extrapolate to bottom-most boundary
-    tmp = DoS[0, :] + (R[0] - R[1]) * ((DoS[1, :] - DoS[0, :]) / (R[2] - R[1]))
-    DoS = np.insert(DoS, 0, tmp, axis=0)
-    # extrapolate to upper-most boundary
-    tmp = DoS[-1, :] + (R[-1] - R[-2]) * ((DoS[-1, :] - DoS[-2, :]) / (R[-2] - R[-3]))
-    DoS = np.insert(DoS, -1, tmp, axis=0)
-    DoS = np.ma.masked_where(DoS <= 0.0, DoS)
-    fig = plt.figure()
-    ax = fig.add_subplot(111)
-    cs = ax.contourf(a, R, DoS, locator=ticker.LogLocator(), levels=[1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1e0])
-    cs2 = ax.contour(a, R, DoS, colors='k', levels=cs.levels)
-    ax.set_xscale('log')
-    ax.set_yscale('log')
-    ax.set_xlabel('a (AU)')
-    ax.set_ylabel('$R_p$ ($R_\oplus$)')
-    ax.set_title('Depth of Search - ' + name)
-    cbar = fig.colorbar(cs)
-    ax.clabel(cs2, fmt=ticker.LogFormatterMathtext(), colors='k')
-    if path is not None:
-        fig.savefig(path, format='png', dpi=100, bbox_inches='tight', pad_inches=0.1)
-    plt.close(fig)
+    smin = np.array(smin, ndmin=1, dtype=float)
+    smax = np.array(smax, ndmin=1, dtype=float)
+    d = np.array(d, ndmin=1, dtype=float)
+    # about 4 arrays of the number of samples are used for each target
+    chunk = max(int(mem*2**20/(32.0*samps)), 1)
+    for i in xrange(0, len(d), chunk):
+        tmp = F_batch(a, Rp, smin[i:i+chunk], smax[i:i+chunk], d[i:i+chunk])
+        f = 0.25*(tmp[:, :-1, :-1] + tmp[:, 1:, :-1] + tmp[:, :-1, 1:] + tmp[:, 1:, 1:])
+        yield np.arange(i, i+len(f)), f
 
 
 # =============================================================================
@@ -289,32 +321,32 @@ with open('targets.txt', 'r') as f:
     targs = f.read().split('\n')
 
 # =============================================================================
-# set up an output dictionary to save results
-out_dict = {}
-out_dict['aedges'] = aedges
-out_dict['Rpedges'] = Rpedges/REinAU
-out_dict['DoS'] = {}
+# set up an archive to save results
+archive = DoSArchive('DoS.arc', 'w')
+archive.write('aedges', aedges)
+archive.write('Rpedges', Rpedges/REinAU)
 catName = cat.Name.tolist()
 
 # =============================================================================
 # do depth-of-search calculations for each star in target list
 if not os.path.isdir('Plots'):
     os.mkdir('Plots')
-for i in xrange(len(targs)):
-    print('Depth-of-search for {} - {}/{} targets'.format(targs[i], i+1, len(targs)))
-    # get target index in catalog
-    sInd = np.where(targs[i] == cat.Name)[0]
-    # minimum and maximum projected separation
-    smin = (np.tan(WA[0]*as_to_rad)*cat.dist[sInd]).to('AU').value
-    smax = (np.tan(WA[-1]*as_to_rad)*cat.dist[sInd]).to('AU').value
-    d = cat.dist[sInd].to('pc').value
-    # depth-of-search calculation
-    dos = DoS_bins(aa, RR, smin, smax, d)
-    # save a plot
-    plot_dos(aedges, Rpedges/REinAU, dos, targs[i], 'Plots/'+targs[i]+'.png')
-    # store result in output dictionary
-    out_dict['DoS'][catName[int(sInd)]] = dos
-
-# save depth-of-search results to disk
-with open('DoS.res', 'wb') as f:
-    pickle.dump(out_dict, f)
+# plots are rendered in background processes while the calculations go on
+plots = DoSPlot(aedges, Rpedges/REinAU, n_jobs=n_jobs, levels=[1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1e0],
+                ylabel='$R_p$ ($R_\oplus$)', dpi=100)
+# minimum and maximum projected separation of all targets
+sInds = np.array([np.where(targ == cat.Name)[0][0] for targ in targs])
+smin = (np.tan(WA[0]*as_to_rad)*cat.dist[sInds]).to('AU').value
+smax = (np.tan(WA[-1]*as_to_rad)*cat.dist[sInds]).to('AU').value
+d = cat.dist[sInds].to('pc').value
+# depth-of-search calculation for chunks of targets
+for inds, dos in DoS_batch(aedges, Rpedges, smin, smax, d, mem=mem):
+    print('Depth-of-search for {}/{} targets'.format(inds[-1]+1, len(targs)))
+    for i, f in zip(inds, dos):
+        # queue a plot
+        plots.plot(f, 'Depth of Search - ' + targs[i], 'Plots/'+targs[i]+'.png')
+    # append results to the archive on disk
+    archive.append('DoS', dos, [catName[int(sInds[i])] for i in inds])
+
+# wait for the plots to finish
+plots.close()
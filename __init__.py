@@ -3,5 +3,9 @@
 Created on Wed Jan 25 10:17:52 2017
 
 @author: Daniel
-"""
 
+Submodules are not imported here so that importing the package stays cheap. 
+Use, e.g., from DoS.DoSFuncs import DoSFuncs. Heavy dependencies (EXOSIMS, 
+scipy, astropy, ortools, matplotlib) are imported in the methods that need 
+them for the same reason, which Benchmarks/bench_import.py checks.
+"""
@@ -0,0 +1,85 @@
+'''
+Tests of DoSFuncs and DoSFuncsMulders on small target lists given as arrays
+(see DoSFuncs.from_arrays), needing no EXOSIMS simulation.
+'''
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from DoSFuncs import DoSFuncs
+from DoSFuncsMulders import DoSFuncsMulders
+
+# distance shells of the group_by groups, containing all of the stars
+SHELLS = [0.0, 10.0, 30.0]
+
+def contrast(WA):
+    '''Flat instrument contrast at working angles WA in arcsec'''
+
+    return 1e-9*np.ones(len(WA))
+
+def run(cls, n=20, seed=0, **kwargs):
+    '''
+    Calculates depth of search for n synthetic stars grouped by distance
+
+    Args:
+        cls (class):
+            DoSFuncs or DoSFuncsMulders
+        n (int):
+            number of stars (optional)
+        seed (int):
+            random seed (optional)
+        **kwargs:
+            other constructor arguments
+
+    Returns:
+        obj (DoSFuncs):
+            object of cls with the depth of search results
+    '''
+
+    rng = np.random.RandomState(seed)
+    dist = np.exp(rng.uniform(np.log(3.0), np.log(29.0), n))
+    t_int = np.exp(rng.uniform(np.log(0.01), np.log(5.0), n))
+    Spec = [['M', 'K', 'G', 'F'][i % 4]+'5V' for i in range(n)]
+    obj = cls.from_arrays(dist, t_int, contrast, 0.15, 0.45, Spec=Spec, abins=10, Rbins=5,
+                          solver='bb', group_by=('dist', SHELLS), **kwargs)
+
+    return obj
+
+class TestGroupBy(unittest.TestCase):
+    '''Results of the group_by groups'''
+
+    @classmethod
+    def setUpClass(cls):
+        cls.objs = [run(DoSFuncs), run(DoSFuncsMulders)]
+
+    def test_DoS_occ_keys(self):
+        for obj in self.objs:
+            self.assertEqual(sorted(obj.result['DoS_occ']), sorted(obj.result['DoS']))
+
+    def test_DoS_occ_groups_sum_to_all(self):
+        # the distance shells hold every observed star
+        for obj in self.objs:
+            keys = ['dist_%g-%g' % (SHELLS[i], SHELLS[i+1]) for i in range(len(SHELLS)-1)]
+            total = np.sum([obj.result['DoS_occ'][key] for key in keys], axis=0)
+            self.assertTrue(np.allclose(total, obj.result['DoS_occ']['all'], rtol=1e-12, atol=0.0))
+
+    def test_save_plots(self):
+        import matplotlib
+        matplotlib.use('Agg')
+        directory = tempfile.mkdtemp()
+        try:
+            for obj in self.objs:
+                obj.save_plots(directory, fmt='png')
+                for kind in ['DoS', 'nplan']:
+                    for key in obj.result['DoS']:
+                        self.assertTrue(os.path.exists(os.path.join(directory, kind+'_'+key+'.png')))
+        finally:
+            shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+'''
+Tests of the sparse store of the depth of search of each star
+'''
+
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from DoSStars import DoSStars
+
+class TestSum(unittest.TestCase):
+    '''Sums over subsets of stars'''
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.f = rng.uniform(0.0, 1.0, (6, 3, 4))
+        self.f[self.f < 0.5] = 0.0
+        self.stars = DoSStars((3, 4))
+        self.stars.append(self.f[:4])
+        self.stars.append(self.f[4:])
+
+    def test_all(self):
+        self.assertTrue(np.allclose(self.stars.sum(), self.f.sum(axis=0)))
+
+    def test_indices(self):
+        sInds = np.array([1, 4, 5])
+        self.assertTrue(np.allclose(self.stars.sum(sInds), self.f[sInds].sum(axis=0)))
+
+    def test_mask(self):
+        dist = np.array([3.0, 12.0, 8.0, 20.0, 5.0, 15.0])
+        mask = dist < 10
+        self.assertTrue(np.allclose(self.stars.sum(mask), self.f[mask].sum(axis=0)))
+
+    def test_mask_length(self):
+        self.assertRaises(ValueError, self.stars.sum, np.ones(5, dtype=bool))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""
+Version of the DoS package. Cached intermediate results are keyed on this 
+value, so it must be changed whenever the calculations change.
+"""
+
+__version__ = '1.1.0'